@@ -10,82 +10,76 @@ from OCC.Display.SimpleGui import init_display
 from OCC.Display.WebGl import threejs_renderer
 import sys
 import os
+import argparse
 from OCC.Extend.ShapeFactory import translate_shp, rotate_shp_3_axis
 import math
 import time
 import datetime
 import gc
+import queue
+import collections
+import multiprocessing
 from OCC.Core.Graphic3d import Graphic3d_Camera
 from pathlib import Path
-
-class Logger:
-    """
-    日志记录器，同时输出到控制台和文件
-    """
-    def __init__(self, log_dir="step2viewdata/processlog_debug"):
-        self.log_dir = Path(log_dir)
-        self.log_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 创建日志文件名（包含时间戳）
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_file = self.log_dir / f"multiview_{timestamp}.log"
-        
-        # 打开日志文件
-        self.log_handle = open(self.log_file, 'w', encoding='utf-8')
-        
-        # 记录开始时间
-        self.start_time = datetime.datetime.now()
-        self.log(f"日志开始时间: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        self.log(f"日志文件: {self.log_file}")
-        self.log("-" * 60)
-    
-    def log(self, message):
-        """
-        记录日志消息
-        """
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] {message}"
-        
-        # 输出到控制台
-        print(log_message)
-        
-        # 输出到文件
-        self.log_handle.write(log_message + '\n')
-        self.log_handle.flush()  # 立即写入文件
-    
-    def close(self):
-        """
-        关闭日志文件
-        """
-        end_time = datetime.datetime.now()
-        duration = end_time - self.start_time
-        
-        self.log("-" * 60)
-        self.log(f"日志结束时间: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        self.log(f"总耗时: {duration}")
-        self.log(f"日志文件保存位置: {self.log_file}")
-        
-        self.log_handle.close()
+from steprender import fibonacci_sphere, animate_viewpoint2, start_render_worker, StepReadError, DEFAULT_TILE_MAX_KB
+from steptopology import topology_stats, format_topology
+from steplogger import Logger, reset_peak_rss, get_peak_rss_mb, get_process_stats
+from stepoutput import write_render_manifest, ModelOutputStaging, cleanup_stale_staging
+from stepcheckpoint import RunCheckpoint
+from steplock import model_output_lock
+from stepgovernor import ResourceGovernor
+from stepprofile import FileProfiler, profile_dir, PROFILE_METHODS
+from stepmetrics import BatchMetrics, MetricsExporter, DEFAULT_EXPORT_INTERVAL
+from stepcorpus import label_output_dir, label_stem, staged_step_file, parse_shard, filter_shard
+from stepindex import FileIndex
+from stepreport import RunReport
+from stepbudget import TimeBudget, parse_time_budget, EXPIRY_GRACE_SECONDS
 
 class ConfigManager:
     """
     配置管理器，处理不同运行模式的路径配置
     """
-    def __init__(self, mode="debug", force_reprocess=False):
+    def __init__(self, mode="debug", force_reprocess=False, input_roots=None, recursive=False, resume=True,
+                 shard=None, profile=None, time_budget=None):
         self.mode = mode.lower()
         self.base_dir = "step2viewdata"
         self.force_reprocess = force_reprocess  # 是否强制重新处理已存在的文件
+        self.input_roots = [str(root) for root in (input_roots or [])]  # 额外的输入根目录（不复制文件）
+        self.recursive = recursive  # 是否递归扫描子目录，子目录作为类别命名空间
+        self.resume = resume  # 是否从上次中断的检查点继续
+        self.shard = shard  # 分片 (i, N)：只处理标签哈希取模等于 i 的文件，None 表示全部
+        self.entries = None
+        self.all_entries = None
+        self.collisions = []
+        self.index = None
         
         if self.mode == "debug":
             self.input_dir = f"{self.base_dir}/debug_traceparts"
             self.output_dir = f"{self.base_dir}/debug_output"
             self.log_dir = f"{self.base_dir}/debug_processlog"
+            self.index_path = f"{self.base_dir}/debug_fileindex.sqlite"
+            self.checkpoint_path = f"{self.base_dir}/debug_checkpoint.jsonl"
         elif self.mode == "release":
             self.input_dir = f"{self.base_dir}/release_traceparts"
             self.output_dir = f"{self.base_dir}/release_output"
             self.log_dir = f"{self.base_dir}/release_processlog"
+            self.index_path = f"{self.base_dir}/release_fileindex.sqlite"
+            self.checkpoint_path = f"{self.base_dir}/release_checkpoint.jsonl"
         else:
             raise ValueError(f"不支持的运行模式: {mode}")
+        
+        if self.shard is not None:
+            # 同一台机器上运行多个分片时各用各的检查点
+            self.checkpoint_path = f"{self.base_dir}/{self.mode}_checkpoint_shard{self.shard[0]}of{self.shard[1]}.jsonl"
+        
+        # 按文件的性能分析 (profile 为 FileProfiler 参数，None 表示不分析)
+        self.profiler = FileProfiler(profile_dir(self.log_dir), **profile) if profile is not None else FileProfiler()
+        
+        # 运行中的实时指标（由 MetricsExporter 通过 HTTP 或文本文件导出）
+        self.metrics = BatchMetrics()
+        
+        # 时间预算（秒，None 表示不限制）：按预测耗时从短到长处理，预算内放不下的文件推迟到下次运行
+        self.budget = TimeBudget(time_budget)
     
     def get_paths(self):
         """
@@ -93,11 +87,66 @@ class ConfigManager:
         """
         return {
             'input_dir': self.input_dir,
+            'input_roots': self.get_input_roots(),
+            'recursive': self.recursive,
             'output_dir': self.output_dir,
             'log_dir': self.log_dir,
+            'index_path': self.index_path,
+            'checkpoint_path': self.checkpoint_path,
+            'shard': self.shard,
             'mode': self.mode
         }
     
+    def get_input_roots(self):
+        """
+        所有输入根目录：模式默认的输入目录在前，额外的根目录在后
+        """
+        return [self.input_dir] + self.input_roots
+    
+    def open_index(self):
+        """
+        打开输入文件索引（一次运行只打开一次）
+        """
+        if self.index is None:
+            self.index = FileIndex(self.index_path)
+        return self.index
+    
+    def scan_inputs(self, refresh=False):
+        """
+        通过文件索引增量扫描所有输入根目录，返回 [(STEP文件路径, 标签)]（结果缓存，一次运行只扫描一次）
+        指定分片时只返回本分片的文件，全部文件保存在 all_entries
+        """
+        if self.entries is None or refresh:
+            self.all_entries, self.collisions = self.open_index().refresh(self.get_input_roots(), self.recursive)
+            self.entries = filter_shard(self.all_entries, self.shard)
+            refresh = self.index.last_refresh
+            changed = refresh['added'] + refresh['changed']
+            self.metrics.cache_lookup("index", hits=refresh['total'] - changed, misses=changed)
+            self.metrics.expected.set(len(self.entries))
+            self.metrics.queue_depth.set(len(self.entries))
+        return self.entries
+    
+    def plan_budget(self, entries):
+        """
+        按时间预算排列要处理的文件（未启用时原样返回）
+        """
+        return self.budget.order(entries, self.index.records(self.get_input_roots()))
+    
+    def open_checkpoint(self):
+        """
+        打开运行检查点，输入范围和强制重新处理选项与上次一致时继续上次中断的运行
+        :return: (检查点, 已完成的文件 {路径: 状态})
+        """
+        checkpoint = RunCheckpoint(self.checkpoint_path, {
+            'mode': self.mode,
+            'input_roots': self.get_input_roots(),
+            'recursive': self.recursive,
+            'force_reprocess': self.force_reprocess,
+            'shard': list(self.shard) if self.shard else None
+        })
+        done = checkpoint.open(resume=self.resume)
+        return checkpoint, done
+    
     def create_directories(self):
         """
         创建必要的目录
@@ -110,17 +159,23 @@ class ConfigManager:
         """
         验证输入目录是否存在且包含.stp文件（不区分大小写）
         """
-        input_path = Path(self.input_dir)
-        if not input_path.exists():
-            return False, f"输入目录不存在: {self.input_dir}"
+        missing = [root for root in self.get_input_roots() if not Path(root).exists()]
+        if missing:
+            return False, f"输入目录不存在: {', '.join(missing)}"
         
-        # 查找所有.stp和.STEP文件（不区分大小写）
-        stp_files = list(input_path.glob("*.stp")) + list(input_path.glob("*.STP")) + \
-                    list(input_path.glob("*.step")) + list(input_path.glob("*.STEP"))
+        # 查找所有.stp和.step文件（不区分大小写）
+        stp_files = self.scan_inputs()
         if not stp_files:
-            return False, f"输入目录中没有找到STEP文件: {self.input_dir}"
+            if self.all_entries:
+                return False, f"分片 {self.shard[0]}/{self.shard[1]} 中没有文件（全部 {len(self.all_entries)} 个）"
+            return False, f"输入目录中没有找到STEP文件: {', '.join(self.get_input_roots())}"
         
-        return True, f"找到 {len(stp_files)} 个STEP文件"
+        message = f"找到 {len(stp_files)} 个STEP文件"
+        if self.shard is not None:
+            message += f" (分片 {self.shard[0]}/{self.shard[1]}，全部 {len(self.all_entries)} 个)"
+        if self.collisions:
+            message += f" (另有 {len(self.collisions)} 个与其他输入根目录中的标签重复，已忽略)"
+        return True, message
 
 def format_time(seconds):
     """
@@ -138,60 +193,88 @@ def format_time(seconds):
         remaining_seconds = seconds % 60
         return f"{hours}小时{remaining_minutes}分{remaining_seconds:.2f}秒"
 
-def fibonacci_sphere(samples=36, distance=5):
+def log_profile_summary(emit, kept, profiler, limit=5):
     """
-    :param samples: number of views
-    :param distance: distance from the center of the object
-    :return: # samples points of view around the model
+    输出保留的性能分析结果（最慢的几个文件）
+    :param emit: logger.log 或 print
+    :param kept: [(耗时, 文件, [分析结果路径])]，按耗时从高到低
     """
-    points = []
-    phi = math.pi * (3. - math.sqrt(5.))  # golden angle in radians
-    for i in range(samples):
-        y = (1 - (i / float(samples - 1)) * 2) * distance   # y goes from 1 to -1
-        radius = math.sqrt(distance * distance - y * y)  # radius at y
-        theta = phi * i  # golden angle increment
-        x = math.cos(theta) * radius
-        z = math.sin(theta) * radius
-        points.append((x, y, z))
-        
-    return points
+    if not profiler.enabled:
+        return
+    emit(f"性能分析 ({profiler.method}): 保留 {len(kept)} 个文件的分析结果, 目录 {profiler.output_dir}")
+    for elapsed, file, paths in kept[:limit]:
+        emit(f"  {file}: {format_time(elapsed)} -> {', '.join(os.path.basename(path) for path in paths)}")
 
-def animate_viewpoint2(display, img_name, logger=None):
+def run_report_path(logger):
     """
-    :param img_name: save name of the view
-    :param logger: 日志记录器
+    逐文件结果文件：与日志同名的 .files.csv，没有日志文件时不写
     """
-    if logger:
-        logger.log("开始生成多视角图片...")
-    
-    display.FitAll()
-    display.Context.UpdateCurrentViewer()
-
-    cam = display.View.Camera()  # type: Graphic3d_Camera
+    return logger.log_file.with_suffix(".files.csv") if logger.log_file is not None else None
 
-    center = cam.Center()
-    eye = cam.Eye()
+def log_run_report(emit, report):
+    """
+    输出成功文件耗时的分位数、均值和最快/最慢的文件（逐文件结果见结果文件）
+    :param emit: logger.log 或 print
+    """
+    if report.success_count:
+        emit(f"平均处理时间: {format_time(report.mean())}")
+        emit("耗时分位数: " + ", ".join(f"P{q * 100:.0f} {format_time(value)}" for q, value in report.quantiles()))
+        emit("最快文件:")
+        for rank, (file, seconds) in enumerate(report.fastest_files(), 1):
+            emit(f"  {rank}. {file} ({format_time(seconds)})")
+        emit("最慢文件:")
+        for rank, (file, seconds) in enumerate(report.slowest_files(), 1):
+            emit(f"  {rank}. {file} ({format_time(seconds)})")
+    if report.writer is not None:
+        emit(f"逐文件结果: {report.path}")
 
-    display.View.FitAll()
-    eye_ = numpy.array([eye.X(), eye.Y(), eye.Z()])
-    center_ = numpy.array([center.X(), center.Y(), center.Z()])
-    distance = numpy.linalg.norm(eye_ - center_)
+def log_budget_plan(emit, budget, stp_files, done_files, workers=1):
+    """
+    输出时间预算和预计能在预算内完成的文件数
+    """
+    if not budget.enabled:
+        return
+    todo = [step_path for step_path, _ in stp_files if step_path not in done_files]
+    count, seconds = budget.estimate(todo, workers)
+    emit(f"时间预算: {format_time(budget.seconds)}，按预测耗时从短到长处理 (有历史耗时的文件: {len(budget.known)})")
+    emit(f"  预计可完成: {count}/{len(todo)} 个文件 (预测耗时 {format_time(seconds)})")
 
-    points = fibonacci_sphere(samples=36, distance=distance)
+def defer_file(config, report, step_path, file):
+    """
+    时间预算内放不下的文件：不写检查点（下次运行继续处理），记入结果文件
+    :return: 预测耗时（秒）
+    """
+    cost = config.budget.defer(step_path, file)
+    report.add(file, "deferred", None)
+    config.metrics.file_done("deferred")
+    return cost
 
-    for i, point in enumerate(points):
-        eye.SetX(point[0]+center_[0])
-        eye.SetY(point[1]+center_[1])
-        eye.SetZ(point[2]+center_[2])
-        cam.SetEye(eye)
+def log_deferred(emit, budget):
+    """
+    输出推迟到下次运行的文件（列出预测耗时最短的几个）
+    """
+    if not budget.enabled:
+        return
+    if not budget.deferred:
+        emit(f"时间预算 {format_time(budget.seconds)}: 全部文件已在预算内处理")
+        return
+    emit(f"时间预算 {format_time(budget.seconds)}: 推迟 {budget.deferred} 个文件到下次运行 "
+         f"(预测耗时 {format_time(budget.deferred_seconds)})，检查点已保留")
+    for file, cost in budget.deferred_files:
+        emit(f"  {file} (预测 {format_time(cost)})")
+    if budget.deferred > len(budget.deferred_files):
+        emit(f"  ... 其余 {budget.deferred - len(budget.deferred_files)} 个")
 
-        display.View.FitAll()
-        display.Context.UpdateCurrentViewer()
-        name = img_name.replace(".jpeg", "_"+str(i)+".jpeg")
-        display.View.Dump(name)
-        
-        if logger and (i + 1) % 10 == 0:  # 每10个视角记录一次进度
-            logger.log(f"  生成进度: {i+1}/36")
+def view_set_exists(img_name, since=None):
+    """
+    判断模型的视角图片是否已存在（模型目录整体原子重命名，只需检查第一个视角）
+    since 不为空时还要求在该时间之后生成，用于识别其他进程在本次运行期间完成的模型
+    """
+    try:
+        mtime = os.path.getmtime(img_name.replace(".jpeg", "_0.jpeg"))
+    except OSError:
+        return False
+    return since is None or mtime >= since
 
 def make_multiview_dataset_with_timing_and_logging(config):
     """
@@ -199,11 +282,15 @@ def make_multiview_dataset_with_timing_and_logging(config):
     增加时间统计和日志记录功能
     """
     # 获取配置路径
-    models_dir_path = config.input_dir
+    models_dir_path = ", ".join(config.get_input_roots())
     mvcnn_images_dir_path = config.output_dir
     
-    # 创建日志记录器
-    logger = Logger(config.log_dir)
+    # 创建日志记录器（同时输出结构化事件）
+    logger = Logger(config.log_dir, events=True)
+    logger.add_listener(config.metrics.observe_event)
+    report = RunReport(run_report_path(logger))
+    checkpoint = None
+    model_lock = None
     
     try:
         # 记录总体开始时间
@@ -228,58 +315,131 @@ def make_multiview_dataset_with_timing_and_logging(config):
             return
         
         logger.log(message)
+        refresh = config.index.last_refresh
+        logger.log(f"文件索引: 新增 {refresh['added']}, 变化 {refresh['changed']}, 移除 {refresh['removed']}")
+        for step_path, label, kept_path in config.collisions[:10]:
+            logger.log(f"  忽略重复标签 {label}: {step_path} (保留 {kept_path})")
         
         # 确保输出目录存在
         if not os.path.exists(mvcnn_images_dir_path):
             os.makedirs(mvcnn_images_dir_path)
             logger.log("创建输出目录")
+        removed = cleanup_stale_staging(mvcnn_images_dir_path)
+        if removed:
+            logger.log(f"清理上次中断遗留的不完整输出: {removed}")
         
         # 获取所有.stp文件（不区分大小写）
-        stp_files = [f for f in os.listdir(models_dir_path) if f.lower().endswith((".stp", ".step"))]
+        stp_files = config.scan_inputs()
         total_files = len(stp_files)
         
+        # 从检查点继续：已处理的文件不再检查输出
+        checkpoint, done_files = config.open_checkpoint()
+        if checkpoint.busy:
+            logger.log(f"检查点正被其他进程使用，本次运行不记录检查点 ({config.checkpoint_path})")
+        elif checkpoint.resumed:
+            logger.log(f"从检查点继续: 已完成 {len(done_files)} 个文件 ({config.checkpoint_path})")
+        
+        stp_files = config.plan_budget(stp_files)
+        config.budget.start(total_start_time)
+        
         logger.log(f"找到 {total_files} 个STEP文件")
+        log_budget_plan(logger.log, config.budget, stp_files, done_files)
         logger.log("-" * 80)
+        logger.event("run_start", mode=config.mode, input_dir=models_dir_path,
+                     output_dir=mvcnn_images_dir_path, total_files=total_files,
+                     force_reprocess=config.force_reprocess, resumed=len(done_files),
+                     shard=f"{config.shard[0]}/{config.shard[1]}" if config.shard else None)
         
         # 统计变量
         processed_files = 0
         skipped_files = 0
         error_files = 0
+        resumed_files = 0
+        locked_files = 0
         total_processing_time = 0
-        file_times = []
         
         # 处理每个文件
-        for file_idx, file in enumerate(stp_files, 1):
+        for file_idx, (step_path, class_) in enumerate(stp_files, 1):
+            # 上一个文件的模型锁在这里释放（包括中途 continue 的情况）
+            if model_lock is not None:
+                model_lock.release()
+                model_lock = None
+            
+            if step_path in done_files:
+                resumed_files += 1
+                config.metrics.file_done("resumed")
+                continue
+            
+            # 时间预算已关闭：还没有输出的文件直接推迟
+            if config.budget.closed and (config.force_reprocess or not view_set_exists(os.path.join(
+                    label_output_dir(mvcnn_images_dir_path, class_), f"{label_stem(class_)}.jpeg"))):
+                defer_file(config, report, step_path, os.path.basename(step_path))
+                continue
+            
             # 记录单个文件开始时间
             file_start_time = time.time()
+            reset_peak_rss()
+            config.profiler.start()
             
             # 初始化状态变量
             success = False
             
-            # 从文件名中提取类别名（不含扩展名）
-            class_ = os.path.splitext(file)[0]
+            # 类别名（标签）来自扫描结果：文件名不含扩展名，递归扫描时带子目录命名空间
+            file = os.path.basename(step_path)
+            errors_before = error_files
             
             logger.log(f"[{file_idx}/{total_files}] 处理模型: {file}")
-            logger.log(f"  开始时间: {datetime.datetime.now().strftime('%H:%M:%S')}")
+            logger.debug(f"  开始时间: {datetime.datetime.now().strftime('%H:%M:%S')}")
             
-            # 为每个.stp文件创建对应的输出子目录
-            output_subdir = os.path.join(mvcnn_images_dir_path, class_)
-            if not os.path.exists(output_subdir):
-                os.makedirs(output_subdir)
+            # 每个.stp文件对应的输出子目录（渲染完成后由暂存目录重命名而来）
+            output_subdir = label_output_dir(mvcnn_images_dir_path, class_)
             
             # 设置输出图片的基本名称
-            img_name = os.path.join(output_subdir, f"{class_}.jpeg")
+            img_name = os.path.join(output_subdir, f"{label_stem(class_)}.jpeg")
             
             # 检查是否已经生成了图片（只检查第一个视角）
             # 如果force_reprocess为True，则强制重新处理
-            first_view_exists = os.path.exists(img_name.replace(".jpeg", "_0.jpeg"))
-            if not first_view_exists or config.force_reprocess:
+            first_view_exists = view_set_exists(img_name)
+            needs_render = not first_view_exists or config.force_reprocess
+            if needs_render and not config.budget.fits(step_path):
+                # 按预测耗时升序处理，这个文件放不下时之后的文件也放不下
+                cost = defer_file(config, report, step_path, file)
+                config.profiler.stop(class_, 0, "skipped")
+                logger.log(f"  - 推迟 (预测耗时 {format_time(cost)}, 时间预算剩余 "
+                           f"{format_time(config.budget.remaining())})，其余未处理的文件推迟到下次运行")
+                continue
+            if needs_render:
+                # 多个进程共用输出目录时按模型加锁划分任务，拿不到锁说明其他进程正在处理
+                model_lock = model_output_lock(mvcnn_images_dir_path, class_)
+                if not model_lock.acquire():
+                    model_lock = None
+                    locked_files += 1
+                    config.metrics.file_done("locked")
+                    logger.log(f"  - 跳过 (其他进程正在处理)")
+                    logger.event("stage", file=step_path, stage="lock", status="skipped")
+                    continue
+                # 加锁之前其他进程可能刚好完成了这个模型
+                if view_set_exists(img_name, total_start_time if config.force_reprocess else None):
+                    needs_render = False
+            # 已隔离且内容未变化的文件直接跳过（需要重试时使用 --retry-quarantine）
+            quarantined = None
+            if needs_render:
+                quarantined = config.index.check_quarantine(step_path)
+            if quarantined is not None:
+                skipped_files += 1
+                logger.log(f"  - 跳过 (已隔离: {quarantined['stage']} 阶段失败 {quarantined['failures']} 次, "
+                           f"{quarantined['error']})")
+                logger.event("stage", file=step_path, stage="quarantine", status="skipped",
+                             failed_stage=quarantined['stage'], failures=quarantined['failures'])
+            elif needs_render:
                 if first_view_exists and config.force_reprocess:
                     logger.log(f"  ⚠ 图片已存在，强制重新处理")
                 try:
                     # 读取STEP文件
+                    read_start_time = time.time()
                     step_reader = STEPControl_Reader()
-                    status = step_reader.ReadFile(os.path.join(models_dir_path, file))
+                    with staged_step_file(step_path) as read_path:
+                        status = step_reader.ReadFile(read_path)
                     
                     if status == IFSelect_RetDone:  # 检查状态
                         failsonly = False
@@ -292,55 +452,94 @@ def make_multiview_dataset_with_timing_and_logging(config):
                         
                         if _nbs == 0:
                             logger.log(f"  错误: STEP文件中没有形状 {file}")
+                            logger.event("stage", file=step_path, stage="transfer", status="error",
+                                         duration=round(time.time() - read_start_time, 3),
+                                         error="no shapes")
+                            config.index.quarantine_file(step_path, "transfer", "no shapes")
                             error_files += 1
-                            continue
+                            raise StepReadError(f"STEP文件中没有形状 {file}", stage="transfer")
                         
                         # 获取合并后的形状
                         aResShape = step_reader.OneShape()
                         logger.log(f"  成功读取STEP文件，形状数量: {_nbs}")
+                        logger.event("stage", file=step_path, stage="read", status="success",
+                                     duration=round(time.time() - read_start_time, 3), shapes=_nbs)
                     else:
                         logger.log(f"  错误: 无法读取文件 {file}")
+                        logger.event("stage", file=step_path, stage="read", status="error",
+                                     duration=round(time.time() - read_start_time, 3),
+                                     error="ReadFile failed")
+                        config.index.quarantine_file(step_path, "read", "ReadFile failed")
                         error_files += 1
-                        continue
+                        raise StepReadError(f"无法读取文件 {file}", stage="read")
                     
                     # 尝试不同的显示后端
                     backends = ["pyqt5", "pyqt6", "pyside2"]
                     success = False
+                    render_start_time = time.time()
                     
-                    for backend in backends:
-                        try:
-                            # 清理内存
-                            gc.collect()
-                            
-                            logger.log(f"    尝试后端: {backend}")
-                            
-                            # 初始化显示
-                            display, start_display, add_menu, add_function_to_menu = init_display(backend_str=backend)
-                            
-                            # 显示形状
-                            display.DisplayShape(aResShape, update=True)
-                            
-                            # 生成多视角图片
-                            animate_viewpoint2(display=display, img_name=img_name, logger=logger)
-                            
-                            success = True
-                            logger.log(f"    后端 {backend} 成功")
-                            break
+                    # 视角图片先写入暂存目录，全部完成后整体重命名到输出子目录
+                    with ModelOutputStaging(mvcnn_images_dir_path, output_subdir) as staging:
+                        for backend in backends:
+                            try:
+                                # 清理内存
+                                gc.collect()
+                                
+                                logger.debug(f"    尝试后端: {backend}")
+                                
+                                # 初始化显示
+                                display, start_display, add_menu, add_function_to_menu = init_display(backend_str=backend)
+                                
+                                # 显示形状
+                                display.DisplayShape(aResShape, update=True)
+                                
+                                # 生成多视角图片
+                                animate_viewpoint2(display=display, img_name=staging.img_name(label_stem(class_)),
+                                                   logger=logger)
+                                
+                                success = True
+                                logger.log(f"    后端 {backend} 成功")
+                                break
+                                
+                            except Exception as e:
+                                logger.log(f"    后端 {backend} 失败: {str(e)}")
+                                continue
+                        
+                        logger.event("stage", file=step_path, stage="render",
+                                     status="success" if success else "error",
+                                     duration=round(time.time() - render_start_time, 3),
+                                     backend=backend if success else None)
+                        
+                        if success:
+                            write_render_manifest(staging.path, step_path,
+                                                  time.time() - file_start_time, shapes=_nbs)
+                            staging.commit()
+                            processed_files += 1
+                            logger.log(f"  ✓ 成功生成多视角图片")
                             
-                        except Exception as e:
-                            logger.log(f"    后端 {backend} 失败: {str(e)}")
-                            continue
-                    
-                    if success:
-                        processed_files += 1
-                        logger.log(f"  ✓ 成功生成多视角图片")
-                    else:
-                        error_files += 1
-                        logger.log(f"  ✗ 所有后端都失败了")
+                            # 拓扑复杂度（显示时已生成网格），与阶段耗时一起写入事件
+                            topology_start_time = time.time()
+                            try:
+                                topology = topology_stats(aResShape)
+                                logger.log(f"  拓扑: {format_topology(topology)}")
+                                logger.event("stage", file=step_path, stage="topology", status="success",
+                                             duration=round(time.time() - topology_start_time, 3), **topology)
+                            except Exception as e:
+                                logger.log(f"  拓扑统计失败: {str(e)}")
+                        else:
+                            error_files += 1
+                            logger.log(f"  ✗ 所有后端都失败了")
+                            config.index.quarantine_file(step_path, "render", "all backends failed")
                         
+                except StepReadError:
+                    # 读取/传输失败已记录日志和隔离，与其他文件一样进入下面的逐文件统计
+                    success = False
                 except Exception as e:
+                    success = False
                     error_files += 1
                     logger.log(f"  ✗ 处理错误: {str(e)}")
+                    logger.event("stage", file=step_path, stage="process", status="error", error=str(e))
+                    config.index.quarantine_file(step_path, "process", str(e))
             else:
                 skipped_files += 1
                 logger.log(f"  - 跳过 (图片已存在)")
@@ -350,18 +549,25 @@ def make_multiview_dataset_with_timing_and_logging(config):
             file_processing_time = file_end_time - file_start_time
             total_processing_time += file_processing_time
             
-            file_times.append({
-                'file': file,
-                'time': file_processing_time,
-                'status': 'success' if success else 'error' if error_files > 0 else 'skipped'
-            })
+            file_status = 'success' if success else 'error' if error_files > errors_before else 'skipped'
+            peak_mb = get_peak_rss_mb()
+            report.add(file, file_status, file_processing_time, peak_mb)
+            if file_status != 'skipped':
+                config.index.record_render(step_path, file_status, round(file_processing_time, 3), peak_mb)
+            checkpoint.mark(step_path, file_status)
+            config.metrics.file_done(file_status, file_processing_time)
+            profile_paths = config.profiler.stop(class_, file_processing_time, file_status)
+            if profile_paths:
+                logger.log(f"  [性能分析] 已保存 {profile_paths[0]}")
+            logger.event("stage", file=step_path, stage="file", status=file_status,
+                         duration=round(file_processing_time, 3))
             
             logger.log(f"  处理时间: {format_time(file_processing_time)}")
             logger.log(f"  累计时间: {format_time(total_processing_time)}")
             
-            # 估算剩余时间
+            # 估算剩余时间（不含从检查点跳过和其他进程正在处理的文件）
             if file_idx < total_files:
-                avg_time_per_file = total_processing_time / file_idx
+                avg_time_per_file = total_processing_time / (file_idx - resumed_files - locked_files)
                 remaining_files = total_files - file_idx
                 estimated_remaining_time = avg_time_per_file * remaining_files
                 logger.log(f"  预计剩余时间: {format_time(estimated_remaining_time)}")
@@ -371,6 +577,14 @@ def make_multiview_dataset_with_timing_and_logging(config):
             # 清理内存
             gc.collect()
         
+        if model_lock is not None:
+            model_lock.release()
+            model_lock = None
+        
+        # 整批完成，删除检查点（有文件正被其他进程处理或推迟到下次运行时保留，下次运行再检查）
+        if locked_files == 0 and not config.budget.deferred:
+            checkpoint.complete()
+        
         # 计算总时间
         total_end_time = time.time()
         total_time = total_end_time - total_start_time
@@ -385,27 +599,21 @@ def make_multiview_dataset_with_timing_and_logging(config):
         logger.log(f"总文件数: {total_files}")
         logger.log(f"成功处理: {processed_files}")
         logger.log(f"跳过文件: {skipped_files}")
+        if resumed_files:
+            logger.log(f"检查点中已完成: {resumed_files}")
+        if locked_files:
+            logger.log(f"其他进程处理中: {locked_files}")
         logger.log(f"错误文件: {error_files}")
         logger.log(f"成功率: {(processed_files/total_files*100):.1f}%" if total_files > 0 else "0%")
+        logger.event("run_end", duration=round(total_time, 3), total_files=total_files,
+                     processed=processed_files, skipped=skipped_files, errors=error_files,
+                     locked=locked_files, deferred=config.budget.deferred)
         
-        if processed_files > 0:
-            avg_time = total_processing_time / processed_files
-            logger.log(f"平均处理时间: {format_time(avg_time)}")
-            
-            # 显示最快和最慢的文件
-            if file_times:
-                successful_times = [ft for ft in file_times if ft['status'] == 'success']
-                if successful_times:
-                    fastest = min(successful_times, key=lambda x: x['time'])
-                    slowest = max(successful_times, key=lambda x: x['time'])
-                    logger.log(f"最快文件: {fastest['file']} ({format_time(fastest['time'])})")
-                    logger.log(f"最慢文件: {slowest['file']} ({format_time(slowest['time'])})")
+        # 成功文件的耗时统计（逐文件结果已在处理过程中写入结果文件）
+        log_run_report(logger.log, report)
+        log_deferred(logger.log, config.budget)
         
-        logger.log("-" * 80)
-        logger.log("处理时间详情:")
-        for ft in file_times:
-            status_symbol = "✓" if ft['status'] == 'success' else "✗" if ft['status'] == 'error' else "-"
-            logger.log(f"  {status_symbol} {ft['file']}: {format_time(ft['time'])}")
+        log_profile_summary(logger.log, config.profiler.summary(), config.profiler)
         
         logger.log("=" * 80)
         
@@ -415,9 +623,16 @@ def make_multiview_dataset_with_timing_and_logging(config):
         logger.log(f"错误详情: {traceback.format_exc()}")
     
     finally:
+        # 中断时保留检查点，下次运行从这里继续
+        if checkpoint is not None:
+            checkpoint.close()
+        if model_lock is not None:
+            model_lock.release()
+        report.close()
         # 关闭日志记录器
         logger.close()
         print(f"\n日志已保存到: {logger.log_file}")
+        print(f"事件已保存到: {logger.events_file}")
 
 def make_multiview_dataset_with_timing(config):
     """
@@ -425,7 +640,7 @@ def make_multiview_dataset_with_timing(config):
     增加时间统计功能
     """
     # 获取配置路径
-    models_dir_path = config.input_dir
+    models_dir_path = ", ".join(config.get_input_roots())
     mvcnn_images_dir_path = config.output_dir
     
     # 记录总体开始时间
@@ -454,53 +669,116 @@ def make_multiview_dataset_with_timing(config):
     if not os.path.exists(mvcnn_images_dir_path):
         os.makedirs(mvcnn_images_dir_path)
         print("创建输出目录")
+    removed = cleanup_stale_staging(mvcnn_images_dir_path)
+    if removed:
+        print(f"清理上次中断遗留的不完整输出: {removed}")
     
     # 获取所有.stp文件（不区分大小写）
-    stp_files = [f for f in os.listdir(models_dir_path) if f.lower().endswith((".stp", ".step"))]
+    stp_files = config.scan_inputs()
     total_files = len(stp_files)
     
+    # 从检查点继续：已处理的文件不再检查输出
+    checkpoint, done_files = config.open_checkpoint()
+    if checkpoint.busy:
+        print(f"检查点正被其他进程使用，本次运行不记录检查点 ({config.checkpoint_path})")
+    elif checkpoint.resumed:
+        print(f"从检查点继续: 已完成 {len(done_files)} 个文件 ({config.checkpoint_path})")
+    
+    stp_files = config.plan_budget(stp_files)
+    config.budget.start(total_start_time)
+    
     print(f"找到 {total_files} 个STEP文件")
+    log_budget_plan(print, config.budget, stp_files, done_files)
     print("-" * 80)
     
     # 统计变量
     processed_files = 0
     skipped_files = 0
     error_files = 0
+    resumed_files = 0
+    locked_files = 0
     total_processing_time = 0
-    file_times = []
+    report = RunReport()
+    model_lock = None
     
     # 处理每个文件
-    for file_idx, file in enumerate(stp_files, 1):
+    for file_idx, (step_path, class_) in enumerate(stp_files, 1):
+        # 上一个文件的模型锁在这里释放（包括中途 continue 的情况）
+        if model_lock is not None:
+            model_lock.release()
+            model_lock = None
+        
+        if step_path in done_files:
+            resumed_files += 1
+            config.metrics.file_done("resumed")
+            continue
+        
+        # 时间预算已关闭：还没有输出的文件直接推迟
+        if config.budget.closed and (config.force_reprocess or not view_set_exists(os.path.join(
+                label_output_dir(mvcnn_images_dir_path, class_), f"{label_stem(class_)}.jpeg"))):
+            defer_file(config, report, step_path, os.path.basename(step_path))
+            continue
+        
         # 记录单个文件开始时间
         file_start_time = time.time()
+        reset_peak_rss()
+        config.profiler.start()
         
         # 初始化状态变量
         success = False
         
-        # 从文件名中提取类别名（不含扩展名）
-        class_ = os.path.splitext(file)[0]
+        # 类别名（标签）来自扫描结果：文件名不含扩展名，递归扫描时带子目录命名空间
+        file = os.path.basename(step_path)
+        errors_before = error_files
         
         print(f"[{file_idx}/{total_files}] 处理模型: {file}")
         print(f"  开始时间: {datetime.datetime.now().strftime('%H:%M:%S')}")
         
-        # 为每个.stp文件创建对应的输出子目录
-        output_subdir = os.path.join(mvcnn_images_dir_path, class_)
-        if not os.path.exists(output_subdir):
-            os.makedirs(output_subdir)
+        # 每个.stp文件对应的输出子目录（渲染完成后由暂存目录重命名而来）
+        output_subdir = label_output_dir(mvcnn_images_dir_path, class_)
         
         # 设置输出图片的基本名称
-        img_name = os.path.join(output_subdir, f"{class_}.jpeg")
+        img_name = os.path.join(output_subdir, f"{label_stem(class_)}.jpeg")
         
         # 检查是否已经生成了图片（只检查第一个视角）
         # 如果force_reprocess为True，则强制重新处理
-        first_view_exists = os.path.exists(img_name.replace(".jpeg", "_0.jpeg"))
-        if not first_view_exists or config.force_reprocess:
+        first_view_exists = view_set_exists(img_name)
+        needs_render = not first_view_exists or config.force_reprocess
+        if needs_render and not config.budget.fits(step_path):
+            # 按预测耗时升序处理，这个文件放不下时之后的文件也放不下
+            cost = defer_file(config, report, step_path, file)
+            config.profiler.stop(class_, 0, "skipped")
+            print(f"  - 推迟 (预测耗时 {format_time(cost)}, 时间预算剩余 "
+                  f"{format_time(config.budget.remaining())})，其余未处理的文件推迟到下次运行")
+            continue
+        if needs_render:
+            # 多个进程共用输出目录时按模型加锁划分任务，拿不到锁说明其他进程正在处理
+            model_lock = model_output_lock(mvcnn_images_dir_path, class_)
+            if not model_lock.acquire():
+                model_lock = None
+                locked_files += 1
+                config.metrics.file_done("locked")
+                print(f"  - 跳过 (其他进程正在处理)")
+                continue
+            # 加锁之前其他进程可能刚好完成了这个模型
+            if view_set_exists(img_name, total_start_time if config.force_reprocess else None):
+                needs_render = False
+        # 已隔离且内容未变化的文件直接跳过（需要重试时使用 --retry-quarantine）
+        quarantined = None
+        if needs_render:
+            quarantined = config.index.check_quarantine(step_path)
+        if quarantined is not None:
+            skipped_files += 1
+            print(f"  - 跳过 (已隔离: {quarantined['stage']} 阶段失败 {quarantined['failures']} 次, "
+                  f"{quarantined['error']})")
+        elif needs_render:
             if first_view_exists and config.force_reprocess:
                 print(f"  ⚠ 图片已存在，强制重新处理")
             try:
                 # 读取STEP文件
                 step_reader = STEPControl_Reader()
-                status = step_reader.ReadFile(os.path.join(models_dir_path, file))
+                with staged_step_file(step_path) as read_path:
+                    status = step_reader.ReadFile(read_path)
                 
                 if status == IFSelect_RetDone:  # 检查状态
                     failsonly = False
@@ -513,51 +791,64 @@ def make_multiview_dataset_with_timing(config):
                     
                     if _nbs == 0:
                         print(f"  错误: STEP文件中没有形状 {file}")
+                        config.index.quarantine_file(step_path, "transfer", "no shapes")
                         error_files += 1
-                        continue
+                        raise StepReadError(f"STEP文件中没有形状 {file}", stage="transfer")
                     
                     # 获取合并后的形状
                     aResShape = step_reader.OneShape()
                 else:
                     print(f"  错误: 无法读取文件 {file}")
+                    config.index.quarantine_file(step_path, "read", "ReadFile failed")
                     error_files += 1
-                    continue
+                    raise StepReadError(f"无法读取文件 {file}", stage="read")
                 
                 # 尝试不同的显示后端
                 backends = ["pyqt5", "pyqt6", "pyside2"]
                 success = False
                 
-                for backend in backends:
-                    try:
-                        # 清理内存
-                        gc.collect()
-                        
-                        # 初始化显示
-                        display, start_display, add_menu, add_function_to_menu = init_display(backend_str=backend)
-                        
-                        # 显示形状
-                        display.DisplayShape(aResShape, update=True)
-                        
-                        # 生成多视角图片
-                        animate_viewpoint2(display=display, img_name=img_name)
-                        
-                        success = True
-                        break
-                        
-                    except Exception as e:
-                        print(f"    后端 {backend} 失败: {str(e)}")
-                        continue
-                
-                if success:
-                    processed_files += 1
-                    print(f"  ✓ 成功生成多视角图片")
-                else:
-                    error_files += 1
-                    print(f"  ✗ 所有后端都失败了")
+                # 视角图片先写入暂存目录，全部完成后整体重命名到输出子目录
+                with ModelOutputStaging(mvcnn_images_dir_path, output_subdir) as staging:
+                    for backend in backends:
+                        try:
+                            # 清理内存
+                            gc.collect()
+                            
+                            # 初始化显示
+                            display, start_display, add_menu, add_function_to_menu = init_display(backend_str=backend)
+                            
+                            # 显示形状
+                            display.DisplayShape(aResShape, update=True)
+                            
+                            # 生成多视角图片
+                            animate_viewpoint2(display=display, img_name=staging.img_name(label_stem(class_)))
+                            
+                            success = True
+                            break
+                            
+                        except Exception as e:
+                            print(f"    后端 {backend} 失败: {str(e)}")
+                            continue
                     
+                    if success:
+                        write_render_manifest(staging.path, step_path,
+                                              time.time() - file_start_time, shapes=_nbs)
+                        staging.commit()
+                        processed_files += 1
+                        print(f"  ✓ 成功生成多视角图片")
+                    else:
+                        error_files += 1
+                        print(f"  ✗ 所有后端都失败了")
+                        config.index.quarantine_file(step_path, "render", "all backends failed")
+                    
+            except StepReadError:
+                # 读取/传输失败已输出和隔离，与其他文件一样进入下面的逐文件统计
+                success = False
             except Exception as e:
+                success = False
                 error_files += 1
                 print(f"  ✗ 处理错误: {str(e)}")
+                config.index.quarantine_file(step_path, "process", str(e))
         else:
             skipped_files += 1
             print(f"  - 跳过 (图片已存在)")
@@ -567,18 +858,23 @@ def make_multiview_dataset_with_timing(config):
         file_processing_time = file_end_time - file_start_time
         total_processing_time += file_processing_time
         
-        file_times.append({
-            'file': file,
-            'time': file_processing_time,
-            'status': 'success' if success else 'error' if error_files > 0 else 'skipped'
-        })
+        file_status = 'success' if success else 'error' if error_files > errors_before else 'skipped'
+        peak_mb = get_peak_rss_mb()
+        report.add(file, file_status, file_processing_time, peak_mb)
+        if file_status != 'skipped':
+            config.index.record_render(step_path, file_status, round(file_processing_time, 3), peak_mb)
+        checkpoint.mark(step_path, file_status)
+        config.metrics.file_done(file_status, file_processing_time)
+        profile_paths = config.profiler.stop(class_, file_processing_time, file_status)
+        if profile_paths:
+            print(f"  [性能分析] 已保存 {profile_paths[0]}")
         
         print(f"  处理时间: {format_time(file_processing_time)}")
         print(f"  累计时间: {format_time(total_processing_time)}")
         
-        # 估算剩余时间
+        # 估算剩余时间（不含从检查点跳过和其他进程正在处理的文件）
         if file_idx < total_files:
-            avg_time_per_file = total_processing_time / file_idx
+            avg_time_per_file = total_processing_time / (file_idx - resumed_files - locked_files)
             remaining_files = total_files - file_idx
             estimated_remaining_time = avg_time_per_file * remaining_files
             print(f"  预计剩余时间: {format_time(estimated_remaining_time)}")
@@ -588,6 +884,15 @@ def make_multiview_dataset_with_timing(config):
         # 清理内存
         gc.collect()
     
+    if model_lock is not None:
+        model_lock.release()
+    
+    # 整批完成，删除检查点（有文件正被其他进程处理或推迟到下次运行时保留，下次运行再检查）
+    if locked_files == 0 and not config.budget.deferred:
+        checkpoint.complete()
+    else:
+        checkpoint.close()
+    
     # 计算总时间
     total_end_time = time.time()
     total_time = total_end_time - total_start_time
@@ -602,27 +907,18 @@ def make_multiview_dataset_with_timing(config):
     print(f"总文件数: {total_files}")
     print(f"成功处理: {processed_files}")
     print(f"跳过文件: {skipped_files}")
+    if resumed_files:
+        print(f"检查点中已完成: {resumed_files}")
+    if locked_files:
+        print(f"其他进程处理中: {locked_files}")
     print(f"错误文件: {error_files}")
     print(f"成功率: {(processed_files/total_files*100):.1f}%" if total_files > 0 else "0%")
     
-    if processed_files > 0:
-        avg_time = total_processing_time / processed_files
-        print(f"平均处理时间: {format_time(avg_time)}")
-        
-        # 显示最快和最慢的文件
-        if file_times:
-            successful_times = [ft for ft in file_times if ft['status'] == 'success']
-            if successful_times:
-                fastest = min(successful_times, key=lambda x: x['time'])
-                slowest = max(successful_times, key=lambda x: x['time'])
-                print(f"最快文件: {fastest['file']} ({format_time(fastest['time'])})")
-                print(f"最慢文件: {slowest['file']} ({format_time(slowest['time'])})")
+    # 成功文件的耗时统计
+    log_run_report(print, report)
+    log_deferred(print, config.budget)
     
-    print("-" * 80)
-    print("处理时间详情:")
-    for ft in file_times:
-        status_symbol = "✓" if ft['status'] == 'success' else "✗" if ft['status'] == 'error' else "-"
-        print(f"  {status_symbol} {ft['file']}: {format_time(ft['time'])}")
+    log_profile_summary(print, config.profiler.summary(), config.profiler)
     
     print("=" * 80)
 
@@ -631,7 +927,7 @@ def make_multiview_dataset_simple_timing(config):
     简化版本的时间统计
     """
     # 获取配置路径
-    models_dir_path = config.input_dir
+    models_dir_path = ", ".join(config.get_input_roots())
     mvcnn_images_dir_path = config.output_dir
     
     total_start_time = time.time()
@@ -652,34 +948,69 @@ def make_multiview_dataset_simple_timing(config):
     # 确保输出目录存在
     if not os.path.exists(mvcnn_images_dir_path):
         os.makedirs(mvcnn_images_dir_path)
+    cleanup_stale_staging(mvcnn_images_dir_path)
     
     # 获取所有.stp文件（不区分大小写）
-    stp_files = [f for f in os.listdir(models_dir_path) if f.lower().endswith((".stp", ".step"))]
+    stp_files = config.scan_inputs()
     total_files = len(stp_files)
     
+    checkpoint, done_files = config.open_checkpoint()
+    if checkpoint.resumed:
+        print(f"从检查点继续: 已完成 {len(done_files)} 个文件")
+    
     print(f"找到 {total_files} 个STEP文件")
     
     processed_files = 0
     skipped_files = 0
     error_files = 0
+    locked_files = 0
+    model_lock = None
     
-    for file_idx, file in enumerate(stp_files, 1):
+    for file_idx, (step_path, class_) in enumerate(stp_files, 1):
+        if model_lock is not None:
+            model_lock.release()
+            model_lock = None
+        if step_path in done_files:
+            config.metrics.file_done("resumed")
+            continue
+        
         file_start_time = time.time()
+        reset_peak_rss()
+        config.profiler.start()
         
-        class_ = os.path.splitext(file)[0]
+        file = os.path.basename(step_path)
+        errors_before = error_files
+        skipped_before = skipped_files
         print(f"[{file_idx}/{total_files}] 处理: {file}")
         
-        output_subdir = os.path.join(mvcnn_images_dir_path, class_)
-        if not os.path.exists(output_subdir):
-            os.makedirs(output_subdir)
+        output_subdir = label_output_dir(mvcnn_images_dir_path, class_)
         
-        img_name = os.path.join(output_subdir, f"{class_}.jpeg")
+        img_name = os.path.join(output_subdir, f"{label_stem(class_)}.jpeg")
         
-        if not os.path.exists(img_name.replace(".jpeg", "_0.jpeg")):
+        needs_render = not view_set_exists(img_name)
+        if needs_render:
+            # 按模型加锁，与其他进程划分任务
+            model_lock = model_output_lock(mvcnn_images_dir_path, class_)
+            if not model_lock.acquire():
+                model_lock = None
+                locked_files += 1
+                config.metrics.file_done("locked")
+                print(f"  - 跳过 (其他进程正在处理)")
+                continue
+            needs_render = not view_set_exists(img_name)
+        
+        quarantined = None
+        if needs_render:
+            quarantined = config.index.check_quarantine(step_path)
+        if quarantined is not None:
+            skipped_files += 1
+            print(f"  - 跳过 (已隔离)")
+        elif needs_render:
             try:
                 # 读取STEP文件
                 step_reader = STEPControl_Reader()
-                status = step_reader.ReadFile(os.path.join(models_dir_path, file))
+                with staged_step_file(step_path) as read_path:
+                    status = step_reader.ReadFile(read_path)
                 
                 if status == IFSelect_RetDone:
                     # 传输所有根实体
@@ -688,8 +1019,9 @@ def make_multiview_dataset_simple_timing(config):
                     
                     if _nbs == 0:
                         print(f"  错误: STEP文件中没有形状 {file}")
+                        config.index.quarantine_file(step_path, "transfer", "no shapes")
                         error_files += 1
-                        continue
+                        raise StepReadError(f"STEP文件中没有形状 {file}", stage="transfer")
                     
                     # 获取合并后的形状
                     aResShape = step_reader.OneShape()
@@ -698,29 +1030,464 @@ def make_multiview_dataset_simple_timing(config):
                     display, start_display, add_menu, add_function_to_menu = init_display()
                     display.DisplayShape(aResShape, update=True)
                     
-                    # 生成多视角图片
-                    animate_viewpoint2(display=display, img_name=img_name)
+                    # 生成多视角图片（写入暂存目录，完成后整体重命名到输出子目录）
+                    with ModelOutputStaging(mvcnn_images_dir_path, output_subdir) as staging:
+                        animate_viewpoint2(display=display, img_name=staging.img_name(label_stem(class_)))
+                        write_render_manifest(staging.path, step_path,
+                                              time.time() - file_start_time, shapes=_nbs)
+                        staging.commit()
                     
                     processed_files += 1
                     print(f"  ✓ 成功")
                 else:
                     error_files += 1
                     print(f"  ✗ 读取失败")
+                    config.index.quarantine_file(step_path, "read", "ReadFile failed")
                     
+            except StepReadError:
+                # 没有形状：已输出和隔离，与其他文件一样进入下面的逐文件统计
+                pass
             except Exception as e:
                 error_files += 1
                 print(f"  ✗ 错误: {str(e)}")
+                config.index.quarantine_file(step_path, "process", str(e))
         else:
             skipped_files += 1
             print(f"  - 跳过")
         
         file_time = time.time() - file_start_time
         print(f"  时间: {format_time(file_time)}")
+        if skipped_files == skipped_before:
+            file_status = 'error' if error_files > errors_before else 'success'
+            config.index.record_render(step_path, file_status, round(file_time, 3), get_peak_rss_mb())
+        else:
+            file_status = 'skipped'
+        checkpoint.mark(step_path, file_status)
+        config.metrics.file_done(file_status, file_time)
+        profile_paths = config.profiler.stop(class_, file_time, file_status)
+        if profile_paths:
+            print(f"  [性能分析] 已保存 {profile_paths[0]}")
     
+    if model_lock is not None:
+        model_lock.release()
+    if locked_files == 0:
+        checkpoint.complete()
+    else:
+        checkpoint.close()
     total_time = time.time() - total_start_time
     
     print(f"\n完成! 总时间: {format_time(total_time)}")
-    print(f"成功: {processed_files}, 跳过: {skipped_files}, 错误: {error_files}")
+    print(f"成功: {processed_files}, 跳过: {skipped_files}, 错误: {error_files}, 其他进程处理中: {locked_files}")
+    log_profile_summary(print, config.profiler.summary(), config.profiler)
+
+def make_multiview_dataset_parallel(config, workers=None, memory_limit_mb=None, tile=1,
+                                    tile_max_kb=DEFAULT_TILE_MAX_KB):
+    """
+    多进程并行渲染：常驻渲染进程复用显示，资源调度器根据CPU核数、可用内存和
+    历史记录中每个文件的峰值内存决定同时渲染的文件数，并在运行中动态调整
+    tile 大于1时启用拼图渲染：不超过 tile_max_kb 的小文件最多 tile 个一批交给同一个进程，在一个场景中一起绘制
+    """
+    models_dir_path = ", ".join(config.get_input_roots())
+    mvcnn_images_dir_path = config.output_dir
+    
+    logger = Logger(config.log_dir, events=True)
+    logger.add_listener(config.metrics.observe_event)
+    report = RunReport(run_report_path(logger))
+    checkpoint = None
+    pool = []
+    in_flight = {}
+    
+    try:
+        total_start_time = time.time()
+        
+        logger.log("=" * 80)
+        logger.log(f"多视角图像生成工具 - 并行渲染 (运行模式: {config.mode.upper()})")
+        logger.log("=" * 80)
+        logger.log(f"开始时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.log(f"强制重新处理: {'是' if config.force_reprocess else '否'}")
+        logger.log(f"输入目录: {models_dir_path}")
+        logger.log(f"输出目录: {mvcnn_images_dir_path}")
+        logger.log(f"日志目录: {config.log_dir}")
+        logger.log("-" * 80)
+        
+        is_valid, message = config.validate_input_directory()
+        if not is_valid:
+            logger.log(f"错误: {message}")
+            return
+        logger.log(message)
+        
+        if not os.path.exists(mvcnn_images_dir_path):
+            os.makedirs(mvcnn_images_dir_path)
+        removed = cleanup_stale_staging(mvcnn_images_dir_path)
+        if removed:
+            logger.log(f"清理上次中断遗留的不完整输出: {removed}")
+        
+        stp_files = config.scan_inputs()
+        total_files = len(stp_files)
+        
+        checkpoint, done_files = config.open_checkpoint()
+        if checkpoint.busy:
+            logger.log(f"检查点正被其他进程使用，本次运行不记录检查点 ({config.checkpoint_path})")
+        elif checkpoint.resumed:
+            logger.log(f"从检查点继续: 已完成 {len(done_files)} 个文件 ({config.checkpoint_path})")
+        
+        # 资源调度：从文件索引的历史记录学习每个文件的峰值内存
+        governor = ResourceGovernor(max_workers=workers, memory_limit_mb=memory_limit_mb, logger=logger)
+        governor.learn(config.index.records(config.get_input_roots()))
+        governor.startup()
+        
+        stp_files = config.plan_budget(stp_files)
+        config.budget.start(total_start_time)
+        log_budget_plan(logger.log, config.budget, stp_files, done_files, workers=governor.limit)
+        
+        # 拼图渲染：小文件排在前面，连续派发时才能凑满批次（启用时间预算时保持预算的顺序）
+        tiled = tile > 1
+        tile_max_bytes = tile_max_kb * 1024
+        if tiled:
+            sizes = {record['path']: record['size'] or 0 for record in config.index.records(config.get_input_roots())}
+            small = [entry for entry in stp_files if sizes.get(entry[0], 0) <= tile_max_bytes]
+            if not config.budget.enabled:
+                stp_files = small + [entry for entry in stp_files if sizes.get(entry[0], 0) > tile_max_bytes]
+            logger.log(f"拼图渲染: 每批最多 {tile} 个模型, 小文件 (<= {tile_max_kb} KB) {len(small)} 个")
+        
+        logger.event("run_start", mode=config.mode, input_dir=models_dir_path,
+                     output_dir=mvcnn_images_dir_path, total_files=total_files,
+                     force_reprocess=config.force_reprocess, resumed=len(done_files),
+                     shard=f"{config.shard[0]}/{config.shard[1]}" if config.shard else None,
+                     workers=governor.max_workers)
+        
+        ctx = multiprocessing.get_context("spawn")
+        result_queue = ctx.Queue()
+        # 渲染进程的后端日志和 read / render 阶段事件经日志队列写入本次运行的日志和事件文件
+        log_queue = logger.process_queue()
+        # 性能分析在各渲染进程中进行，每个进程各自按阈值/分位数保留最慢的文件
+        profile_options = config.profiler.options() if config.profiler.enabled else None
+        kept_profiles = []
+        pool = [start_render_worker(ctx, result_queue, i, profile=profile_options, tiled=tiled,
+                                    output_root=mvcnn_images_dir_path, log_queue=log_queue)
+                for i in range(governor.max_workers)]
+        logger.log(f"已启动 {len(pool)} 个渲染进程")
+        logger.log("-" * 80)
+        
+        processed_files = 0
+        skipped_files = 0
+        error_files = 0
+        resumed_files = 0
+        locked_files = 0
+        finished_files = 0
+        total_processing_time = 0
+        pending = collections.deque(stp_files)
+        waiting_for = None
+        next_job_id = 0
+        # 正在收集的拼图批次及其进程；拼图批次的渲染进程异常退出后，批次中的文件改为单独渲染
+        batch = []
+        batch_worker = None
+        solo_paths = set()
+        
+        def send_batch():
+            """
+            把收集的任务批次交给所属进程
+            """
+            nonlocal batch, batch_worker
+            if batch:
+                batch_worker['tasks'].put(batch)
+                if len(batch) > 1:
+                    logger.log(f"拼图渲染 {len(batch)} 个模型 (进程 {batch_worker['no']})")
+            batch = []
+            batch_worker = None
+        
+        def receive_result(timeout):
+            """
+            从结果队列取一个结果；超时或结果无法读取（渲染进程在写入途中被终止）时返回 None
+            """
+            try:
+                return result_queue.get(timeout=max(timeout, 0.01))
+            except queue.Empty:
+                return None
+            except Exception as e:
+                logger.log(f"  读取渲染结果失败: {str(e)}")
+                return None
+        
+        def finish(job_id, status, detail, render_time):
+            """
+            一个文件渲染结束：更新统计、索引、隔离表和检查点
+            """
+            nonlocal processed_files, error_files, finished_files, total_processing_time
+            job = in_flight.pop(job_id)
+            worker_jobs = pool[job['worker']]['job']
+            worker_jobs.remove(job_id)
+            if not worker_jobs:
+                pool[job['worker']]['job'] = None
+            peak_mb = detail.get('peak_rss_mb')
+            # 拼图批次的峰值内存属于整个批次，不作为单个文件的内存记录；批次的最后一个模型完成时释放并发
+            file_peak_mb = None if detail.get('tiled') else peak_mb
+            if not any(other['batch'] == job['batch'] for other in in_flight.values()):
+                governor.release(job['batch'], job['path'], job['size'], file_peak_mb)
+            finished_files += 1
+            total_processing_time += render_time
+            
+            if status == "success":
+                processed_files += 1
+                logger.log(f"  ✓ {job['file']}: {format_time(render_time)}"
+                           + (f", 峰值内存 {peak_mb:.0f} MB (预测 {job['predicted']:.0f})" if peak_mb else ""))
+            else:
+                error_files += 1
+                stage = detail.get('stage', "render")
+                logger.log(f"  ✗ {job['file']}: {stage} 阶段失败 - {detail.get('error')}")
+                config.index.quarantine_file(job['path'], stage, detail.get('error'))
+            
+            config.index.record_render(job['path'], status, round(render_time, 3), file_peak_mb)
+            checkpoint.mark(job['path'], status)
+            config.metrics.file_done(status, render_time)
+            job['lock'].release()
+            report.add(job['file'], status, render_time, peak_mb)
+            if detail.get('topology'):
+                logger.debug(f"    拓扑: {format_topology(detail['topology'])}")
+                logger.event("stage", file=job['path'], stage="topology", status="success",
+                             duration=detail.get('topology_seconds'), **detail['topology'])
+            if detail.get('profile'):
+                kept_profiles.append((render_time, job['file'], detail['profile']))
+                logger.log(f"  [性能分析] 已保存 {detail['profile'][0]}")
+            logger.event("stage", file=job['path'], stage="file", status=status,
+                         duration=round(render_time, 3), worker=job['worker'],
+                         predicted_mb=round(job['predicted']), peak_rss_mb=peak_mb,
+                         concurrency=len(in_flight) + 1, limit=governor.limit)
+            
+            remaining = len(pending) + len(in_flight)
+            elapsed = time.time() - total_start_time
+            logger.log(f"  进度: 完成 {finished_files}, 剩余 {remaining}, 并发 {len(governor.running)}/{governor.limit}, "
+                       f"预计剩余时间: {format_time(elapsed / finished_files * remaining)}")
+        
+        while pending or in_flight:
+            # 派发：有空闲进程且调度器允许时启动下一个文件
+            while pending:
+                idle = [worker for worker in pool if worker['job'] is None]
+                if not idle and batch_worker is None:
+                    break
+                step_path, class_ = pending[0]
+                file = os.path.basename(step_path)
+                if step_path in done_files:
+                    pending.popleft()
+                    resumed_files += 1
+                    config.metrics.file_done("resumed")
+                    continue
+                
+                output_subdir = label_output_dir(mvcnn_images_dir_path, class_)
+                img_name = os.path.join(output_subdir, f"{label_stem(class_)}.jpeg")
+                if view_set_exists(img_name) and not config.force_reprocess:
+                    pending.popleft()
+                    skipped_files += 1
+                    checkpoint.mark(step_path, "skipped")
+                    config.metrics.file_done("skipped")
+                    continue
+                if not config.budget.fits(step_path):
+                    # 按预测耗时升序派发，这个文件放不下时之后的文件也放不下
+                    pending.popleft()
+                    if not config.budget.deferred:
+                        logger.log(f"时间预算剩余 {format_time(config.budget.remaining())}，不足以完成 {file} "
+                                   f"(预测耗时 {format_time(config.budget.costs.get(step_path, 0))})，"
+                                   f"不再派发新文件，其余文件推迟到下次运行")
+                    defer_file(config, report, step_path, file)
+                    continue
+                
+                record = config.index.get(step_path)
+                size = record['size'] if record else 0
+                predicted = governor.predict(step_path, size)
+                small = tiled and size <= tile_max_bytes and step_path not in solo_paths
+                if batch and not small:
+                    # 大文件单独渲染：先派发已收集的小文件批次
+                    send_batch()
+                    continue
+                if not batch and not governor.can_admit(predicted):
+                    if waiting_for != step_path:
+                        waiting_for = step_path
+                        governor.wait(file, predicted)
+                    break
+                pending.popleft()
+                
+                model_lock = model_output_lock(mvcnn_images_dir_path, class_)
+                if not model_lock.acquire():
+                    locked_files += 1
+                    config.metrics.file_done("locked")
+                    logger.log(f"  - 跳过 {file} (其他进程正在处理)")
+                    continue
+                if view_set_exists(img_name, total_start_time if config.force_reprocess else None):
+                    model_lock.release()
+                    skipped_files += 1
+                    checkpoint.mark(step_path, "skipped")
+                    config.metrics.file_done("skipped")
+                    continue
+                quarantined = config.index.check_quarantine(step_path)
+                if quarantined is not None:
+                    model_lock.release()
+                    skipped_files += 1
+                    logger.log(f"  - 跳过 {file} (已隔离: {quarantined['stage']} 阶段失败 {quarantined['failures']} 次)")
+                    checkpoint.mark(step_path, "skipped")
+                    config.metrics.file_done("skipped")
+                    continue
+                
+                next_job_id += 1
+                worker = batch_worker if batch_worker is not None else idle[0]
+                if worker['job'] is None:
+                    worker['job'] = []
+                worker['job'].append(next_job_id)
+                # 资源调度按批次计：批次的第一个任务占用并发，之后加入的模型只更新批次的预测内存
+                batch_id = batch[0][0] if batch else next_job_id
+                if batch:
+                    governor.extend(batch_id, predicted)
+                else:
+                    governor.admit(batch_id, predicted)
+                batch.append((next_job_id, step_path, output_subdir))
+                batch_worker = worker
+                in_flight[next_job_id] = {'path': step_path, 'class_': class_, 'file': file, 'size': size,
+                                          'lock': model_lock, 'worker': worker['no'], 'batch': batch_id,
+                                          'predicted': predicted, 'start': time.time()}
+                logger.log(f"开始: {file} (进程 {worker['no']}, 预测内存 {predicted:.0f} MB, "
+                           f"并发 {len(governor.running)}/{governor.limit})")
+                if not small or len(batch) >= tile:
+                    send_batch()
+            send_batch()
+            
+            # 回收结果
+            result = receive_result(0.5)
+            if result is not None and result[0] in in_flight:
+                finish(*result)
+            
+            # 渲染进程异常退出（通常是内存不足被杀）：记为失败并重启该进程
+            for worker in pool:
+                if worker['job'] is not None and not worker['process'].is_alive():
+                    if len(worker['job']) > 1:
+                        # 拼图批次无法确定是哪个模型导致的，批次中的文件放回队首逐个重新渲染
+                        for job_id in reversed(worker['job']):
+                            job = in_flight.pop(job_id)
+                            governor.release(job['batch'], job['path'], job['size'], None)
+                            job['lock'].release()
+                            solo_paths.add(job['path'])
+                            pending.appendleft((job['path'], job['class_']))
+                        logger.log(f"  拼图渲染进程 {worker['no']} 异常退出 (exitcode {worker['process'].exitcode})，"
+                                   f"{len(worker['job'])} 个模型改为单独渲染")
+                        worker['job'] = None
+                    else:
+                        job_id = worker['job'][0]
+                        job = in_flight[job_id]
+                        governor.lost(job['batch'], job['path'], job['file'])
+                        finish(job_id, "error", {'stage': "process",
+                                                 'error': f"渲染进程异常退出 (exitcode {worker['process'].exitcode})"},
+                               time.time() - job['start'])
+                    pool[worker['no']] = start_render_worker(ctx, result_queue, worker['no'], profile=profile_options,
+                                                             tiled=tiled, output_root=mvcnn_images_dir_path,
+                                                             log_queue=log_queue)
+            
+            # 时间预算用完：不再派发新文件（预算已关闭），先在宽限时间内等待正在渲染的文件完成，
+            # 再中止仍未完成的文件并推迟到下次运行（输出写在暂存目录，不会留下不完整的模型）。
+            # 渲染进程共用结果队列，被终止的进程可能正在写入结果，所以终止之后不再读取结果
+            if in_flight and config.budget.expired():
+                logger.log(f"时间预算用完，等待 {len(in_flight)} 个正在渲染的文件 (最多 {EXPIRY_GRACE_SECONDS:.0f}秒)")
+                grace_end = time.time() + EXPIRY_GRACE_SECONDS
+                while in_flight and time.time() < grace_end:
+                    result = receive_result(grace_end - time.time())
+                    if result is not None and result[0] in in_flight:
+                        finish(*result)
+                for worker in pool:
+                    if worker['job'] is None:
+                        continue
+                    worker['process'].terminate()
+                    for job_id in worker['job']:
+                        job = in_flight.pop(job_id)
+                        governor.release(job['batch'], job['path'], job['size'], None)
+                        job['lock'].release()
+                        defer_file(config, report, job['path'], job['file'])
+                        logger.log(f"  - 中止 {job['file']}: 时间预算用完 (已渲染 {format_time(time.time() - job['start'])})")
+                        logger.event("stage", file=job['path'], stage="file", status="deferred",
+                                     duration=round(time.time() - job['start'], 3), worker=job['worker'])
+                    worker['job'] = None
+            
+            governor.poll()
+            config.metrics.queue_depth.set(len(pending) + len(in_flight))
+            config.metrics.in_flight.set(len(in_flight))
+            config.metrics.worker_rss.set(round(sum(get_process_stats(worker['process'].pid)[1] or 0
+                                                    for worker in pool), 1))
+        
+        if locked_files == 0 and not config.budget.deferred:
+            checkpoint.complete()
+        
+        total_time = time.time() - total_start_time
+        stats = governor.summary()
+        logger.log("=" * 80)
+        logger.log("处理完成! 详细统计报告")
+        logger.log("=" * 80)
+        logger.log(f"总耗时: {format_time(total_time)}")
+        logger.log(f"总文件数: {total_files}")
+        logger.log(f"成功处理: {processed_files}")
+        logger.log(f"跳过文件: {skipped_files}")
+        if resumed_files:
+            logger.log(f"检查点中已完成: {resumed_files}")
+        if locked_files:
+            logger.log(f"其他进程处理中: {locked_files}")
+        logger.log(f"错误文件: {error_files}")
+        if finished_files:
+            logger.log(f"累计渲染时间: {format_time(total_processing_time)} "
+                       f"(并行加速 {total_processing_time / total_time:.2f}x)")
+        logger.log("-" * 80)
+        logger.log("资源调度:")
+        logger.log(f"  渲染进程: {governor.max_workers}, 最终并发上限: {stats['final_limit']}")
+        logger.log(f"  平均并发: {stats['avg_concurrency']:.2f}, 最大并发: {stats['peak_concurrency']}")
+        logger.log(f"  并发上限调整: {stats['adjustments']} 次, 因内存预算推迟: {stats['waits']} 次")
+        if stats['median_error'] is not None:
+            logger.log(f"  内存预测误差中位数: {stats['median_error'] * 100:.0f}%")
+        logger.event("run_end", duration=round(total_time, 3), total_files=total_files,
+                     processed=processed_files, skipped=skipped_files, errors=error_files,
+                     locked=locked_files, deferred=config.budget.deferred,
+                     avg_concurrency=round(stats['avg_concurrency'], 2),
+                     peak_concurrency=stats['peak_concurrency'], adjustments=stats['adjustments'])
+        
+        log_run_report(logger.log, report)
+        log_deferred(logger.log, config.budget)
+        # 各进程超出保留个数时会删除较快文件的结果
+        kept_profiles = [item for item in kept_profiles if os.path.exists(item[2][0])]
+        log_profile_summary(logger.log, sorted(kept_profiles, reverse=True), config.profiler)
+        logger.log("=" * 80)
+        
+    except Exception as e:
+        logger.log(f"程序执行出错: {str(e)}")
+        import traceback
+        logger.log(f"错误详情: {traceback.format_exc()}")
+    
+    finally:
+        for worker in pool:
+            worker['tasks'].put(None)
+        for worker in pool:
+            worker['process'].join(timeout=10)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+        for job in in_flight.values():
+            job['lock'].release()
+        if checkpoint is not None:
+            checkpoint.close()
+        report.close()
+        logger.close()
+        print(f"\n日志已保存到: {logger.log_file}")
+        print(f"事件已保存到: {logger.events_file}")
+
+def show_quarantine(config):
+    """
+    列出已隔离的文件
+    """
+    config.scan_inputs()
+    records = config.index.list_quarantine(config.get_input_roots())
+    print("=" * 60)
+    print(f"已隔离文件: {len(records)}")
+    print("=" * 60)
+    now = time.time()
+    for record in records:
+        if record['retry_after'] is None:
+            retry = "内容变化或手动重试前跳过"
+        elif record['retry_after'] <= now:
+            retry = "下次运行重试"
+        else:
+            retry = f"{format_time(record['retry_after'] - now)}后重试"
+        print(f"{record['path']}")
+        print(f"  阶段: {record['stage']}, 失败次数: {record['failures']}, 错误: {record['error']}, {retry}")
 
 def show_config_info(config):
     """
@@ -731,20 +1498,33 @@ def show_config_info(config):
     print("=" * 60)
     print(f"运行模式: {config.mode.upper()}")
     print(f"输入目录: {config.input_dir}")
+    for root in config.input_roots:
+        print(f"额外输入根目录: {root}")
+    print(f"递归扫描: {'是' if config.recursive else '否'}")
+    if config.shard is not None:
+        print(f"分片: {config.shard[0]}/{config.shard[1]}")
     print(f"输出目录: {config.output_dir}")
     print(f"日志目录: {config.log_dir}")
+    print(f"文件索引: {config.index_path}")
+    checkpoint_state = "存在，将从中断处继续" if config.resume else "存在，本次忽略并重新开始"
+    print(f"运行检查点: {config.checkpoint_path} ({checkpoint_state if os.path.exists(config.checkpoint_path) else '无'})")
     
     # 检查目录状态
-    input_path = Path(config.input_dir)
     output_path = Path(config.output_dir)
     log_path = Path(config.log_dir)
     
     print("\n目录状态:")
-    print(f"输入目录: {'存在' if input_path.exists() else '不存在'}")
-    if input_path.exists():
-        stp_files = list(input_path.glob("*.stp")) + list(input_path.glob("*.STP")) + \
-                    list(input_path.glob("*.step")) + list(input_path.glob("*.STEP"))
-        print(f"  - STEP文件数量: {len(stp_files)}")
+    for root in config.get_input_roots():
+        print(f"输入目录 {root}: {'存在' if Path(root).exists() else '不存在'}")
+    stp_files = config.scan_inputs()
+    print(f"  - STEP文件数量: {len(stp_files)}")
+    if config.collisions:
+        print(f"  - 重复标签（已忽略）: {len(config.collisions)}")
+    refresh = config.index.last_refresh
+    print(f"  - 文件索引: {config.index_path} (新增 {refresh['added']}, 变化 {refresh['changed']}, 移除 {refresh['removed']})")
+    counts = config.index.status_counts(config.get_input_roots())
+    print(f"  - 上次渲染成功: {counts.get('success', 0)}, 失败: {counts.get('error', 0)}, 未渲染: {counts.get(None, 0)}")
+    print(f"  - 已隔离文件: {len(config.index.list_quarantine(config.get_input_roots()))}")
     
     print(f"输出目录: {'存在' if output_path.exists() else '不存在'}")
     print(f"日志目录: {'存在' if log_path.exists() else '不存在'}")
@@ -752,15 +1532,92 @@ def show_config_info(config):
     print("=" * 60)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多视角图像生成工具")
+    parser.add_argument("mode", nargs="?", help="运行模式 DEBUG / RELEASE，不指定时交互式选择")
+    parser.add_argument("--input-root", action="append", default=[],
+                        help="额外的输入根目录（可多次指定，直接读取，不复制文件）")
+    parser.add_argument("--recursive", action="store_true", help="递归扫描输入根目录，子目录作为类别命名空间")
+    parser.add_argument("--force", action="store_true", help="重新处理已存在的文件")
+    parser.add_argument("--method", choices=["1", "2", "3", "4"], default="1",
+                        help="处理模式: 1 详细时间统计+日志, 2 详细时间统计, 3 简化时间统计, 4 并行渲染")
+    parser.add_argument("--workers", type=int, help="并行渲染的进程数上限，默认为可用CPU核数")
+    parser.add_argument("--memory-limit", type=int, metavar="MB", help="并行渲染可用的内存 (MB)，默认为系统内存")
+    parser.add_argument("--shard", metavar="i/N",
+                        help="只处理第 i 个分片（共 N 个，i 从 0 开始），按标签哈希划分，N 台机器各运行一个分片")
+    parser.add_argument("--no-resume", action="store_true", help="忽略上次中断留下的检查点，从头开始")
+    parser.add_argument("--profile", action="store_true",
+                        help="按文件做性能分析，只保留最慢文件的结果（日志目录下 profiles_<时间>/）")
+    parser.add_argument("--profile-method", choices=PROFILE_METHODS, default="auto",
+                        help="分析方法: cprofile, sample (需要 pyinstrument), auto 有 pyinstrument 时用 sample")
+    parser.add_argument("--profile-threshold", type=float, metavar="SEC", help="保留耗时不少于该秒数的文件")
+    parser.add_argument("--profile-percentile", type=float, metavar="P",
+                        help="保留耗时不低于历史第 P 百分位的文件（未指定阈值时默认 95）")
+    parser.add_argument("--profile-keep", type=int, default=20, metavar="N", help="每个进程最多保留 N 个最慢文件的结果")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="运行期间在 127.0.0.1:PORT/metrics 提供 Prometheus 格式的实时指标")
+    parser.add_argument("--metrics-textfile", metavar="PATH",
+                        help="定期把实时指标写入该文件（node_exporter textfile 格式，原子替换）")
+    parser.add_argument("--metrics-interval", type=float, default=DEFAULT_EXPORT_INTERVAL, metavar="SEC",
+                        help="指标文件的写出间隔（秒，默认 10）")
+    parser.add_argument("--time-budget", metavar="TIME",
+                        help="时间预算（如 8h、90m、1h30m）：按预测耗时从短到长处理，预算内放不下的文件推迟到下次运行"
+                             "（处理模式1/2/4）")
+    parser.add_argument("--tile", type=int, default=1, metavar="K",
+                        help="拼图渲染：小文件每 K 个在一个场景中一起绘制再切分为各自的图片（处理模式4，默认 1 不拼图）")
+    parser.add_argument("--tile-max-kb", type=int, default=DEFAULT_TILE_MAX_KB, metavar="KB",
+                        help=f"参与拼图渲染的文件大小上限 (KB，默认 {DEFAULT_TILE_MAX_KB})")
+    parser.add_argument("--show-quarantine", action="store_true", help="列出已隔离的文件后退出")
+    parser.add_argument("--retry-quarantine", nargs="?", const="all", metavar="STAGE",
+                        help="处理前解除隔离并重试（可指定失败阶段 read/transfer/render/process）")
+    args = parser.parse_args()
+    
+    profile = None
+    if args.profile:
+        if args.profile_percentile is not None and not 0 < args.profile_percentile < 100:
+            parser.error("--profile-percentile 必须在 0 到 100 之间")
+        try:
+            FileProfiler(method=args.profile_method)
+        except ValueError as e:
+            parser.error(str(e))
+        profile = {'method': args.profile_method, 'threshold': args.profile_threshold,
+                   'percentile': args.profile_percentile, 'keep': max(1, args.profile_keep)}
+    
+    if args.metrics_port is not None and not 0 <= args.metrics_port <= 65535:
+        parser.error("--metrics-port 必须在 0 到 65535 之间")
+    if args.metrics_interval <= 0:
+        parser.error("--metrics-interval 必须大于0")
+    if args.tile < 1:
+        parser.error("--tile 必须大于0")
+    if args.tile_max_kb <= 0:
+        parser.error("--tile-max-kb 必须大于0")
+    
+    time_budget = None
+    if args.time_budget:
+        try:
+            time_budget = parse_time_budget(args.time_budget)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    
     print("多视角图像生成工具")
     print("=" * 60)
-    print("运行模式:")
-    print("1. DEBUG模式 - 使用debug_前缀目录")
-    print("2. RELEASE模式 - 使用release_前缀目录")
-    print("3. 显示配置信息")
-    print("=" * 60)
     
-    mode_choice = input("请选择运行模式 (1/2/3): ").strip()
+    if args.mode:
+        mode_choice = {"DEBUG": "1", "RELEASE": "2"}.get(args.mode.upper(), args.mode)
+    else:
+        print("运行模式:")
+        print("1. DEBUG模式 - 使用debug_前缀目录")
+        print("2. RELEASE模式 - 使用release_前缀目录")
+        print("3. 显示配置信息")
+        print("=" * 60)
+        
+        mode_choice = input("请选择运行模式 (1/2/3): ").strip()
     
     if mode_choice == "1":
         mode = "debug"
@@ -769,12 +1626,12 @@ if __name__ == "__main__":
     elif mode_choice == "3":
         # 显示配置信息
         try:
-            config = ConfigManager("debug")
+            config = ConfigManager("debug", input_roots=args.input_root, recursive=args.recursive)
             show_config_info(config)
             print("\nDEBUG模式配置:")
             show_config_info(config)
             
-            config = ConfigManager("release")
+            config = ConfigManager("release", input_roots=args.input_root, recursive=args.recursive)
             print("\nRELEASE模式配置:")
             show_config_info(config)
         except Exception as e:
@@ -786,8 +1643,11 @@ if __name__ == "__main__":
     
     # 询问是否强制重新处理已存在的文件
     print("=" * 60)
-    reprocess_choice = input("是否重新处理已存在的文件? (y/n，默认n): ").strip().lower()
-    force_reprocess = (reprocess_choice == 'y' or reprocess_choice == 'yes')
+    if args.mode:
+        force_reprocess = args.force
+    else:
+        reprocess_choice = input("是否重新处理已存在的文件? (y/n，默认n): ").strip().lower()
+        force_reprocess = (reprocess_choice == 'y' or reprocess_choice == 'yes')
     
     if force_reprocess:
         print("⚠ 将重新处理所有文件（包括已存在的）")
@@ -796,30 +1656,67 @@ if __name__ == "__main__":
     
     try:
         # 创建配置管理器
-        config = ConfigManager(mode, force_reprocess=force_reprocess)
+        config = ConfigManager(mode, force_reprocess=force_reprocess,
+                               input_roots=args.input_root, recursive=args.recursive,
+                               resume=not args.no_resume, shard=shard, profile=profile,
+                               time_budget=time_budget)
         
         # 创建必要的目录
         config.create_directories()
         
+        if args.show_quarantine:
+            show_quarantine(config)
+            exit()
+        if args.retry_quarantine:
+            stage = None if args.retry_quarantine == "all" else args.retry_quarantine
+            config.scan_inputs()
+            paths = [entry['path'] for entry in config.index.list_quarantine(config.get_input_roots())]
+            released = config.index.release_quarantine(paths, stage=stage)
+            print(f"已解除隔离: {released} 个文件")
+        
         # 显示配置信息
         show_config_info(config)
         
-        print("\n选择处理模式:")
-        print("1. 详细时间统计 + 日志记录 (推荐)")
-        print("2. 详细时间统计 (无日志)")
-        print("3. 简化时间统计")
+        if args.mode:
+            choice = args.method
+        else:
+            print("\n选择处理模式:")
+            print("1. 详细时间统计 + 日志记录 (推荐)")
+            print("2. 详细时间统计 (无日志)")
+            print("3. 简化时间统计")
+            print("4. 并行渲染 (自动调度并发数和内存)")
+            
+            choice = input("请选择 (1/2/3/4): ").strip()
         
-        choice = input("请选择 (1/2/3): ").strip()
+        if config.budget.enabled and choice == "3":
+            print("⚠ 简化时间统计模式不支持时间预算，将处理全部文件")
+        if args.tile > 1 and choice != "4":
+            print("⚠ 拼图渲染只在并行渲染模式中使用，将逐个渲染")
         
-        if choice == "1":
-            make_multiview_dataset_with_timing_and_logging(config)
-        elif choice == "2":
-            make_multiview_dataset_with_timing(config)
-        elif choice == "3":
-            make_multiview_dataset_simple_timing(config)
-        else:
-            print("无效选择，使用推荐模式...")
-            make_multiview_dataset_with_timing_and_logging(config)
+        exporter = None
+        if args.metrics_port is not None or args.metrics_textfile:
+            exporter = MetricsExporter(config.metrics.registry, port=args.metrics_port,
+                                       textfile=args.metrics_textfile, interval=args.metrics_interval).start()
+            if args.metrics_port is not None:
+                print(f"实时指标: http://127.0.0.1:{exporter.port}/metrics")
+            if args.metrics_textfile:
+                print(f"实时指标文件: {args.metrics_textfile} (每 {args.metrics_interval:g} 秒更新)")
+        try:
+            if choice == "1":
+                make_multiview_dataset_with_timing_and_logging(config)
+            elif choice == "2":
+                make_multiview_dataset_with_timing(config)
+            elif choice == "3":
+                make_multiview_dataset_simple_timing(config)
+            elif choice == "4":
+                make_multiview_dataset_parallel(config, workers=args.workers, memory_limit_mb=args.memory_limit,
+                                                tile=args.tile, tile_max_kb=args.tile_max_kb)
+            else:
+                print("无效选择，使用推荐模式...")
+                make_multiview_dataset_with_timing_and_logging(config)
+        finally:
+            if exporter is not None:
+                exporter.stop()
             
     except Exception as e:
         print(f"程序执行出错: {str(e)}")
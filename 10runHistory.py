@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行历史工具
+把日志目录（含归档）中每次运行的 multiview_*.log / *.events.jsonl 导入运行历史数据库，
+按运行、文件、阶段和主机查询：运行趋势和变慢的运行、越来越慢的文件、语料子集的成本，
+并可把每个文件的历史耗时和峰值内存写入文件索引，作为调度的预测值
+"""
+
+import sys
+import argparse
+import datetime
+from steplogger import Logger
+from stepindex import FileIndex
+from stephistory import RunHistory, DEFAULT_SLOWDOWN, TOPOLOGY_NAMES
+
+def get_mode_config(mode):
+    """
+    根据运行模式获取配置
+    """
+    if mode.upper() == 'DEBUG':
+        return {
+            'log_dir': 'step2viewdata/debug_processlog',
+            'history_path': 'step2viewdata/debug_runhistory.sqlite',
+            'index_path': 'step2viewdata/debug_fileindex.sqlite'
+        }
+    elif mode.upper() == 'RELEASE':
+        return {
+            'log_dir': 'step2viewdata/release_processlog',
+            'history_path': 'step2viewdata/release_runhistory.sqlite',
+            'index_path': 'step2viewdata/release_fileindex.sqlite'
+        }
+    else:
+        raise ValueError(f"不支持的运行模式: {mode}")
+
+def _seconds(value):
+    return f"{value:.2f}s" if value is not None else "-"
+
+def log_run_trends(logger, history, limit, slowdown):
+    """
+    最近的运行：文件数、耗时、成功耗时中位数和相对历史的变慢比例
+    """
+    runs = history.run_trends(limit=limit, slowdown=slowdown)
+    logger.log(f"最近 {len(runs)} 次运行 (变慢比例 = 各文件耗时 / 该文件之前运行的中位数，取中位数):")
+    logger.log(f"  {'运行ID':<24} {'主机':<12} {'开始时间':<19} {'成功':>6} {'失败':>5} {'总耗时':>10} "
+               f"{'中位耗时':>9} {'变慢比例':>10}")
+    regressions = 0
+    for run in runs:
+        started = datetime.datetime.fromtimestamp(run['started']).strftime('%Y-%m-%d %H:%M:%S') if run['started'] else "-"
+        ratio = "-"
+        if run['slowdown_ratio'] is not None:
+            ratio = f"{run['slowdown_ratio']:.2f}x" + (" ⚠" if run['regression'] else "")
+        regressions += run['regression']
+        logger.log(f"  {run['run_id']:<24} {(run['host'] or '-'):<12} {started:<19} {run['processed'] or 0:>6} "
+                   f"{run['errors'] or 0:>5} {_seconds(run['duration']):>10} {_seconds(run['median_seconds']):>9} "
+                   f"{ratio:>10}" + ("" if run['complete'] else "  (未结束)"))
+    if regressions:
+        logger.log(f"⚠ {regressions} 次运行比历史慢 {slowdown * 100:.0f}% 以上")
+
+def log_slower_files(logger, history, limit, slowdown):
+    files = history.slower_files(limit=limit, slowdown=slowdown)
+    logger.log(f"越来越慢的文件 (后一半成功耗时中位数比前一半高 {slowdown * 100:.0f}% 以上): {len(files)}")
+    for item in files:
+        logger.log(f"  {item['file']}: {item['samples']} 次, {_seconds(item['first'])} -> {_seconds(item['last'])} "
+                   f"({item['ratio']:.2f}x)")
+
+def log_subset_cost(logger, history, patterns):
+    logger.log("语料子集成本 (按每个文件成功耗时的中位数预测):")
+    for row in history.subset_cost(patterns):
+        error_rate = f"{row['error_rate'] * 100:.1f}%" if row['error_rate'] is not None else "-"
+        peak = f"{row['peak_rss_mb']:.0f} MB" if row['peak_rss_mb'] else "-"
+        logger.log(f"  {row['pattern']}: 文件 {row['files']} (无成功记录 {row['unknown']}), "
+                   f"预测耗时 {row['seconds'] / 3600:.2f} 小时, 峰值内存 {peak}, 失败率 {error_rate}")
+
+def log_complexity_fit(logger, history):
+    """
+    耗时与拓扑复杂度的拟合结果和按最相关指标分桶的耗时预算
+    """
+    result = history.complexity_fit()
+    logger.log(f"耗时与拓扑复杂度 (有拓扑统计和成功记录的文件: {result['files']}):")
+    if not result['fits']:
+        logger.log("  样本不足，无法拟合")
+        return
+    for fit in result['fits']:
+        logger.log(f"  {TOPOLOGY_NAMES[fit['feature']]:<8} R² {fit['r2']:.3f}, 耗时 ≈ {fit['intercept']:.2f}s "
+                   f"{fit['slope'] * 1000:+.3f}s × (数量 / 1000)")
+    logger.log(f"按{TOPOLOGY_NAMES[result['feature']]}数分桶 (可作为复杂度预算):")
+    for bucket in result['buckets']:
+        logger.log(f"  ≤ {bucket['upper']}: 文件 {bucket['files']}, 中位耗时 {_seconds(bucket['median_seconds'])}, "
+                   f"最大 {_seconds(bucket['max_seconds'])}")
+
+def log_summaries(logger, history):
+    logger.log("按主机:")
+    for row in history.host_summary():
+        rate = f"{row['models_per_hour']:.0f}" if row['models_per_hour'] is not None else "-"
+        logger.log(f"  {row['host']}: 运行 {row['runs']}, 成功 {row['success']}, 失败 {row['errors']}, "
+                   f"中位耗时 {_seconds(row['median_seconds'])}, 模型/小时 {rate}")
+    stages = history.stage_summary()
+    if stages:
+        logger.log("按阶段:")
+        for row in stages:
+            logger.log(f"  {row['stage']}: {row['count']} 次, 中位耗时 {_seconds(row['median_seconds'])}, "
+                       f"累计 {row['seconds'] / 3600:.2f} 小时")
+
+def seed_index(logger, history, index_path):
+    """
+    把历史耗时和峰值内存写入文件索引中还没有渲染记录的文件（按文件路径匹配，见 FileIndex.seed_costs）
+    """
+    costs = history.file_costs()
+    index = FileIndex(index_path)
+    try:
+        seeded = index.seed_costs(costs)
+    finally:
+        index.close()
+    logger.log(f"文件索引 {index_path}: 写入 {seeded} 个文件的预测耗时和峰值内存 (历史中共 {len(costs)} 个文件)")
+
+def main():
+    """
+    主函数，支持命令行参数和模式选择
+    """
+    print("=" * 60)
+    print("运行历史工具 - 支持DEBUG/RELEASE模式")
+    print("=" * 60)
+
+    parser = argparse.ArgumentParser(description="运行历史工具")
+    parser.add_argument("mode", nargs="?", help="运行模式 DEBUG / RELEASE")
+    parser.add_argument("--log-dir", action="append", default=[],
+                        help="额外导入的日志目录（可多次指定，如从其他机器复制来的日志）")
+    parser.add_argument("--host", help="只有文本日志（没有事件文件）的运行所属的主机名")
+    parser.add_argument("--no-ingest", action="store_true", help="不导入新日志，只查询")
+    parser.add_argument("--runs", type=int, default=20, metavar="N", help="显示最近 N 次运行（默认 20）")
+    parser.add_argument("--slowdown", type=float, default=DEFAULT_SLOWDOWN,
+                        help="判断变慢的阈值（相对历史中位数，默认 0.2 即 20%%）")
+    parser.add_argument("--slower", type=int, nargs="?", const=20, metavar="N", help="列出越来越慢的前 N 个文件")
+    parser.add_argument("--cost", action="append", default=[], metavar="PATTERN",
+                        help="语料子集（匹配文件路径或文件名的通配符，可多次指定）的预测成本")
+    parser.add_argument("--summary", action="store_true", help="按主机和阶段汇总")
+    parser.add_argument("--complexity", action="store_true", help="拟合文件耗时与拓扑复杂度（面、棱边、三角形等）的关系")
+    parser.add_argument("--seed-index", action="store_true", help="把历史耗时和峰值内存写入文件索引，作为调度的预测值")
+    args = parser.parse_args()
+
+    if args.slowdown <= 0:
+        parser.error("--slowdown 必须大于0")
+
+    if args.mode:
+        mode = args.mode.upper()
+        if mode not in ['DEBUG', 'RELEASE']:
+            print(f"错误: 不支持的运行模式 '{mode}'")
+            print("支持的模式: DEBUG, RELEASE")
+            return
+    else:
+        # 交互式选择模式
+        print("请选择运行模式:")
+        print("1. DEBUG模式  (导入debug_processlog)")
+        print("2. RELEASE模式 (导入release_processlog)")
+
+        while True:
+            choice = input("请输入选择 (1/2): ").strip()
+            if choice == "1":
+                mode = "DEBUG"
+                break
+            elif choice == "2":
+                mode = "RELEASE"
+                break
+            else:
+                print("无效选择，请输入 1 或 2")
+
+    try:
+        config = get_mode_config(mode)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    log_dirs = [config['log_dir']] + args.log_dir
+    print(f"\n运行模式: {mode}")
+    print(f"运行历史: {config['history_path']}")
+    for log_dir in log_dirs:
+        print(f"日志目录: {log_dir}")
+    print("-" * 60)
+
+    logger = Logger(config['log_dir'], prefix="run_history", time_format="%Y-%m-%d %H:%M:%S")
+    history = RunHistory(config['history_path'])
+    ok = False
+    try:
+        if not args.no_ingest:
+            for log_dir in log_dirs:
+                counts = history.ingest(log_dir, host=args.host)
+                logger.log(f"导入 {log_dir}: 运行 {counts['runs']}, 文件记录 {counts['files']}, "
+                           f"阶段记录 {counts['stages']}, 拓扑记录 {counts['topology']}")
+            logger.log("-" * 60)
+        log_run_trends(logger, history, args.runs, args.slowdown)
+        if args.slower:
+            logger.log("-" * 60)
+            log_slower_files(logger, history, args.slower, args.slowdown)
+        if args.cost:
+            logger.log("-" * 60)
+            log_subset_cost(logger, history, args.cost)
+        if args.summary:
+            logger.log("-" * 60)
+            log_summaries(logger, history)
+        if args.complexity:
+            logger.log("-" * 60)
+            log_complexity_fit(logger, history)
+        if args.seed_index:
+            logger.log("-" * 60)
+            seed_index(logger, history, config['index_path'])
+        ok = True
+    except Exception as e:
+        logger.log(f"处理过程中发生错误: {str(e)}")
+    finally:
+        history.close()
+        logger.close()
+        print(f"\n日志已保存到: {config['log_dir']}")
+
+    if args.mode and not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
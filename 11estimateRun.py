@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行成本估算工具
+正式运行数千个STEP文件之前，按文件大小和实体数分层抽样渲染一小部分文件，
+外推指定进程数下的总耗时、各格式的输出字节数、失败文件数和峰值内存，开始运行前就能知道大致需要多久、多大空间
+"""
+
+import os
+import time
+import queue
+import shutil
+import argparse
+import collections
+import multiprocessing
+from steplogger import Logger, get_process_stats
+from stepindex import FileIndex
+from stepgovernor import cpu_limit, memory_info
+from steprender import start_render_worker
+from stepestimate import stratify, draw_sample, extrapolate, DEFAULT_SAMPLE_SIZE, SIZE_BINS, ENTITY_BINS, CONFIDENCE_Z
+
+# 等待渲染结果的轮询间隔（秒）
+RESULT_POLL_INTERVAL = 0.2
+
+def get_mode_config(mode):
+    """
+    根据运行模式获取配置
+    """
+    if mode.upper() == 'DEBUG':
+        return {
+            'input_dir': 'step2viewdata/debug_traceparts',
+            'index_path': 'step2viewdata/debug_fileindex.sqlite',
+            'estimate_dir': 'step2viewdata/debug_estimate',
+            'log_dir': 'step2viewdata/debug_processlog'
+        }
+    elif mode.upper() == 'RELEASE':
+        return {
+            'input_dir': 'step2viewdata/release_traceparts',
+            'index_path': 'step2viewdata/release_fileindex.sqlite',
+            'estimate_dir': 'step2viewdata/release_estimate',
+            'log_dir': 'step2viewdata/release_processlog'
+        }
+    else:
+        raise ValueError(f"不支持的运行模式: {mode}")
+
+def format_duration(seconds):
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    return f"{hours}小时{minutes}分" if hours else f"{minutes}分{seconds % 60:.0f}秒"
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def _bytes_by_format(path):
+    """
+    目录下的文件按扩展名（小写）统计字节数
+    """
+    totals = {}
+    for root, _, files in os.walk(path):
+        for name in files:
+            fmt = os.path.splitext(name)[1].lower().lstrip(".") or "其他"
+            try:
+                totals[fmt] = totals.get(fmt, 0) + os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return totals
+
+def _stop_workers(pool):
+    for worker in pool:
+        if worker['process'].is_alive():
+            worker['tasks'].put(None)
+    for worker in pool:
+        worker['process'].join(timeout=10)
+        if worker['process'].is_alive():
+            worker['process'].terminate()
+
+def render_sample(logger, sample, workers, estimate_dir):
+    """
+    用 workers 个常驻渲染进程渲染样本（与正式运行的并行渲染相同的并发），每个文件的结果计入所在的层
+    每个进程先渲染一次最小的样本文件初始化显示后端，不计入测量；每个文件渲染完统计输出后立即删除
+    """
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    pool = [start_render_worker(ctx, result_queue, no) for no in range(workers)]
+    warmup_path = min(sample, key=lambda item: item[1]['size'] or 0)[1]['path']
+    pending = collections.deque([(-1 - worker['no'], None) for worker in pool] + list(enumerate(sample)))
+    in_flight = {}
+    done = 0
+    try:
+        while pending or in_flight:
+            for worker in pool:
+                if worker['job'] is None and pending:
+                    job_id, item = pending.popleft()
+                    step_path = warmup_path if item is None else item[1]['path']
+                    worker['job'] = job_id
+                    in_flight[job_id] = (worker['no'], time.time())
+                    worker['tasks'].put([(job_id, step_path, os.path.join(estimate_dir, f"{job_id:06d}"))])
+
+            try:
+                job_id, status, detail, elapsed = result_queue.get(timeout=RESULT_POLL_INTERVAL)
+            except queue.Empty:
+                job_id = None
+            if job_id is not None:
+                pool[in_flight.pop(job_id)[0]]['job'] = None
+                output_dir = os.path.join(estimate_dir, f"{job_id:06d}")
+                if job_id >= 0:
+                    stratum, record = sample[job_id]
+                    stratum.add(status, elapsed, detail.get('peak_rss_mb'), _bytes_by_format(output_dir))
+                    done += 1
+                    symbol = "✓" if status == "success" else "✗"
+                    logger.log(f"  [{done}/{len(sample)}] {symbol} {os.path.basename(record['path'])} "
+                               f"({stratum.label}): {elapsed:.2f}s, 峰值内存 {detail.get('peak_rss_mb') or 0:.0f} MB"
+                               + ("" if status == "success" else f" - {detail.get('error')}"))
+                elif status != "success":
+                    logger.log(f"  预热失败: {detail.get('error')}")
+                shutil.rmtree(output_dir, ignore_errors=True)
+
+            for worker in pool:
+                if worker['job'] is not None and not worker['process'].is_alive():
+                    # 渲染进程异常退出（通常是内存不足）：记为失败，耗时计入，重启该进程
+                    job_id = worker['job']
+                    _, started = in_flight.pop(job_id)
+                    if job_id >= 0:
+                        stratum, record = sample[job_id]
+                        stratum.add("error", time.time() - started, get_process_stats(worker['process'].pid)[1])
+                        done += 1
+                        logger.log(f"  [{done}/{len(sample)}] ✗ {os.path.basename(record['path'])}: "
+                                   f"渲染进程异常退出 (退出码 {worker['process'].exitcode})")
+                    pool[worker['no']] = start_render_worker(ctx, result_queue, worker['no'])
+    finally:
+        _stop_workers(pool)
+        shutil.rmtree(estimate_dir, ignore_errors=True)
+
+def log_estimate(logger, strata, result):
+    """
+    输出各层样本和整批运行的估算
+    """
+    logger.log("=" * 80)
+    logger.log(f"{'分层':<36} {'文件数':>8} {'样本':>5} {'平均耗时':>9} {'失败':>5}")
+    for stratum in strata:
+        mean = stratum.mean_seconds()
+        logger.log(f"{stratum.label:<36} {len(stratum.records):>8} {len(stratum.seconds):>5} "
+                   f"{(f'{mean:.2f}s' if mean is not None else '-'):>9} {stratum.errors:>5}")
+    logger.log("=" * 80)
+    logger.log(f"文件数: {result['files']}, 样本: {result['sampled']}")
+    logger.log(f"预计总渲染时间: {format_duration(result['seconds'])} "
+               f"(± {format_duration(result['seconds_stderr'] * CONFIDENCE_Z)}, 约95%置信)")
+    if result['single_sample_strata']:
+        logger.log(f"  注意: {result['single_sample_strata']} 个分层只有1个样本，其误差未计入，可增大 --sample")
+    logger.log(f"{result['workers']} 个进程预计耗时: {format_duration(result['wall_seconds'])} "
+               f"({format_duration(result['wall_low'])} - {format_duration(result['wall_high'])})")
+    logger.log(f"预计失败文件: {result['errors']:.0f}")
+    total_bytes = sum(result['output_bytes'].values())
+    logger.log(f"预计输出: {format_bytes(total_bytes)}")
+    for fmt, size in sorted(result['output_bytes'].items(), key=lambda item: -item[1]):
+        logger.log(f"  {fmt}: {format_bytes(size)}")
+    if result['peak_rss_mb'] is not None:
+        logger.log(f"单个渲染进程峰值内存: P95 {result['peak_rss_p95_mb']:.0f} MB, 最大 {result['peak_rss_mb']:.0f} MB")
+        logger.log(f"{result['workers']} 个进程同时运行预计峰值内存: {result['concurrent_rss_mb']:.0f} MB "
+                   f"(最坏 {result['concurrent_rss_max_mb']:.0f} MB)")
+        total_mb, _ = memory_info()
+        if total_mb and result['concurrent_rss_mb'] > total_mb:
+            logger.log(f"⚠ 超过系统内存 {total_mb:.0f} MB，正式运行时资源调度会降低并发")
+
+def main():
+    """
+    主函数，支持命令行参数和模式选择
+    """
+    print("=" * 60)
+    print("运行成本估算工具 - 支持DEBUG/RELEASE模式")
+    print("=" * 60)
+
+    parser = argparse.ArgumentParser(description="运行成本估算工具")
+    parser.add_argument("mode", nargs="?", help="运行模式 DEBUG / RELEASE")
+    parser.add_argument("--input-root", action="append", default=[],
+                        help="额外的输入根目录（可多次指定，与正式运行相同）")
+    parser.add_argument("--recursive", action="store_true", help="递归扫描输入根目录")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE_SIZE,
+                        help=f"抽样渲染的文件数（默认 {DEFAULT_SAMPLE_SIZE}，每层至少1个）")
+    parser.add_argument("--workers", type=int, help="正式运行的渲染进程数，默认为可用CPU核数")
+    parser.add_argument("--size-only", action="store_true",
+                        help="只按文件大小分层（不读取文件内容统计实体数）")
+    parser.add_argument("--seed", type=int, help="抽样的随机种子（相同种子抽到相同的文件）")
+    args = parser.parse_args()
+
+    if args.sample < 1:
+        parser.error("--sample 必须大于0")
+    workers = args.workers or cpu_limit()
+    if workers < 1:
+        parser.error("--workers 必须大于0")
+
+    if args.mode:
+        mode = args.mode.upper()
+        if mode not in ['DEBUG', 'RELEASE']:
+            print(f"错误: 不支持的运行模式 '{mode}'")
+            print("支持的模式: DEBUG, RELEASE")
+            return
+    else:
+        # 交互式选择模式
+        print("请选择运行模式:")
+        print("1. DEBUG模式  (估算debug_traceparts)")
+        print("2. RELEASE模式 (估算release_traceparts)")
+
+        while True:
+            choice = input("请输入选择 (1/2): ").strip()
+            if choice == "1":
+                mode = "DEBUG"
+                break
+            elif choice == "2":
+                mode = "RELEASE"
+                break
+            else:
+                print("无效选择，请输入 1 或 2")
+
+    try:
+        config = get_mode_config(mode)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    roots = [config['input_dir']] + args.input_root
+    print(f"\n运行模式: {mode}")
+    print(f"输入目录: {', '.join(roots)}")
+    print(f"渲染进程数: {workers}")
+    print(f"日志目录: {config['log_dir']}")
+    print("-" * 60)
+
+    logger = Logger(config['log_dir'], prefix="estimate", time_format="%Y-%m-%d %H:%M:%S", events=True)
+    index = FileIndex(config['index_path'])
+    try:
+        entries, _ = index.refresh(roots, args.recursive)
+        if not entries:
+            logger.log(f"错误: {', '.join(roots)} 中没有STEP文件")
+            return
+        if not args.size_only:
+            computed = index.update_content_stats(roots)
+            if computed:
+                logger.log(f"统计实体数: {computed} 个文件 (结果保存在文件索引中，下次不再读取)")
+        paths = {step_path for step_path, _ in entries}
+        records = [record for record in index.records(roots) if record['path'] in paths]
+
+        strata = stratify(records, SIZE_BINS, 1 if args.size_only else ENTITY_BINS)
+        sample = draw_sample(strata, args.sample, args.seed)
+        logger.log(f"文件数: {len(records)}, 分层: {len(strata)}, 样本: {len(sample)}")
+        logger.log("-" * 80)
+        render_sample(logger, sample, min(workers, len(sample)), config['estimate_dir'])
+
+        result = extrapolate(strata, workers)
+        log_estimate(logger, strata, result)
+        logger.event("estimate", files=result['files'], sampled=result['sampled'], workers=workers,
+                     seconds=round(result['seconds'], 1), wall_seconds=round(result['wall_seconds'], 1),
+                     output_bytes={fmt: int(size) for fmt, size in result['output_bytes'].items()},
+                     peak_rss_mb=result['peak_rss_mb'], concurrent_rss_mb=result['concurrent_rss_mb'])
+    except Exception as e:
+        logger.log(f"处理过程中发生错误: {str(e)}")
+    finally:
+        index.close()
+        logger.close()
+        print(f"\n日志已保存到: {config['log_dir']}")
+
+if __name__ == "__main__":
+    main()
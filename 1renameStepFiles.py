@@ -7,52 +7,17 @@ from pathlib import Path
 import re
 import datetime
 import sys
+import argparse
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from steplogger import Logger
 
-class Logger:
-    """
-    日志记录器，同时输出到控制台和文件
-    """
-    def __init__(self, log_dir):
-        self.log_dir = Path(log_dir)
-        self.log_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 创建日志文件名（包含时间戳）
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_file = self.log_dir / f"rename_step_{timestamp}.log"
-        
-        # 打开日志文件
-        self.log_handle = open(self.log_file, 'w', encoding='utf-8')
-        
-        # 记录开始时间
-        self.start_time = datetime.datetime.now()
-        self.log(f"日志开始时间: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        self.log(f"日志文件: {self.log_file}")
-        self.log("-" * 60)
-    
-    def log(self, message):
-        """
-        记录日志信息
-        """
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"[{timestamp}] {message}"
-        
-        # 输出到控制台
-        print(log_message)
-        
-        # 输出到文件
-        self.log_handle.write(log_message + "\n")
-        self.log_handle.flush()
-    
-    def close(self):
-        """
-        关闭日志文件
-        """
-        if hasattr(self, 'log_handle'):
-            end_time = datetime.datetime.now()
-            duration = end_time - self.start_time
-            self.log(f"日志结束时间: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-            self.log(f"运行时长: {duration}")
-            self.log_handle.close()
+# 内容相同的重复文件的处理方式: link - 移入 .duplicates/ 并硬链接到保留的文件; merge - 直接删除
+DUPLICATE_ACTIONS = ("link", "merge")
+DUPLICATES_DIR_NAME = ".duplicates"
+
+# 计算哈希时每次读取的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
 
 def get_mode_config(mode):
     """
@@ -73,7 +38,7 @@ def get_mode_config(mode):
 
 def analyze_directory(source_dir):
     """
-    分析目录中的所有文件，找出需要处理的文件
+    分析目录中的所有文件，找出需要处理的文件（os.scandir 单次扫描）
     """
     if not source_dir.exists():
         return None
@@ -85,41 +50,27 @@ def analyze_directory(source_dir):
         'other_files': []      # 其他文件
     }
     
-    for file_path in source_dir.iterdir():
-        if file_path.is_file():
-            filename = file_path.name
-            name_without_ext = file_path.stem
-            extension = file_path.suffix.lower()
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            name_without_ext, extension = os.path.splitext(entry.name)
+            extension = extension.lower()
+            file_info = {
+                'name': entry.name,
+                'name_without_ext': name_without_ext,
+                'extension': extension
+            }
             
-            if extension in ['.step', '.step']:
-                files_analysis['step_files'].append({
-                    'path': file_path,
-                    'name': filename,
-                    'name_without_ext': name_without_ext,
-                    'extension': extension
-                })
+            if extension == '.step':
+                files_analysis['step_files'].append(file_info)
             elif extension == '.stp':
                 if '_' in name_without_ext:
-                    files_analysis['stp_with_underscore'].append({
-                        'path': file_path,
-                        'name': filename,
-                        'name_without_ext': name_without_ext,
-                        'extension': extension
-                    })
+                    files_analysis['stp_with_underscore'].append(file_info)
                 else:
-                    files_analysis['stp_clean'].append({
-                        'path': file_path,
-                        'name': filename,
-                        'name_without_ext': name_without_ext,
-                        'extension': extension
-                    })
+                    files_analysis['stp_clean'].append(file_info)
             else:
-                files_analysis['other_files'].append({
-                    'path': file_path,
-                    'name': filename,
-                    'name_without_ext': name_without_ext,
-                    'extension': extension
-                })
+                files_analysis['other_files'].append(file_info)
     
     return files_analysis
 
@@ -148,208 +99,295 @@ def extract_name_before_underscore(name):
     
     return name
 
-def process_files_complete(source_dir, logger):
+def file_digest(path):
     """
-    完整处理所有文件：先处理.step文件，再处理带下划线的.stp文件
+    流式计算文件内容的 SHA-256
     """
-    if not source_dir.exists():
-        logger.log(f"错误: 目录 {source_dir} 不存在")
-        return
-    
-    # 分析目录
-    logger.log("分析目录文件...")
-    analysis = analyze_directory(source_dir)
-    
-    if not analysis:
-        logger.log("目录分析失败")
-        return
-    
-    logger.log(f"找到 {len(analysis['step_files'])} 个.step文件")
-    logger.log(f"找到 {len(analysis['stp_with_underscore'])} 个带下划线的.stp文件")
-    logger.log(f"找到 {len(analysis['stp_clean'])} 个干净的.stp文件")
-    logger.log(f"找到 {len(analysis['other_files'])} 个其他文件")
-    logger.log("-" * 60)
-    
-    total_renamed = 0
-    total_skipped = 0
-    total_errors = 0
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class CollisionResolver:
+    """
+    判断两个文件内容是否相同：先比较大小，大小相同才流式计算哈希
+    大小和哈希都按文件名缓存，每个文件最多读取一次
+    """
+    def __init__(self, source_dir):
+        self.source_dir = str(source_dir)
+        self.sizes = {}
+        self.digests = {}
+
+    def size(self, name):
+        if name not in self.sizes:
+            self.sizes[name] = os.stat(os.path.join(self.source_dir, name)).st_size
+        return self.sizes[name]
+
+    def digest(self, name):
+        if name not in self.digests:
+            self.digests[name] = file_digest(os.path.join(self.source_dir, name))
+        return self.digests[name]
+
+    def same_content(self, name_a, name_b):
+        if self.size(name_a) != self.size(name_b):
+            return False
+        return self.digest(name_a) == self.digest(name_b)
+
+    def variant_name(self, name, base):
+        """
+        内容不同的变体使用由内容哈希决定的后缀，与处理顺序无关，重复运行结果不变
+        （用 - 而不是 _，避免下次运行再被截断）
+        """
+        return f"{base}-{self.digest(name)[:8]}.stp"
+
+def build_rename_plan(source_dir, analysis=None):
+    """
+    在内存中计算完整的重命名计划，不访问文件系统检查目标是否存在
+    先处理.step文件，再处理带下划线的.stp文件（各自按文件名排序）
+    目标名被已有文件或计划中更早的目标占用时，比较两者内容：
+      内容相同 - 记为重复文件，不再单独保留一份
+      内容不同 - 使用带内容哈希后缀的名称
+    被重命名走的旧文件名不释放（保守处理）
+    :return: {'dir', 'renames': [(旧名, 新名)], 'duplicates': [(旧名, 保留的文件名)],
+              'variants': 变体数量, 'skipped': [(旧名, 原因)], 'analysis'}
+    """
+    if analysis is None:
+        analysis = analyze_directory(source_dir)
+    if analysis is None:
+        return None
     
-    # 第一步：处理.step文件
-    if analysis['step_files']:
-        logger.log("第一步：处理.step文件")
-        logger.log("-" * 40)
+    # 目标文件名 -> 执行计划后该名称对应的当前文件名
+    occupants = {}
+    for group in analysis.values():
+        occupants.update((file_info['name'], file_info['name']) for file_info in group)
+    
+    resolver = CollisionResolver(source_dir)
+    renames = []
+    duplicates = []
+    skipped = []
+    variants = 0
+    candidates = sorted(analysis['step_files'], key=lambda info: info['name']) + \
+        sorted(analysis['stp_with_underscore'], key=lambda info: info['name'])
+    for file_info in candidates:
+        old_name = file_info['name']
+        new_name_base = extract_name_before_underscore(file_info['name_without_ext'])
+        new_filename = f"{new_name_base}.stp"
         
-        for file_info in analysis['step_files']:
-            old_path = file_info['path']
-            old_name = file_info['name']
-            name_without_ext = file_info['name_without_ext']
-            
-            # 提取下划线前的名称
-            new_name_base = extract_name_before_underscore(name_without_ext)
-            new_filename = f"{new_name_base}.stp"
-            new_path = source_dir / new_filename
-            
-            logger.log(f"处理: {old_name}")
-            logger.log(f"  提取名称: {name_without_ext} -> {new_name_base}")
-            
-            # 检查目标文件是否已存在
-            if new_path.exists():
-                logger.log(f"  跳过: 目标文件 {new_filename} 已存在")
-                total_skipped += 1
-                continue
-            
-            try:
-                old_path.rename(new_path)
-                logger.log(f"  ✓ 重命名: {old_name} -> {new_filename}")
-                total_renamed += 1
-            except Exception as e:
-                logger.log(f"  ✗ 错误: {old_name} - {str(e)}")
-                total_errors += 1
-            
-            logger.log("")
-    
-    # 第二步：处理带下划线的.stp文件
-    if analysis['stp_with_underscore']:
-        logger.log("第二步：处理带下划线的.stp文件")
-        logger.log("-" * 40)
+        try:
+            while new_filename in occupants:
+                occupant = occupants[new_filename]
+                if resolver.same_content(old_name, occupant):
+                    duplicates.append((old_name, new_filename))
+                    new_filename = None
+                    break
+                variant = resolver.variant_name(old_name, new_name_base)
+                if variant == new_filename:
+                    # 哈希前缀相同但内容不同，极少见，交给人工处理
+                    skipped.append((old_name, f"变体名称冲突 {variant}"))
+                    new_filename = None
+                    break
+                new_filename = variant
+        except OSError as e:
+            skipped.append((old_name, str(e)))
+            continue
         
-        for file_info in analysis['stp_with_underscore']:
-            old_path = file_info['path']
-            old_name = file_info['name']
-            name_without_ext = file_info['name_without_ext']
-            
-            # 提取下划线前的名称
-            new_name_base = extract_name_before_underscore(name_without_ext)
-            new_filename = f"{new_name_base}.stp"
-            new_path = source_dir / new_filename
-            
-            logger.log(f"处理: {old_name}")
-            logger.log(f"  提取名称: {name_without_ext} -> {new_name_base}")
-            
-            # 检查目标文件是否已存在
-            if new_path.exists():
-                logger.log(f"  跳过: 目标文件 {new_filename} 已存在")
-                total_skipped += 1
-                continue
-            
-            try:
-                old_path.rename(new_path)
-                logger.log(f"  ✓ 重命名: {old_name} -> {new_filename}")
-                total_renamed += 1
-            except Exception as e:
-                logger.log(f"  ✗ 错误: {old_name} - {str(e)}")
-                total_errors += 1
-            
-            logger.log("")
-    
-    # 打印最终统计
-    logger.log("=" * 60)
-    logger.log("处理完成!")
-    logger.log(f"成功重命名: {total_renamed}")
-    logger.log(f"跳过文件: {total_skipped}")
-    logger.log(f"错误文件: {total_errors}")
+        if new_filename is not None:
+            occupants[new_filename] = old_name
+            renames.append((old_name, new_filename))
+            if new_filename != f"{new_name_base}.stp":
+                variants += 1
     
     return {
-        'renamed': total_renamed,
-        'skipped': total_skipped,
-        'errors': total_errors
+        'dir': str(source_dir),
+        'renames': renames,
+        'duplicates': duplicates,
+        'variants': variants,
+        'skipped': skipped,
+        'analysis': analysis
     }
 
-def process_files_safe(source_dir, logger):
+def write_rename_journal(plans, journal_dir, duplicate_action="link"):
     """
-    安全模式：先显示将要进行的操作，询问用户确认
+    把重命名计划写成紧凑的日志文件，可用于追溯和撤销
+    每行: 目录<TAB>操作<TAB>旧名<TAB>新名（操作为 rename / link / merge）
     """
-    analysis = analyze_directory(source_dir)
-    
-    if not analysis:
-        logger.log("目录分析失败")
+    journal_dir = Path(journal_dir)
+    journal_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    journal_file = journal_dir / f"rename_journal_{timestamp}.tsv"
+    with open(journal_file, 'w', encoding='utf-8') as f:
+        for plan in plans:
+            f.writelines(f"{plan['dir']}\trename\t{old}\t{new}\n" for old, new in plan['renames'])
+            f.writelines(f"{plan['dir']}\t{duplicate_action}\t{old}\t{kept}\n" for old, kept in plan['duplicates'])
+    return journal_file
+
+def resolve_duplicate(source_dir, old_name, kept_name, duplicate_action="link"):
+    """
+    处理内容相同的重复文件（在重命名完成后调用，保留的文件已在目标位置）
+    link  - 移入 .duplicates/ 并替换为指向保留文件的硬链接，不占额外空间，也不会被再次渲染
+    merge - 直接删除
+    """
+    old_path = os.path.join(source_dir, old_name)
+    if duplicate_action == "merge":
+        os.remove(old_path)
         return
     
-    # 收集所有需要重命名的文件
-    files_to_rename = []
+    duplicates_dir = os.path.join(source_dir, DUPLICATES_DIR_NAME)
+    os.makedirs(duplicates_dir, exist_ok=True)
+    link_path = os.path.join(duplicates_dir, old_name)
+    os.replace(old_path, link_path)
+    try:
+        tmp_path = link_path + ".tmp"
+        os.link(os.path.join(source_dir, kept_name), tmp_path)
+        os.replace(tmp_path, link_path)
+    except OSError:
+        # 不支持硬链接时保留移动后的副本
+        pass
+
+def apply_rename_plan(plan, logger=None, duplicate_action="link"):
+    """
+    按计划批量执行重命名，然后处理重复文件；逐文件细节只在DEBUG级别记录
+    :return: {'renamed', 'duplicates', 'skipped', 'errors'}
+    """
+    source_dir = plan['dir']
+    renamed = 0
+    merged = 0
+    errors = 0
+    for old_name, new_name in plan['renames']:
+        try:
+            os.rename(os.path.join(source_dir, old_name), os.path.join(source_dir, new_name))
+            renamed += 1
+            if logger:
+                logger.debug(f"  ✓ 重命名: {old_name} -> {new_name}")
+        except OSError as e:
+            errors += 1
+            if logger:
+                logger.log(f"  ✗ 错误: {old_name} - {str(e)}")
     
-    # 处理.step文件
-    for file_info in analysis['step_files']:
-        old_name = file_info['name']
-        name_without_ext = file_info['name_without_ext']
-        new_name_base = extract_name_before_underscore(name_without_ext)
-        new_filename = f"{new_name_base}.stp"
-        
-        files_to_rename.append({
-            'old_name': old_name,
-            'new_name': new_filename,
-            'type': 'step'
-        })
-    
-    # 处理带下划线的.stp文件
-    for file_info in analysis['stp_with_underscore']:
-        old_name = file_info['name']
-        name_without_ext = file_info['name_without_ext']
-        new_name_base = extract_name_before_underscore(name_without_ext)
-        new_filename = f"{new_name_base}.stp"
-        
-        files_to_rename.append({
-            'old_name': old_name,
-            'new_name': new_filename,
-            'type': 'stp_underscore'
-        })
-    
-    if not files_to_rename:
-        logger.log("没有需要重命名的文件")
-        return
+    for old_name, kept_name in plan['duplicates']:
+        try:
+            resolve_duplicate(source_dir, old_name, kept_name, duplicate_action)
+            merged += 1
+            if logger:
+                logger.debug(f"  = 重复文件: {old_name} 与 {kept_name} 内容相同 ({duplicate_action})")
+        except OSError as e:
+            errors += 1
+            if logger:
+                logger.log(f"  ✗ 错误: {old_name} - {str(e)}")
     
-    # 显示将要进行的操作
-    logger.log(f"将要重命名 {len(files_to_rename)} 个文件:")
-    logger.log("-" * 40)
+    if logger:
+        for old_name, reason in plan['skipped']:
+            logger.log(f"  跳过: {old_name} ({reason})")
     
-    for i, file_info in enumerate(files_to_rename[:10], 1):
-        logger.log(f"{i}. {file_info['old_name']} -> {file_info['new_name']}")
+    return {
+        'renamed': renamed,
+        'duplicates': merged,
+        'skipped': len(plan['skipped']),
+        'errors': errors
+    }
+
+def apply_rename_plans(plans, logger=None, workers=1, duplicate_action="link"):
+    """
+    执行多个目录的重命名计划，workers > 1 时各目录并行处理
+    """
+    if workers > 1 and len(plans) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda plan: apply_rename_plan(plan, logger, duplicate_action), plans))
+    else:
+        results = [apply_rename_plan(plan, logger, duplicate_action) for plan in plans]
     
-    if len(files_to_rename) > 10:
-        logger.log(f"  ... 还有 {len(files_to_rename) - 10} 个文件")
+    return {
+        'renamed': sum(r['renamed'] for r in results),
+        'duplicates': sum(r['duplicates'] for r in results),
+        'skipped': sum(r['skipped'] for r in results),
+        'errors': sum(r['errors'] for r in results)
+    }
+
+def log_rename_plans(plans, logger):
+    """
+    汇总显示重命名计划
+    """
+    for plan in plans:
+        analysis = plan['analysis']
+        logger.log(f"目录: {plan['dir']}")
+        logger.log(f"  .step文件: {len(analysis['step_files'])}, 带下划线的.stp文件: {len(analysis['stp_with_underscore'])}, "
+                   f"干净的.stp文件: {len(analysis['stp_clean'])}, 其他文件: {len(analysis['other_files'])}")
+        logger.log(f"  计划重命名: {len(plan['renames'])} (其中内容不同的变体: {plan['variants']}), "
+                   f"重复文件: {len(plan['duplicates'])}, 跳过: {len(plan['skipped'])}")
+
+def process_files_complete(source_dirs, logger, journal_dir=None, workers=1, dry_run=False,
+                           duplicate_action="link", confirm=False):
+    """
+    完整处理所有文件：每个目录扫描一次生成重命名计划，写出计划日志后批量执行
+    confirm 为真时先列出将要进行的操作，用户确认后才执行
+    """
+    if isinstance(source_dirs, (str, Path)):
+        source_dirs = [source_dirs]
+    
+    plans = []
+    for source_dir in source_dirs:
+        source_dir = Path(source_dir)
+        if not source_dir.exists():
+            logger.log(f"错误: 目录 {source_dir} 不存在")
+            continue
+        plans.append(build_rename_plan(source_dir))
     
-    # 询问用户确认
-    confirm = input("\n确认要执行重命名操作吗? (y/N): ").strip().lower()
-    if confirm not in ['y', 'yes']:
-        logger.log("用户取消操作")
+    if not plans:
         return
     
-    # 执行重命名
-    logger.log("开始执行重命名操作...")
-    logger.log("-" * 40)
-    
-    total_renamed = 0
-    total_skipped = 0
-    total_errors = 0
+    # 显示计划
+    logger.log("分析目录文件...")
+    log_rename_plans(plans, logger)
+    logger.log("-" * 60)
     
-    for file_info in files_to_rename:
-        old_path = source_dir / file_info['old_name']
-        new_path = source_dir / file_info['new_name']
-        
-        logger.log(f"处理: {file_info['old_name']} -> {file_info['new_name']}")
-        
-        # 检查目标文件是否已存在
-        if new_path.exists():
-            logger.log(f"  跳过: 目标文件已存在")
-            total_skipped += 1
-            continue
-        
-        try:
-            old_path.rename(new_path)
-            logger.log(f"  ✓ 重命名成功")
-            total_renamed += 1
-        except Exception as e:
-            logger.log(f"  ✗ 错误: {str(e)}")
-            total_errors += 1
-        
-        logger.log("")
+    if dry_run or confirm:
+        for plan in plans:
+            for old_name, new_name in plan['renames'][:10]:
+                logger.log(f"  {old_name} -> {new_name}")
+            if len(plan['renames']) > 10:
+                logger.log(f"  ... 还有 {len(plan['renames']) - 10} 个文件")
+            for old_name, kept_name in plan['duplicates'][:10]:
+                logger.log(f"  {old_name} = {kept_name} (内容相同)")
+    
+    # 预演或用户取消时没有改动任何文件
+    unchanged = {
+        'renamed': 0,
+        'duplicates': 0,
+        'skipped': sum(len(plan['skipped']) for plan in plans),
+        'errors': 0
+    }
+    if dry_run:
+        logger.log("预演模式，未重命名任何文件")
+        return unchanged
+    
+    if confirm:
+        if not any(plan['renames'] or plan['duplicates'] for plan in plans):
+            logger.log("没有需要重命名的文件")
+            return unchanged
+        logger.flush()
+        answer = input(f"\n确认要执行重命名操作吗? 重复文件处理方式: {duplicate_action} (y/N): ").strip().lower()
+        if answer not in ['y', 'yes']:
+            logger.log("用户取消操作")
+            return unchanged
+        logger.log("开始执行重命名操作...")
+    
+    journal_dir = journal_dir or logger.log_dir
+    if journal_dir is not None and any(plan['renames'] or plan['duplicates'] for plan in plans):
+        journal_file = write_rename_journal(plans, journal_dir, duplicate_action)
+        logger.log(f"重命名计划已写入: {journal_file}")
+    
+    result = apply_rename_plans(plans, logger, workers, duplicate_action)
     
     # 打印最终统计
     logger.log("=" * 60)
     logger.log("处理完成!")
-    logger.log(f"成功重命名: {total_renamed}")
-    logger.log(f"跳过文件: {total_skipped}")
-    logger.log(f"错误文件: {total_errors}")
+    logger.log(f"成功重命名: {result['renamed']}")
+    logger.log(f"重复文件: {result['duplicates']}")
+    logger.log(f"跳过文件: {result['skipped']}")
+    logger.log(f"错误文件: {result['errors']}")
+    
+    return result
 
 def show_current_status(source_dir, logger):
     """
@@ -398,9 +436,19 @@ def main():
     print("STEP文件重命名工具 - 支持DEBUG/RELEASE模式")
     print("=" * 60)
     
+    parser = argparse.ArgumentParser(description="STEP文件重命名工具")
+    parser.add_argument("mode", nargs="?", help="运行模式 DEBUG / RELEASE")
+    parser.add_argument("--dir", action="append", default=[], help="额外处理的目录（可多次指定）")
+    parser.add_argument("--workers", type=int, default=1, help="多个目录并行重命名的线程数")
+    parser.add_argument("--dry-run", action="store_true", help="只显示重命名计划，不执行")
+    parser.add_argument("--confirm", action="store_true", help="显示重命名计划并询问确认后再执行")
+    parser.add_argument("--duplicates", choices=DUPLICATE_ACTIONS, default="link",
+                        help="内容相同的重复文件: link 移入.duplicates并硬链接, merge 直接删除")
+    args = parser.parse_args()
+    
     # 检查命令行参数
-    if len(sys.argv) > 1:
-        mode = sys.argv[1].upper()
+    if args.mode:
+        mode = args.mode.upper()
         if mode not in ['DEBUG', 'RELEASE']:
             print(f"错误: 不支持的运行模式 '{mode}'")
             print("支持的模式: DEBUG, RELEASE")
@@ -442,17 +490,20 @@ def main():
         return
     
     # 创建日志记录器
-    logger = Logger(config['log_dir'])
+    logger = Logger(config['log_dir'], prefix="rename_step", time_format="%Y-%m-%d %H:%M:%S")
     logger.log(f"开始处理 - 模式: {mode}")
     logger.log(f"输入目录: {input_dir}")
     logger.log(f"日志目录: {config['log_dir']}")
     
     try:
         # 执行文件处理
-        result = process_files_complete(input_dir, logger)
+        result = process_files_complete([input_dir] + [Path(d) for d in args.dir], logger,
+                                        workers=args.workers, dry_run=args.dry_run,
+                                        duplicate_action=args.duplicates, confirm=args.confirm)
         
         if result:
-            logger.log(f"处理完成 - 重命名: {result['renamed']}, 跳过: {result['skipped']}, 错误: {result['errors']}")
+            logger.log(f"处理完成 - 重命名: {result['renamed']}, 重复: {result['duplicates']}, "
+                       f"跳过: {result['skipped']}, 错误: {result['errors']}")
         else:
             logger.log("处理失败")
             
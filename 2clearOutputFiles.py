@@ -6,6 +6,20 @@ import shutil
 from pathlib import Path
 import datetime
 import sys
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from steplogger import Logger
+from stepoutput import check_model_output, read_render_manifest, cleanup_stale_staging, find_model_output_dirs
+from stepindex import FileIndex
+from stepcorpus import input_exists
+
+# 快速清理时输出目录被重命名为 .trash_<目录名>_<时间戳>，与输出目录位于同一父目录（同一文件系统）
+TRASH_PREFIX = ".trash_"
+
+# 后台删除的默认线程数
+DEFAULT_PURGE_WORKERS = 8
 
 def get_mode_config(mode):
     """
@@ -13,66 +27,21 @@ def get_mode_config(mode):
     """
     if mode.upper() == 'DEBUG':
         return {
+            'input_dir': 'step2viewdata/debug_traceparts',
             'output_dir': 'step2viewdata/debug_output',
-            'log_dir': 'step2viewdata/debug_processlog'
+            'log_dir': 'step2viewdata/debug_processlog',
+            'index_path': 'step2viewdata/debug_fileindex.sqlite'
         }
     elif mode.upper() == 'RELEASE':
         return {
+            'input_dir': 'step2viewdata/release_traceparts',
             'output_dir': 'step2viewdata/release_output',
-            'log_dir': 'step2viewdata/release_processlog'
+            'log_dir': 'step2viewdata/release_processlog',
+            'index_path': 'step2viewdata/release_fileindex.sqlite'
         }
     else:
         raise ValueError(f"不支持的运行模式: {mode}")
 
-class Logger:
-    """
-    日志记录器，同时输出到控制台和文件
-    """
-    def __init__(self, log_dir):
-        self.log_dir = Path(log_dir)
-        self.log_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 创建日志文件名（包含时间戳）
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_file = self.log_dir / f"clearoutput_{timestamp}.log"
-        
-        # 打开日志文件
-        self.log_handle = open(self.log_file, 'w', encoding='utf-8')
-        
-        # 记录开始时间
-        self.start_time = datetime.datetime.now()
-        self.log(f"日志开始时间: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        self.log(f"日志文件: {self.log_file}")
-        self.log("-" * 60)
-    
-    def log(self, message):
-        """
-        记录日志消息
-        """
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] {message}"
-        
-        # 输出到控制台
-        print(log_message)
-        
-        # 输出到文件
-        self.log_handle.write(log_message + '\n')
-        self.log_handle.flush()  # 立即写入文件
-    
-    def close(self):
-        """
-        关闭日志文件
-        """
-        end_time = datetime.datetime.now()
-        duration = end_time - self.start_time
-        
-        self.log("-" * 60)
-        self.log(f"日志结束时间: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        self.log(f"总耗时: {duration}")
-        self.log(f"日志文件保存位置: {self.log_file}")
-        
-        self.log_handle.close()
-
 def clear_output_directory(logger, output_dir):
     """
     清除指定目录下的所有子文件和子目录
@@ -160,6 +129,7 @@ def clear_output_directory_safe(logger, output_dir):
     
     # 询问用户确认
     logger.log("等待用户确认...")
+    logger.flush()
     confirm = input("确认删除吗? (y/N): ").strip().lower()
     
     if confirm in ['y', 'yes']:
@@ -175,6 +145,251 @@ def clear_output_directory_auto(logger, output_dir):
     logger.log("自动清理模式")
     clear_output_directory(logger, output_dir)
 
+def find_trash_directories(output_dir):
+    """
+    查找该输出目录遗留的回收目录（例如上次后台删除被中断）
+    """
+    parent = output_dir.parent
+    if not parent.exists():
+        return []
+    prefix = f"{TRASH_PREFIX}{output_dir.name}_"
+    return sorted(parent / entry.name for entry in os.scandir(parent)
+                  if entry.name.startswith(prefix) and entry.is_dir(follow_symlinks=False))
+
+def _purge_subtree(path):
+    """
+    用 os.scandir 递归删除一个子树，返回 (文件数, 目录数, 错误数)
+    """
+    files = 0
+    dirs = 0
+    errors = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0, 0, 1
+
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                sub_files, sub_dirs, sub_errors = _purge_subtree(entry.path)
+                files += sub_files
+                dirs += sub_dirs
+                errors += sub_errors
+            else:
+                os.unlink(entry.path)
+                files += 1
+        except OSError:
+            errors += 1
+
+    try:
+        os.rmdir(path)
+        dirs += 1
+    except OSError:
+        errors += 1
+    return files, dirs, errors
+
+def purge_directory_tree(root, workers=DEFAULT_PURGE_WORKERS):
+    """
+    并行删除整个目录树：顶层条目（每个模型一个子目录）分给线程池，
+    返回 (文件数, 目录数, 错误数)
+    """
+    root = Path(root)
+    files = 0
+    dirs = 0
+    errors = 0
+    subdirs = []
+
+    for entry in os.scandir(root):
+        if entry.is_dir(follow_symlinks=False):
+            subdirs.append(entry.path)
+        else:
+            try:
+                os.unlink(entry.path)
+                files += 1
+            except OSError:
+                errors += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for sub_files, sub_dirs, sub_errors in executor.map(_purge_subtree, subdirs):
+            files += sub_files
+            dirs += sub_dirs
+            errors += sub_errors
+
+    try:
+        os.rmdir(root)
+    except OSError:
+        errors += 1
+    return files, dirs, errors
+
+def purge_trash_directories(logger, trash_dirs, workers=DEFAULT_PURGE_WORKERS):
+    """
+    删除回收目录，只记录汇总数量
+    """
+    for trash_dir in trash_dirs:
+        start_time = time.time()
+        files, dirs, errors = purge_directory_tree(trash_dir, workers)
+        logger.log(f"后台删除完成: {trash_dir.name} - {files} 个文件, {dirs} 个目录, "
+                   f"{errors} 个错误, 耗时 {time.time() - start_time:.2f}秒")
+
+def start_background_purge(trash_dirs, log_dir, workers=DEFAULT_PURGE_WORKERS):
+    """
+    启动独立的后台进程删除回收目录，当前进程无需等待
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--purge-trash"] + \
+              [str(trash_dir) for trash_dir in trash_dirs] + \
+              ["--log-dir", str(log_dir), "--workers", str(workers)]
+    kwargs = {}
+    if os.name == "nt":
+        kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, **kwargs)
+    return process.pid
+
+def clear_output_directory_fast(logger, output_dir, log_dir, wait=False, workers=DEFAULT_PURGE_WORKERS):
+    """
+    快速清理：把输出目录原子重命名到回收位置并立即创建新的空目录，
+    删除工作交给后台线程池（wait=False 时在独立进程中继续）
+    """
+    logger.log("快速清理模式")
+
+    if not output_dir.exists():
+        logger.log(f"输出目录 {output_dir} 不存在，无需清理")
+        return
+
+    start_time = time.time()
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    trash_dir = output_dir.parent / f"{TRASH_PREFIX}{output_dir.name}_{timestamp}"
+
+    try:
+        os.rename(output_dir, trash_dir)
+    except OSError as e:
+        logger.log(f"重命名输出目录失败: {str(e)}")
+        return
+    output_dir.mkdir(parents=True, exist_ok=True)
+    logger.log(f"输出目录已清空，可立即使用 (耗时 {time.time() - start_time:.3f}秒)")
+
+    # 一并处理之前遗留的回收目录
+    trash_dirs = find_trash_directories(output_dir)
+    if len(trash_dirs) > 1:
+        logger.log(f"发现 {len(trash_dirs) - 1} 个遗留的回收目录，一并删除")
+
+    if wait:
+        purge_trash_directories(logger, trash_dirs, workers)
+    else:
+        pid = start_background_purge(trash_dirs, log_dir, workers)
+        logger.log(f"后台删除进程已启动 (PID {pid})，{len(trash_dirs)} 个回收目录")
+
+def collect_output_garbage(output_dir, input_roots, recursive=False, index_path=None):
+    """
+    对比输出目录与当前输入文件和渲染参数，找出需要删除的模型目录
+    不在当前输入根目录中的模型按清单记录的输入文件路径判断：只有记录的输入文件已不存在时才视为孤立，
+    旧版本清单没有记录路径时无法判断，保留并计入未验证
+    :return: (待删除列表 [(目录, 原因)], 保留列表 [(目录, 渲染耗时或None)], 未验证数量)
+    """
+    # 当前输入：标签 -> STEP文件路径（通过文件索引增量扫描）
+    index = FileIndex(index_path or os.path.join(os.path.dirname(str(output_dir)), "fileindex.sqlite"))
+    try:
+        entries, _ = index.refresh(input_roots, recursive)
+    finally:
+        index.close()
+    inputs = dict((label, step_path) for step_path, label in entries)
+
+    to_delete = []
+    to_keep = []
+    unverified = 0
+    for label, model_dir in find_model_output_dirs(output_dir):
+        step_path = inputs.get(label)
+        if step_path is None:
+            manifest = read_render_manifest(model_dir) or {}
+            step_path = manifest.get('source_path')
+            if step_path is None:
+                unverified += 1
+                to_keep.append((model_dir, None))
+                continue
+            if not input_exists(step_path):
+                to_delete.append((model_dir, "输入文件已删除"))
+                continue
+
+        status, reason = check_model_output(model_dir, step_path)
+        if status == "stale":
+            to_delete.append((model_dir, reason))
+            continue
+
+        if status == "unverified":
+            unverified += 1
+            to_keep.append((model_dir, None))
+        else:
+            manifest = read_render_manifest(model_dir)
+            to_keep.append((model_dir, manifest.get('render_time')))
+
+    return to_delete, to_keep, unverified
+
+def gc_output_directory(logger, output_dir, input_roots, dry_run=False, confirm=True,
+                        workers=DEFAULT_PURGE_WORKERS, recursive=False, index_path=None):
+    """
+    选择性清理：只删除孤立（输入已删除）或过期（输入或渲染参数变化、视角不全）的模型目录，
+    并报告保留下来的渲染时间
+    """
+    if isinstance(input_roots, (str, Path)):
+        input_roots = [input_roots]
+    logger.log(f"选择性清理: {output_dir} (输入目录: {', '.join(str(root) for root in input_roots)})")
+
+    if not output_dir.exists():
+        logger.log(f"输出目录 {output_dir} 不存在，无需清理")
+        return
+
+    if not dry_run:
+        removed = cleanup_stale_staging(output_dir)
+        if removed:
+            logger.log(f"删除中断遗留的暂存目录: {removed}")
+
+    to_delete, to_keep, unverified = collect_output_garbage(output_dir, input_roots, recursive, index_path)
+
+    # 统计删除原因
+    reasons = {}
+    for _, reason in to_delete:
+        key = reason.split(" (")[0]
+        reasons[key] = reasons.get(key, 0) + 1
+
+    logger.log(f"待删除模型目录: {len(to_delete)}")
+    for reason, count in sorted(reasons.items()):
+        logger.log(f"  - {reason}: {count}")
+    for path, reason in to_delete[:10]:
+        logger.log(f"    {os.path.relpath(path, output_dir)} ({reason})")
+    if len(to_delete) > 10:
+        logger.log(f"    ... 还有 {len(to_delete) - 10} 个")
+
+    # 保留的渲染时间：有清单的按记录累计，旧版本输出按平均值估算
+    known_times = [t for _, t in to_keep if t is not None]
+    preserved_time = sum(known_times)
+    if unverified and known_times:
+        preserved_time += unverified * (preserved_time / len(known_times))
+    logger.log(f"保留模型目录: {len(to_keep)} (其中 {unverified} 个没有渲染清单或清单未记录输入路径，按有效处理)")
+    logger.log(f"保留的渲染时间: 约 {preserved_time / 3600:.2f} 小时 ({preserved_time:.1f}秒)"
+               + (" (含估算)" if unverified and known_times else ""))
+
+    if not to_delete or dry_run:
+        if dry_run:
+            logger.log("预演模式，未删除任何内容")
+        return
+
+    if confirm:
+        logger.flush()
+        answer = input(f"确认删除 {len(to_delete)} 个模型目录吗? (y/N): ").strip().lower()
+        if answer not in ['y', 'yes']:
+            logger.log("用户取消操作")
+            return
+
+    files = 0
+    errors = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for sub_files, sub_dirs, sub_errors in executor.map(_purge_subtree, [p for p, _ in to_delete]):
+            files += sub_files
+            errors += sub_errors
+    logger.log(f"选择性清理完成: 删除 {len(to_delete)} 个模型目录, {files} 个文件, {errors} 个错误")
+
 def show_log_directory_info(logger, log_dir):
     """
     显示日志目录信息
@@ -198,13 +413,37 @@ def main():
     """
     主函数，支持命令行参数和模式选择
     """
+    parser = argparse.ArgumentParser(description="清理输出目录工具")
+    parser.add_argument("mode", nargs="?", help="运行模式: DEBUG / RELEASE")
+    parser.add_argument("--fast", action="store_true", help="快速清理：重命名后后台删除（不询问）")
+    parser.add_argument("--wait", action="store_true", help="快速清理时在当前进程等待删除完成")
+    parser.add_argument("--gc", action="store_true", help="选择性清理：只删除孤立或过期的模型目录")
+    parser.add_argument("--yes", action="store_true", help="选择性清理时不询问，直接删除")
+    parser.add_argument("--dry-run", action="store_true", help="选择性清理只报告不删除")
+    parser.add_argument("--input-root", action="append", default=[],
+                        help="选择性清理时额外的输入根目录（与生成时一致）")
+    parser.add_argument("--recursive", action="store_true", help="选择性清理时递归扫描输入根目录")
+    parser.add_argument("--workers", type=int, default=DEFAULT_PURGE_WORKERS, help="删除线程数")
+    parser.add_argument("--purge-trash", nargs="+", help=argparse.SUPPRESS)
+    parser.add_argument("--log-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    # 后台删除进程入口
+    if args.purge_trash:
+        logger = Logger(args.log_dir, prefix="purge_trash", console=False)
+        try:
+            purge_trash_directories(logger, [Path(p) for p in args.purge_trash], args.workers)
+        finally:
+            logger.close()
+        return
+    
     print("=" * 60)
     print("清理输出目录工具 - 支持DEBUG/RELEASE模式")
     print("=" * 60)
     
     # 检查命令行参数
-    if len(sys.argv) > 1:
-        mode = sys.argv[1].upper()
+    if args.mode:
+        mode = args.mode.upper()
         if mode not in ['DEBUG', 'RELEASE']:
             print(f"错误: 不支持的运行模式 '{mode}'")
             print("支持的模式: DEBUG, RELEASE")
@@ -239,7 +478,7 @@ def main():
     print("-" * 60)
     
     # 创建日志记录器
-    logger = Logger(config['log_dir'])
+    logger = Logger(config['log_dir'], prefix="clearoutput")
     logger.log(f"开始处理 - 模式: {mode}")
     logger.log(f"输出目录: {config['output_dir']}")
     logger.log(f"日志目录: {config['log_dir']}")
@@ -248,15 +487,28 @@ def main():
         # 显示日志目录信息
         show_log_directory_info(logger, Path(config['log_dir']))
         logger.log("-" * 60)
+        logger.flush()
         
         # 选择清理模式
+        if args.fast:
+            clear_output_directory_fast(logger, Path(config['output_dir']), config['log_dir'],
+                                        wait=args.wait, workers=args.workers)
+            return
+        if args.gc:
+            gc_output_directory(logger, Path(config['output_dir']), [config['input_dir']] + args.input_root,
+                                dry_run=args.dry_run, confirm=not args.yes, workers=args.workers,
+                                recursive=args.recursive, index_path=config['index_path'])
+            return
+        
         print("\n选择清理模式:")
         print("1. 安全模式 (需要确认)")
         print("2. 自动模式 (无需确认)")
         print("3. 仅显示日志信息")
+        print("4. 快速模式 (重命名后后台删除，输出目录立即可用)")
+        print("5. 选择性清理 (只删除孤立或过期的模型目录)")
         
         while True:
-            choice = input("请输入选择 (1/2/3): ").strip()
+            choice = input("请输入选择 (1/2/3/4/5): ").strip()
             if choice == "1":
                 logger.log("选择安全模式")
                 clear_output_directory_safe(logger, Path(config['output_dir']))
@@ -268,8 +520,17 @@ def main():
             elif choice == "3":
                 logger.log("仅显示日志信息")
                 break
+            elif choice == "4":
+                clear_output_directory_fast(logger, Path(config['output_dir']), config['log_dir'],
+                                            wait=args.wait, workers=args.workers)
+                break
+            elif choice == "5":
+                gc_output_directory(logger, Path(config['output_dir']), [config['input_dir']] + args.input_root,
+                                    dry_run=args.dry_run, workers=args.workers, recursive=args.recursive,
+                                    index_path=config['index_path'])
+                break
             else:
-                print("无效选择，请输入 1、2 或 3")
+                print("无效选择，请输入 1、2、3、4 或 5")
                 
     except Exception as e:
         logger.log(f"处理过程中发生错误: {str(e)}")
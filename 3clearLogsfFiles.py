@@ -6,6 +6,24 @@ import shutil
 from pathlib import Path
 import datetime
 import sys
+import time
+import tarfile
+import argparse
+from steplogger import Logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 日志目录中需要管理的文件：文本日志、结构化事件和逐文件结果
+LOG_PATTERNS = ("*.log", "*.jsonl", "*.csv")
+
+# 归档子目录
+ARCHIVE_DIR_NAME = "archive"
+
+# 最近修改过的文件可能仍在写入，不参与归档（秒）
+ACTIVE_FILE_SECONDS = 60
 
 def get_mode_config(mode):
     """
@@ -22,14 +40,16 @@ def get_mode_config(mode):
     else:
         raise ValueError(f"不支持的运行模式: {mode}")
 
-def print_log(message):
+def list_log_files(log_dir):
     """
-    简单的控制台日志输出
+    列出日志目录下的日志和事件文件（不含归档）
     """
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] {message}")
+    log_files = []
+    for pattern in LOG_PATTERNS:
+        log_files.extend(Path(log_dir).glob(pattern))
+    return log_files
 
-def clear_log_directory(log_dir_path):
+def clear_log_directory(log_dir_path, logger):
     """
     清除指定目录下的所有日志文件
     """
@@ -37,32 +57,33 @@ def clear_log_directory(log_dir_path):
     
     # 检查目录是否存在
     if not log_dir.exists():
-        print_log(f"日志目录不存在: {log_dir}")
+        logger.log(f"日志目录不存在: {log_dir}")
         return False
     
     # 统计要删除的文件数量
-    log_files = list(log_dir.glob("*.log"))
+    log_files = list_log_files(log_dir)
     total_files = len(log_files)
     
     if total_files == 0:
-        print_log(f"日志目录为空: {log_dir}")
+        logger.log(f"日志目录为空: {log_dir}")
         return True
     
-    print_log(f"找到 {total_files} 个日志文件需要删除")
-    print("-" * 40)
+    logger.log(f"找到 {total_files} 个日志文件需要删除")
+    logger.log("-" * 40)
     
     # 显示将要删除的文件
     for i, log_file in enumerate(log_files, 1):
         file_size = log_file.stat().st_size
         mtime = datetime.datetime.fromtimestamp(log_file.stat().st_mtime)
-        print(f"{i:3d}. {log_file.name} ({file_size:,} 字节, {mtime.strftime('%Y-%m-%d %H:%M:%S')})")
+        logger.log(f"{i:3d}. {log_file.name} ({file_size:,} 字节, {mtime.strftime('%Y-%m-%d %H:%M:%S')})")
     
-    print("-" * 40)
+    logger.log("-" * 40)
     
     # 询问用户确认
+    logger.flush()
     confirm = input(f"确认删除 {total_files} 个日志文件吗？(y/N): ").strip().lower()
     if confirm not in ['y', 'yes']:
-        print_log("用户取消操作")
+        logger.log("用户取消操作")
         return False
     
     # 删除文件
@@ -72,40 +93,197 @@ def clear_log_directory(log_dir_path):
     for log_file in log_files:
         try:
             log_file.unlink()
-            print_log(f"删除文件: {log_file.name}")
+            logger.log(f"删除文件: {log_file.name}")
             deleted_count += 1
         except Exception as e:
-            print_log(f"删除文件失败 {log_file.name}: {e}")
+            logger.log(f"删除文件失败 {log_file.name}: {e}")
             error_count += 1
     
-    print("-" * 40)
-    print_log(f"删除完成: {deleted_count} 个文件成功删除, {error_count} 个文件删除失败")
+    logger.log("-" * 40)
+    logger.log(f"删除完成: {deleted_count} 个文件成功删除, {error_count} 个文件删除失败")
     
     return error_count == 0
 
-def show_log_directory_info(log_dir_path):
+def show_log_directory_info(log_dir_path, logger):
     """
     显示日志目录信息
     """
     log_dir = Path(log_dir_path)
     
     if log_dir.exists():
-        log_files = list(log_dir.glob("*.log"))
-        print_log(f"日志目录: {log_dir}")
-        print_log(f"现有日志文件数: {len(log_files)}")
+        log_files = list_log_files(log_dir)
+        logger.log(f"日志目录: {log_dir}")
+        logger.log(f"现有日志文件数: {len(log_files)}")
         
         if log_files:
-            print("日志文件列表:")
+            logger.log("日志文件列表:")
             # 按修改时间排序
             log_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
             for i, log_file in enumerate(log_files, 1):
                 file_size = log_file.stat().st_size
                 mtime = datetime.datetime.fromtimestamp(log_file.stat().st_mtime)
-                print(f"  {i:3d}. {log_file.name} ({file_size:,} 字节, {mtime.strftime('%Y-%m-%d %H:%M:%S')})")
+                logger.log(f"  {i:3d}. {log_file.name} ({file_size:,} 字节, {mtime.strftime('%Y-%m-%d %H:%M:%S')})")
         else:
-            print_log("目录为空")
+            logger.log("目录为空")
     else:
-        print_log(f"日志目录不存在: {log_dir}")
+        logger.log(f"日志目录不存在: {log_dir}")
+
+def select_logs_for_archive(log_files, max_age_days=None, max_size_mb=None):
+    """
+    根据保留策略选出需要归档的日志
+    1. 修改时间超过 max_age_days 天的日志
+    2. 剩余日志总大小仍超过 max_size_mb 时，从最旧的开始继续归档
+    """
+    now = time.time()
+    candidates = []
+    for log_file in log_files:
+        stat = log_file.stat()
+        if now - stat.st_mtime < ACTIVE_FILE_SECONDS:
+            continue
+        candidates.append((stat.st_mtime, stat.st_size, log_file))
+    candidates.sort(key=lambda x: x[0])
+
+    selected = []
+    remaining = []
+    for mtime, size, log_file in candidates:
+        if max_age_days is not None and now - mtime > max_age_days * 86400:
+            selected.append(log_file)
+        else:
+            remaining.append((mtime, size, log_file))
+
+    if max_size_mb is not None:
+        remaining_size = sum(size for _, size, _ in remaining)
+        limit = max_size_mb * 1024 * 1024
+        for mtime, size, log_file in remaining:
+            if remaining_size <= limit:
+                break
+            selected.append(log_file)
+            remaining_size -= size
+
+    return selected
+
+def get_archive_format(compression):
+    """
+    确定归档压缩格式：auto 优先使用 zstd（需要 zstandard 包），否则 gzip
+    """
+    if compression == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("zstd 压缩需要安装 zstandard 包 (pip install zstandard)")
+    return compression
+
+def _open_archive_writer(archive_path, archive_format):
+    """
+    打开写入归档，返回 (tarfile, 需要关闭的底层文件列表)
+    """
+    if archive_format == "gzip":
+        return tarfile.open(archive_path, "w:gz"), []
+    raw = open(archive_path, "wb")
+    writer = zstandard.ZstdCompressor(level=10).stream_writer(raw)
+    return tarfile.open(fileobj=writer, mode="w|"), [writer, raw]
+
+def _open_archive_reader(archive_path, archive_format):
+    """
+    打开读取归档，返回 (tarfile, 需要关闭的底层文件列表)
+    """
+    if archive_format == "gzip":
+        return tarfile.open(archive_path, "r:gz"), []
+    raw = open(archive_path, "rb")
+    reader = zstandard.ZstdDecompressor().stream_reader(raw)
+    return tarfile.open(fileobj=reader, mode="r|"), [reader, raw]
+
+def append_to_archive(archive_path, log_files, archive_format):
+    """
+    滚动归档：把已有归档的内容和新日志一起写入临时文件，再原子替换
+    写入失败（磁盘已满、已有归档损坏等）时删除临时文件，已有归档保持不变
+    """
+    tmp_path = archive_path.with_name(archive_path.name + ".tmp")
+    new_names = {log_file.name for log_file in log_files}
+
+    try:
+        tar_out, out_handles = _open_archive_writer(tmp_path, archive_format)
+        try:
+            if archive_path.exists():
+                tar_in, in_handles = _open_archive_reader(archive_path, archive_format)
+                try:
+                    for member in tar_in:
+                        if member.name in new_names:
+                            continue
+                        tar_out.addfile(member, tar_in.extractfile(member) if member.isfile() else None)
+                finally:
+                    tar_in.close()
+                    for handle in in_handles:
+                        handle.close()
+
+            for log_file in log_files:
+                tar_out.add(str(log_file), arcname=log_file.name)
+        finally:
+            tar_out.close()
+            for handle in out_handles:
+                handle.close()
+
+        os.replace(tmp_path, archive_path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def archive_log_directory(log_dir_path, logger, max_age_days=7, max_size_mb=100, compression="auto"):
+    """
+    按保留策略把旧日志压缩进按月滚动的归档 archive/processlog_YYYYMM.tar.gz|.tar.zst，
+    归档成功后删除原文件
+    """
+    log_dir = Path(log_dir_path)
+    if not log_dir.exists():
+        logger.log(f"日志目录不存在: {log_dir}")
+        return False
+
+    archive_format = get_archive_format(compression)
+    suffix = ".tar.zst" if archive_format == "zstd" else ".tar.gz"
+
+    selected = select_logs_for_archive(list_log_files(log_dir), max_age_days, max_size_mb)
+    logger.log(f"保留策略: 超过 {max_age_days} 天或总大小超过 {max_size_mb} MB 的日志归档 ({archive_format})")
+    if not selected:
+        logger.log("没有需要归档的日志")
+        return True
+
+    # 按修改月份分组
+    groups = {}
+    for log_file in selected:
+        month = datetime.datetime.fromtimestamp(log_file.stat().st_mtime).strftime("%Y%m")
+        groups.setdefault(month, []).append(log_file)
+
+    archive_dir = log_dir / ARCHIVE_DIR_NAME
+    archive_dir.mkdir(exist_ok=True)
+
+    archived_count = 0
+    original_bytes = 0
+    error_count = 0
+    for month, log_files in sorted(groups.items()):
+        archive_path = archive_dir / f"processlog_{month}{suffix}"
+        group_bytes = sum(log_file.stat().st_size for log_file in log_files)
+        try:
+            append_to_archive(archive_path, log_files, archive_format)
+        except Exception as e:
+            logger.log(f"归档失败 {archive_path.name}: {e}")
+            error_count += 1
+            continue
+
+        for log_file in log_files:
+            log_file.unlink()
+        archived_count += len(log_files)
+        original_bytes += group_bytes
+        logger.log(f"归档 {len(log_files)} 个文件 ({group_bytes:,} 字节) -> {archive_path.name} "
+                   f"({archive_path.stat().st_size:,} 字节)")
+
+    archive_bytes = sum(p.stat().st_size for p in archive_dir.glob("processlog_*.tar.*"))
+    logger.log("-" * 40)
+    logger.log(f"归档完成: {archived_count} 个文件, 原始大小 {original_bytes:,} 字节")
+    logger.log(f"归档目录总大小: {archive_bytes:,} 字节")
+
+    return error_count == 0
 
 def main():
     """
@@ -115,9 +293,18 @@ def main():
     print("日志文件清理工具 - 支持DEBUG/RELEASE模式")
     print("=" * 60)
     
+    parser = argparse.ArgumentParser(description="日志文件清理工具")
+    parser.add_argument("mode", nargs="?", help="运行模式: DEBUG / RELEASE")
+    parser.add_argument("--archive", action="store_true", help="按保留策略压缩归档旧日志（不询问）")
+    parser.add_argument("--max-age-days", type=float, default=7, help="超过该天数的日志归档")
+    parser.add_argument("--max-size-mb", type=float, default=100, help="未归档日志的总大小上限")
+    parser.add_argument("--compression", choices=["auto", "zstd", "gzip"], default="auto",
+                        help="归档压缩格式")
+    args = parser.parse_args()
+    
     # 检查命令行参数
-    if len(sys.argv) > 1:
-        mode = sys.argv[1].upper()
+    if args.mode:
+        mode = args.mode.upper()
         if mode not in ['DEBUG', 'RELEASE']:
             print(f"错误: 不支持的运行模式 '{mode}'")
             print("支持的模式: DEBUG, RELEASE")
@@ -139,30 +326,48 @@ def main():
             else:
                 print("无效选择，请输入 1 或 2")
     
+    # 控制台日志记录器（日志目录本身是清理对象，不写日志文件）
+    logger = Logger(None, time_format="%Y-%m-%d %H:%M:%S")
+    
     try:
         # 获取模式配置
         config = get_mode_config(mode)
         log_dir = config['log_dir']
         
-        print(f"\n运行模式: {mode}")
-        print(f"日志目录: {log_dir}")
-        print("-" * 60)
+        logger.log(f"运行模式: {mode}")
+        logger.log(f"日志目录: {log_dir}")
+        logger.log("-" * 60)
         
         # 显示当前状态
-        print_log(f"开始清理 {mode} 模式的日志文件")
-        show_log_directory_info(log_dir)
+        logger.log(f"开始清理 {mode} 模式的日志文件")
+        show_log_directory_info(log_dir, logger)
+        
+        # 选择操作
+        if args.archive:
+            action = "2"
+        else:
+            logger.flush()
+            print("\n选择操作:")
+            print("1. 删除全部日志 (需要确认)")
+            print(f"2. 按保留策略压缩归档 (超过 {args.max_age_days:g} 天或总大小超过 {args.max_size_mb:g} MB)")
+            action = input("请输入选择 (1/2，默认1): ").strip() or "1"
         
         # 执行清理操作
-        success = clear_log_directory(log_dir)
+        if action == "2":
+            success = archive_log_directory(log_dir, logger, args.max_age_days,
+                                            args.max_size_mb, args.compression)
+        else:
+            success = clear_log_directory(log_dir, logger)
         
         if success:
-            print_log("日志清理操作完成")
+            logger.log("日志清理操作完成")
         else:
-            print_log("日志清理操作部分失败")
+            logger.log("日志清理操作部分失败")
             
     except Exception as e:
-        print(f"程序执行出错: {e}")
-        return
+        logger.log(f"程序执行出错: {e}")
+    finally:
+        logger.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
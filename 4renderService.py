@@ -0,0 +1,530 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地多视角渲染服务：常驻渲染工作进程，按需为单个STEP文件生成视角图片
+
+接口:
+  POST /render?path=<STEP路径>[&format=zip]        渲染服务器本地的STEP文件
+  POST /render?name=<文件名>[&format=zip] + 请求体   上传STEP文件并渲染
+  GET  /metrics                                    Prometheus 指标
+  GET  /health                                     健康检查
+
+使用方法:
+  python 4renderService.py DEBUG --port 8765 --workers 2
+  python 4renderService.py RELEASE --unix-socket /tmp/step2view.sock
+"""
+
+import os
+import io
+import json
+import uuid
+import time
+import queue
+import shutil
+import zipfile
+import argparse
+import threading
+import multiprocessing
+import socketserver
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from steprender import start_render_worker
+from stepcorpus import step_stem, split_archive_path, input_stat, input_exists, is_step_file
+from stepoutput import cleanup_stale_staging
+from stepmetrics import MetricsRegistry
+from steplogger import Logger
+
+def get_mode_config(mode):
+    """
+    根据运行模式获取配置
+    """
+    if mode.upper() == 'DEBUG':
+        return {
+            'work_dir': 'step2viewdata/debug_service_output',
+            'log_dir': 'step2viewdata/debug_processlog'
+        }
+    elif mode.upper() == 'RELEASE':
+        return {
+            'work_dir': 'step2viewdata/release_service_output',
+            'log_dir': 'step2viewdata/release_processlog'
+        }
+    else:
+        raise ValueError(f"不支持的运行模式: {mode}")
+
+class RenderJob:
+    """
+    单个渲染请求
+    """
+    def __init__(self, step_path, work_dir, keep_output, upload_dir=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.step_path = step_path
+        self.upload_dir = upload_dir  # 上传文件所在的临时目录，任务结束后删除
+        class_ = step_stem(step_path)
+        self.output_subdir = str(Path(work_dir) / self.job_id / class_)
+        self.keep_output = keep_output
+        self.submit_time = time.time()
+        self.done = threading.Event()
+        self.status = None
+        self.detail = {}
+        self.render_time = 0.0
+        self.leader = None  # 同批次内重复请求指向实际渲染的任务
+        self.abandoned = False  # 请求已超时返回，任务完成后由回收线程释放
+
+class RenderService:
+    """
+    渲染服务核心：请求排队、按批分发到常驻工作进程、回收结果，
+    工作进程异常退出时让它持有的任务失败并重启该进程
+    """
+    def __init__(self, work_dir, logger, workers=2, batch_size=8, batch_wait=0.05):
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.logger = logger
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+
+        # OCC/Qt 状态不能跨 fork 继承，工作进程使用 spawn 启动
+        ctx = multiprocessing.get_context("spawn")
+        self.ctx = ctx
+        self.result_queue = ctx.Queue()
+        self.pending = queue.Queue()
+        self.jobs = {}
+        self.output_refs = {}
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        # 每个工作进程有自己的任务队列，worker['job'] 为它持有（已分发、未返回结果）的任务编号集合
+        self.pool = []
+        self.running = False
+
+        self.metrics = MetricsRegistry()
+        self.requests_total = self.metrics.counter(
+            "step2view_service_requests_total", "渲染请求总数")
+        self.request_latency = self.metrics.histogram(
+            "step2view_service_request_latency_seconds", "渲染请求端到端耗时")
+        self.render_seconds = self.metrics.histogram(
+            "step2view_service_render_seconds", "工作进程内单个模型渲染耗时")
+        self.batch_sizes = self.metrics.histogram(
+            "step2view_service_batch_size", "每批分发的模型数量",
+            buckets=tuple(range(1, batch_size + 1)))
+        self.metrics.gauge(
+            "step2view_service_queue_depth", "等待分发和正在渲染的请求数",
+            func=lambda: self.pending.qsize() + self.in_flight)
+        self.metrics.gauge(
+            "step2view_service_workers", "常驻渲染工作进程数",
+            func=lambda: sum(1 for worker in self.pool if worker['process'].is_alive()))
+        self.worker_restarts = self.metrics.counter(
+            "step2view_service_worker_restarts_total", "异常退出后重启的渲染工作进程数")
+
+    def start(self):
+        """
+        启动工作进程以及分发/回收线程
+        """
+        self.running = True
+        removed = cleanup_stale_staging(self.work_dir)
+        if removed:
+            self.logger.log(f"清理上次中断遗留的不完整输出: {removed}")
+        # 上次运行遗留的上传文件（服务中断时尚未释放的请求）
+        uploads_dir = self.work_dir / "uploads"
+        if uploads_dir.exists():
+            shutil.rmtree(uploads_dir, ignore_errors=True)
+            self.logger.log(f"清理上次运行遗留的上传文件: {uploads_dir}")
+        self.pool = [self._start_worker(i) for i in range(self.workers)]
+        self.logger.log(f"已启动 {self.workers} 个渲染工作进程")
+
+        threading.Thread(target=self._dispatch_loop, name="dispatcher", daemon=True).start()
+        threading.Thread(target=self._collect_loop, name="collector", daemon=True).start()
+
+    def _start_worker(self, worker_no):
+        """
+        启动一个渲染工作进程
+        暂存目录建在工作目录下，与各请求的输出目录在同一文件系统，启动时统一清理；
+        工作进程的后端初始化日志经日志队列写入服务日志
+        """
+        worker = start_render_worker(self.ctx, self.result_queue, worker_no, output_root=str(self.work_dir),
+                                     log_queue=self.logger.process_queue())
+        worker['job'] = set()
+        return worker
+
+    def stop(self):
+        """
+        通知工作进程退出
+        """
+        self.running = False
+        for worker in self.pool:
+            worker['tasks'].put(None)
+        for worker in self.pool:
+            worker['process'].join(timeout=10)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+        # 工作进程已退出，超时请求的任务不会再完成，在这里释放
+        with self.lock:
+            abandoned = [job for job in self.jobs.values() if job.abandoned]
+        for job in abandoned:
+            self.release(job)
+        self.logger.log("渲染工作进程已停止")
+
+    def submit(self, step_path, keep_output=True, upload_dir=None):
+        """
+        提交一个渲染请求，返回 RenderJob
+        """
+        job = RenderJob(step_path, self.work_dir, keep_output, upload_dir)
+        with self.lock:
+            self.jobs[job.job_id] = job
+        self.pending.put(job)
+        return job
+
+    def _dedupe_key(self, job):
+        """
+        同一批次内相同输入只渲染一次
+        """
+        try:
+            archive, member = split_archive_path(job.step_path)
+            size, mtime = input_stat(job.step_path)
+            return (os.path.realpath(archive), member, size, mtime)
+        except OSError:
+            return (job.job_id,)
+
+    def _dispatch_loop(self):
+        """
+        收集并发请求，凑满 batch_size 或等待 batch_wait 后整批分发
+        """
+        while self.running:
+            try:
+                first = self.pending.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            tasks = []
+            leaders = {}
+            for job in batch:
+                key = self._dedupe_key(job)
+                if key in leaders:
+                    job.leader = leaders[key]
+                    job.output_subdir = job.leader.output_subdir
+                    continue
+                leaders[key] = job
+                tasks.append((job.job_id, job.step_path, job.output_subdir))
+
+            # 一批任务再均分给持有任务最少的几个工作进程，避免整批压在一个进程上
+            self.batch_sizes.observe(len(tasks))
+            chunks = min(self.workers, len(tasks))
+            with self.lock:
+                self.in_flight += len(batch)
+                for job in batch:
+                    refs = self.output_refs.setdefault(job.output_subdir, [0, False])
+                    refs[0] += 1
+                    refs[1] = refs[1] or job.keep_output
+                targets = sorted(self.pool, key=lambda worker: len(worker['job']))[:chunks]
+                for i, worker in enumerate(targets):
+                    chunk = tasks[i::chunks]
+                    worker['job'].update(job_id for job_id, _, _ in chunk)
+                    worker['tasks'].put(chunk)
+
+    def _collect_loop(self):
+        """
+        回收工作进程结果，并检查工作进程是否异常退出
+        """
+        while self.running:
+            try:
+                self._on_result(*self.result_queue.get(timeout=0.5))
+            except queue.Empty:
+                pass
+            self._supervise()
+
+    def _on_result(self, job_id, status, detail, render_time):
+        """
+        收到一个任务结果；任务已因进程退出判为失败时忽略
+        """
+        with self.lock:
+            holders = [worker for worker in self.pool if job_id in worker['job']]
+            if not holders:
+                return
+            holders[0]['job'].discard(job_id)
+        self.render_seconds.observe(render_time)
+        self._finish(job_id, status, detail, render_time)
+
+    def _supervise(self):
+        """
+        工作进程异常退出（崩溃、被系统杀掉）时，它持有的任务以错误结束，并启动新的进程替换
+        """
+        for worker in list(self.pool):
+            if not self.running or worker['process'].is_alive():
+                continue
+            # 先收下该进程退出前已经送出的结果
+            while True:
+                try:
+                    self._on_result(*self.result_queue.get_nowait())
+                except queue.Empty:
+                    break
+            exitcode = worker['process'].exitcode
+            # 替换和取出持有的任务在同一把锁内完成，分发线程不会再把任务交给已退出的进程
+            replacement = self._start_worker(worker['no'])
+            with self.lock:
+                self.pool[worker['no']] = replacement
+                lost = sorted(worker['job'])
+                worker['job'].clear()
+            self.worker_restarts.inc()
+            self.logger.log(f"渲染工作进程 {worker['no']} 异常退出 (exitcode {exitcode})，"
+                            f"{len(lost)} 个任务失败，已重启该进程")
+            for job_id in lost:
+                self._finish(job_id, "error", {'stage': "process",
+                                               'error': f"渲染进程异常退出 (exitcode {exitcode})"}, 0.0)
+
+    def _finish(self, job_id, status, detail, render_time):
+        """
+        一个任务结束：唤醒等待中的请求（包括同批次的重复请求），超时返回的请求在这里释放
+        """
+        with self.lock:
+            finished = [job for job in self.jobs.values()
+                        if job.job_id == job_id or (job.leader is not None and job.leader.job_id == job_id)]
+            for job in finished:
+                job.status = status
+                job.detail = detail
+                job.render_time = render_time
+                self.in_flight -= 1
+                job.done.set()
+        for job in finished:
+            if job.abandoned:
+                self.release(job)
+
+    def close_request(self, job):
+        """
+        请求处理结束：任务已完成时立即释放；超时的任务还在工作进程中（可能正在读取上传文件），
+        标记后由回收线程在完成时释放
+        """
+        with self.lock:
+            if not job.done.is_set():
+                job.abandoned = True
+                return
+        self.release(job)
+
+    def release(self, job):
+        """
+        请求结束：删除上传文件，不需要保留的输出在无人引用后删除
+        """
+        if job.upload_dir is not None:
+            shutil.rmtree(job.upload_dir, ignore_errors=True)
+        with self.lock:
+            self.jobs.pop(job.job_id, None)
+            refs = self.output_refs.get(job.output_subdir, [1, job.keep_output])
+            refs[0] -= 1
+            if refs[0] > 0:
+                return
+            self.output_refs.pop(job.output_subdir, None)
+
+        if not refs[1]:
+            shutil.rmtree(os.path.dirname(job.output_subdir), ignore_errors=True)
+
+    def list_views(self, job):
+        """
+        返回按视角编号排序的图片列表
+        """
+        if not os.path.isdir(job.output_subdir):
+            return []
+        views = [f for f in os.listdir(job.output_subdir) if f.endswith(".jpeg")]
+        views.sort(key=lambda f: int(f.rsplit("_", 1)[-1].split(".")[0]))
+        return [os.path.join(job.output_subdir, f) for f in views]
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP 请求处理
+    """
+    server_version = "step2view-render/1.0"
+
+    def log_message(self, format, *args):
+        self.server.service.logger.log(f"  HTTP {format % args}")
+
+    def address_string(self):
+        # Unix socket 的 client_address 不是 (host, port)
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return "unix"
+
+    def _send(self, code, body, content_type="application/json; charset=utf-8", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service = self.server.service
+        path = urlparse(self.path).path
+        if path == "/metrics":
+            self._send(200, service.metrics.render_prometheus(), "text/plain; version=0.0.4")
+        elif path == "/health":
+            self._send(200, {'status': 'ok', 'workers': service.workers})
+        else:
+            self._send(404, {'error': f"未知路径: {path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        parsed = urlparse(self.path)
+        if parsed.path != "/render":
+            self._send(404, {'error': f"未知路径: {parsed.path}"})
+            return
+
+        params = parse_qs(parsed.query)
+        want_zip = params.get("format", ["json"])[0] == "zip"
+        start_time = time.time()
+
+        # 获取STEP文件：服务器本地路径或上传内容
+        length = int(self.headers.get("Content-Length") or 0)
+        upload_dir = None
+        if "path" in params:
+            step_path = params["path"][0]
+            if not input_exists(step_path):
+                service.requests_total.inc(status="bad_request")
+                self._send(400, {'error': f"文件不存在: {step_path}"})
+                return
+        elif length > 0:
+            name = os.path.basename(params.get("name", ["upload.stp"])[0])
+            if not is_step_file(name):
+                service.requests_total.inc(status="bad_request")
+                self._send(400, {'error': f"不是STEP文件: {name}"})
+                return
+            upload_dir = service.work_dir / "uploads" / uuid.uuid4().hex[:12]
+            upload_dir.mkdir(parents=True, exist_ok=True)
+            step_path = str(upload_dir / name)
+            with open(step_path, "wb") as f:
+                remaining = length
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, 1 << 20))
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            if remaining > 0:
+                # 客户端提前断开，上传不完整
+                shutil.rmtree(upload_dir, ignore_errors=True)
+                service.requests_total.inc(status="bad_request")
+                self._send(400, {'error': f"上传不完整: 收到 {length - remaining}/{length} 字节"})
+                return
+        else:
+            service.requests_total.inc(status="bad_request")
+            self._send(400, {'error': "需要 path 参数或上传STEP文件"})
+            return
+
+        job = service.submit(step_path, keep_output=not want_zip, upload_dir=upload_dir)
+        try:
+            if not job.done.wait(self.server.request_timeout):
+                service.request_latency.observe(time.time() - start_time, status="timeout")
+                service.requests_total.inc(status="timeout")
+                self._send(504, {'job_id': job.job_id, 'error': "渲染超时"})
+                return
+
+            latency = time.time() - start_time
+            service.request_latency.observe(latency, status=job.status)
+            service.requests_total.inc(status=job.status)
+            service.logger.log(f"[{job.job_id}] {os.path.basename(step_path)}: {job.status} "
+                               f"(渲染 {job.render_time:.2f}秒, 总计 {latency:.2f}秒)")
+
+            if job.status != "success":
+                self._send(422, {'job_id': job.job_id, 'status': job.status, **job.detail})
+                return
+
+            views = service.list_views(job)
+            if want_zip:
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+                    for view in views:
+                        archive.write(view, os.path.basename(view))
+                class_ = os.path.basename(job.output_subdir)
+                self._send(200, buffer.getvalue(), "application/zip",
+                           {'Content-Disposition': f'attachment; filename="{class_}.zip"'})
+            else:
+                self._send(200, {
+                    'job_id': job.job_id,
+                    'status': job.status,
+                    'shapes': job.detail.get('shapes'),
+                    'topology': job.detail.get('topology'),
+                    'render_time': round(job.render_time, 3),
+                    'latency': round(latency, 3),
+                    'views': views
+                })
+        finally:
+            service.close_request(job)
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    基于 Unix socket 的多线程 HTTP 服务
+    """
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+def main():
+    """
+    主函数，解析命令行参数并启动服务
+    """
+    parser = argparse.ArgumentParser(description="本地多视角渲染服务")
+    parser.add_argument("mode", nargs="?", default="DEBUG", help="运行模式: DEBUG / RELEASE")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--unix-socket", help="改为监听 Unix socket 路径")
+    parser.add_argument("--workers", type=int, default=2, help="常驻渲染工作进程数")
+    parser.add_argument("--batch-size", type=int, default=8, help="每批最多分发的请求数")
+    parser.add_argument("--batch-wait", type=float, default=0.05, help="凑批等待时间（秒）")
+    parser.add_argument("--timeout", type=float, default=600, help="单个请求最长等待时间（秒）")
+    args = parser.parse_args()
+
+    try:
+        config = get_mode_config(args.mode)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    logger = Logger(config['log_dir'], prefix="render_service")
+    logger.log(f"渲染服务启动 - 模式: {args.mode.upper()}")
+    logger.log(f"工作目录: {config['work_dir']}")
+    logger.log(f"工作进程: {args.workers}, 批大小: {args.batch_size}, 凑批等待: {args.batch_wait}秒")
+
+    service = RenderService(config['work_dir'], logger, workers=args.workers,
+                            batch_size=args.batch_size, batch_wait=args.batch_wait)
+    service.start()
+
+    if args.unix_socket:
+        server = UnixHTTPServer(args.unix_socket, RenderRequestHandler)
+        logger.log(f"监听 Unix socket: {args.unix_socket}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), RenderRequestHandler)
+        logger.log(f"监听地址: http://{args.host}:{args.port}")
+    server.service = service
+    server.request_timeout = args.timeout
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.log("收到中断信号，正在停止服务...")
+    finally:
+        server.server_close()
+        service.stop()
+        logger.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+把多个语料目录（含子目录）平铺到一个输入目录中，只建立链接，不复制数据
+替代 88outtime_files/copy_files.py 的逐个 shutil.copy2
+通常不需要：生成工具可以直接用 --input-root/--recursive 读取原目录
+"""
+
+import argparse
+from pathlib import Path
+from steplogger import Logger
+from stepcorpus import scan_step_files, build_link_farm, LINK_METHODS
+
+def get_mode_config(mode):
+    """
+    根据运行模式获取配置
+    """
+    if mode.upper() == 'DEBUG':
+        return {
+            'input_dir': 'step2viewdata/debug_traceparts',
+            'log_dir': 'step2viewdata/debug_processlog'
+        }
+    elif mode.upper() == 'RELEASE':
+        return {
+            'input_dir': 'step2viewdata/release_traceparts',
+            'log_dir': 'step2viewdata/release_processlog'
+        }
+    else:
+        raise ValueError(f"不支持的运行模式: {mode}")
+
+def link_corpus(logger, roots, farm_dir, method="symlink", recursive=True):
+    """
+    扫描语料根目录并在 farm_dir 中建立平铺的链接
+    """
+    entries, collisions = scan_step_files(roots, recursive)
+    logger.log(f"语料根目录: {', '.join(str(root) for root in roots)}")
+    logger.log(f"找到 {len(entries)} 个STEP文件")
+    if collisions:
+        logger.log(f"重复标签（已忽略）: {len(collisions)}")
+        for step_path, label, kept_path in collisions[:5]:
+            logger.log(f"  {label}: {step_path} (保留 {kept_path})")
+
+    if not entries:
+        return
+
+    logger.log(f"建立链接 ({method}) -> {farm_dir}")
+    result = build_link_farm(entries, farm_dir, method)
+
+    logger.log("=" * 60)
+    logger.log("处理完成!")
+    logger.log(f"新建链接: {result['linked']}")
+    logger.log(f"已存在: {result['existing']}")
+    logger.log(f"错误: {len(result['errors'])}")
+    for step_path, error in result['errors'][:10]:
+        logger.log(f"  ✗ {step_path} - {error}")
+    return result
+
+def main():
+    """
+    主函数，支持命令行参数和模式选择
+    """
+    print("=" * 60)
+    print("语料链接工具 - 支持DEBUG/RELEASE模式")
+    print("=" * 60)
+
+    parser = argparse.ArgumentParser(description="语料链接工具")
+    parser.add_argument("mode", nargs="?", help="运行模式 DEBUG / RELEASE")
+    parser.add_argument("--root", action="append", default=[], help="语料根目录（可多次指定），默认 99backupstpfiles")
+    parser.add_argument("--method", choices=LINK_METHODS, default="symlink", help="链接方式")
+    parser.add_argument("--farm-dir", help="链接目录，默认为当前模式的输入目录")
+    parser.add_argument("--no-recursive", action="store_true", help="只链接根目录下的文件")
+    args = parser.parse_args()
+
+    if args.mode:
+        mode = args.mode.upper()
+        if mode not in ['DEBUG', 'RELEASE']:
+            print(f"错误: 不支持的运行模式 '{mode}'")
+            print("支持的模式: DEBUG, RELEASE")
+            return
+    else:
+        # 交互式选择模式
+        print("请选择运行模式:")
+        print("1. DEBUG模式  (链接到debug_traceparts)")
+        print("2. RELEASE模式 (链接到release_traceparts)")
+
+        while True:
+            choice = input("请输入选择 (1/2): ").strip()
+            if choice == "1":
+                mode = "DEBUG"
+                break
+            elif choice == "2":
+                mode = "RELEASE"
+                break
+            else:
+                print("无效选择，请输入 1 或 2")
+
+    try:
+        config = get_mode_config(mode)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    roots = [Path(root) for root in (args.root or ["99backupstpfiles"])]
+    missing = [str(root) for root in roots if not root.exists()]
+    if missing:
+        print(f"错误: 语料目录不存在 {', '.join(missing)}")
+        return
+
+    farm_dir = Path(args.farm_dir or config['input_dir'])
+
+    print(f"\n运行模式: {mode}")
+    print(f"链接目录: {farm_dir}")
+    print(f"日志目录: {config['log_dir']}")
+    print("-" * 60)
+
+    logger = Logger(config['log_dir'], prefix="link_corpus", time_format="%Y-%m-%d %H:%M:%S")
+    try:
+        link_corpus(logger, roots, farm_dir, args.method, recursive=not args.no_recursive)
+    except Exception as e:
+        logger.log(f"处理过程中发生错误: {str(e)}")
+    finally:
+        logger.close()
+        print(f"\n日志已保存到: {config['log_dir']}")
+
+if __name__ == "__main__":
+    main()
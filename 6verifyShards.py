@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分片结果验证与合并
+多台机器用 0step2multiviewAddlog.py --shard i/N 各自渲染一个分片后，
+确认每个模型在所有分片输出中恰好渲染了一次，报告各分片的负载均衡情况，可选把分片输出合并到当前模式的输出目录
+"""
+
+import os
+import sys
+import shutil
+import argparse
+from pathlib import Path
+from steplogger import Logger
+from stepindex import FileIndex
+from stepcorpus import shard_of, label_output_dir
+from stepoutput import find_model_output_dirs, check_model_output, read_render_manifest
+
+def get_mode_config(mode):
+    """
+    根据运行模式获取配置
+    """
+    if mode.upper() == 'DEBUG':
+        return {
+            'input_dir': 'step2viewdata/debug_traceparts',
+            'output_dir': 'step2viewdata/debug_output',
+            'log_dir': 'step2viewdata/debug_processlog',
+            'index_path': 'step2viewdata/debug_fileindex.sqlite'
+        }
+    elif mode.upper() == 'RELEASE':
+        return {
+            'input_dir': 'step2viewdata/release_traceparts',
+            'output_dir': 'step2viewdata/release_output',
+            'log_dir': 'step2viewdata/release_processlog',
+            'index_path': 'step2viewdata/release_fileindex.sqlite'
+        }
+    else:
+        raise ValueError(f"不支持的运行模式: {mode}")
+
+def verify_shards(logger, shard_dirs, shard_count, input_roots, recursive=False, index_path=None):
+    """
+    对比所有分片输出目录与当前输入
+    多个输出目录时第 k 个目录对应分片 k；只有一个目录时视为各分片共用的输出目录
+    :return: 结果字典 {'ok', 'found', 'missing', 'quarantined', 'duplicates', 'stale', 'orphans', 'misplaced', 'shards'}
+    """
+    index = FileIndex(index_path)
+    try:
+        entries, _ = index.refresh(input_roots, recursive)
+        sizes = dict((record['path'], record['size']) for record in index.records(input_roots))
+        quarantined_paths = set(record['path'] for record in index.list_quarantine(input_roots))
+    finally:
+        index.close()
+    inputs = dict((label, step_path) for step_path, label in entries)
+
+    # 标签 -> [(输出目录序号, 模型目录)]
+    found = {}
+    for dir_no, shard_dir in enumerate(shard_dirs):
+        if not os.path.isdir(shard_dir):
+            logger.log(f"警告: 输出目录不存在 {shard_dir}")
+            continue
+        for label, model_dir in find_model_output_dirs(shard_dir):
+            found.setdefault(label, []).append((dir_no, model_dir))
+
+    per_dir = len(shard_dirs) == shard_count and shard_count > 1
+    shards = [{'files': 0, 'bytes': 0, 'rendered': 0, 'render_time': 0.0} for _ in range(shard_count)]
+    missing = []
+    quarantined = []
+    stale = []
+    misplaced = []
+    for label, step_path in inputs.items():
+        shard = shards[shard_of(label, shard_count)]
+        shard['files'] += 1
+        shard['bytes'] += sizes.get(step_path) or 0
+
+        places = found.get(label)
+        if not places:
+            (quarantined if step_path in quarantined_paths else missing).append(label)
+            continue
+
+        for dir_no, model_dir in places:
+            status, reason = check_model_output(model_dir, step_path)
+            if status == "stale":
+                stale.append((model_dir, reason))
+                continue
+            if per_dir and dir_no != shard_of(label, shard_count):
+                misplaced.append((model_dir, shard_of(label, shard_count)))
+            shard['rendered'] += 1
+            manifest = read_render_manifest(model_dir)
+            if manifest is not None:
+                shard['render_time'] += manifest.get('render_time') or 0
+
+    duplicates = dict((label, places) for label, places in found.items() if len(places) > 1)
+    orphans = [model_dir for label, places in found.items() if label not in inputs for _, model_dir in places]
+
+    return {
+        'ok': not (missing or quarantined or duplicates or stale),
+        'inputs': len(inputs),
+        'found': found,
+        'missing': missing,
+        'quarantined': quarantined,
+        'duplicates': duplicates,
+        'stale': stale,
+        'orphans': orphans,
+        'misplaced': misplaced,
+        'shards': shards
+    }
+
+def _imbalance(values):
+    """
+    不均衡度：最大值 / 平均值（1.00 表示完全均衡）
+    """
+    mean = sum(values) / len(values) if values else 0
+    return max(values) / mean if mean > 0 else 1.0
+
+def log_verify_report(logger, result):
+    """
+    输出验证报告和各分片的负载均衡统计
+    """
+    logger.log("=" * 60)
+    logger.log(f"输入文件: {result['inputs']}")
+    logger.log(f"已渲染模型: {len(result['found'])}")
+    for title, key in (("未渲染", 'missing'), ("失败已隔离", 'quarantined')):
+        logger.log(f"{title}: {len(result[key])}")
+        for label in result[key][:10]:
+            logger.log(f"  {label}")
+    logger.log(f"重复渲染: {len(result['duplicates'])}")
+    for label, places in list(result['duplicates'].items())[:10]:
+        logger.log(f"  {label}: {', '.join(model_dir for _, model_dir in places)}")
+    logger.log(f"过期或视角不全: {len(result['stale'])}")
+    for model_dir, reason in result['stale'][:10]:
+        logger.log(f"  {model_dir} ({reason})")
+    if result['orphans']:
+        logger.log(f"输入中不存在的输出: {len(result['orphans'])}")
+    if result['misplaced']:
+        logger.log(f"不在所属分片目录中的输出: {len(result['misplaced'])}")
+        for model_dir, shard in result['misplaced'][:10]:
+            logger.log(f"  {model_dir} (属于分片 {shard})")
+
+    shards = result['shards']
+    logger.log("-" * 60)
+    logger.log("分片负载:")
+    logger.log(f"  {'分片':>4} {'文件数':>8} {'输入MB':>10} {'已渲染':>8} {'渲染耗时(小时)':>14}")
+    for shard_no, shard in enumerate(shards):
+        logger.log(f"  {shard_no:>4} {shard['files']:>8} {shard['bytes'] / (1024 * 1024):>10.1f} "
+                   f"{shard['rendered']:>8} {shard['render_time'] / 3600:>14.2f}")
+    if len(shards) > 1:
+        logger.log(f"  不均衡度 (最大/平均): 文件数 {_imbalance([s['files'] for s in shards]):.2f}, "
+                   f"输入大小 {_imbalance([s['bytes'] for s in shards]):.2f}, "
+                   f"渲染耗时 {_imbalance([s['render_time'] for s in shards]):.2f}")
+    logger.log("=" * 60)
+    logger.log("验证通过: 每个模型恰好渲染一次" if result['ok'] else "验证未通过")
+
+def merge_shards(logger, result, output_dir):
+    """
+    把分片输出目录中的模型目录移动到 output_dir（已在其中的跳过，目标已存在的记为冲突）
+    重复渲染的模型不合并，需要先处理；验证发现过期的模型和孤立的模型（输入中已没有）也不合并
+    """
+    moved = 0
+    skipped = 0
+    conflicts = []
+    flagged = set(model_dir for model_dir, _ in result['stale']) | set(result['orphans'])
+    output_dir = os.path.abspath(output_dir)
+    for label, places in result['found'].items():
+        if len(places) > 1:
+            continue
+        model_dir = places[0][1]
+        if model_dir in flagged:
+            skipped += 1
+            continue
+        target = label_output_dir(output_dir, label)
+        if os.path.abspath(model_dir) == target:
+            continue
+        if os.path.exists(target):
+            conflicts.append((model_dir, target))
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # 同一文件系统上是一次重命名，跨文件系统时复制后删除
+        shutil.move(model_dir, target)
+        moved += 1
+
+    logger.log(f"合并到 {output_dir}: 移动 {moved} 个模型目录, 冲突 {len(conflicts)}, "
+               f"跳过过期或孤立的模型 {skipped}")
+    for model_dir, target in conflicts[:10]:
+        logger.log(f"  ✗ {model_dir} -> {target} (目标已存在)")
+    return moved, conflicts
+
+def main():
+    """
+    主函数，支持命令行参数和模式选择
+    """
+    print("=" * 60)
+    print("分片验证与合并工具 - 支持DEBUG/RELEASE模式")
+    print("=" * 60)
+
+    parser = argparse.ArgumentParser(description="分片验证与合并工具")
+    parser.add_argument("mode", nargs="?", help="运行模式 DEBUG / RELEASE")
+    parser.add_argument("--shard-dir", action="append", default=[],
+                        help="分片输出目录，按分片编号顺序多次指定；不指定时为当前模式的输出目录（各分片共用）")
+    parser.add_argument("--shards", type=int, help="分片总数 N，默认为分片输出目录的个数")
+    parser.add_argument("--input-root", action="append", default=[], help="额外的输入根目录（与生成时一致）")
+    parser.add_argument("--recursive", action="store_true", help="递归扫描输入根目录（与生成时一致）")
+    parser.add_argument("--merge", action="store_true", help="验证通过后把分片输出合并到当前模式的输出目录")
+    parser.add_argument("--force", action="store_true",
+                        help="验证未通过时也合并（跳过重复、过期和孤立的模型）")
+    args = parser.parse_args()
+
+    if args.mode:
+        mode = args.mode.upper()
+        if mode not in ['DEBUG', 'RELEASE']:
+            print(f"错误: 不支持的运行模式 '{mode}'")
+            print("支持的模式: DEBUG, RELEASE")
+            return
+    else:
+        # 交互式选择模式
+        print("请选择运行模式:")
+        print("1. DEBUG模式  (验证debug_output)")
+        print("2. RELEASE模式 (验证release_output)")
+
+        while True:
+            choice = input("请输入选择 (1/2): ").strip()
+            if choice == "1":
+                mode = "DEBUG"
+                break
+            elif choice == "2":
+                mode = "RELEASE"
+                break
+            else:
+                print("无效选择，请输入 1 或 2")
+
+    try:
+        config = get_mode_config(mode)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    shard_dirs = args.shard_dir or [config['output_dir']]
+    shard_count = args.shards or len(shard_dirs)
+    if shard_count < 1:
+        print("错误: 分片总数必须大于0")
+        return
+    if len(shard_dirs) > 1 and len(shard_dirs) != shard_count:
+        print(f"错误: 分片输出目录个数 ({len(shard_dirs)}) 与分片总数 ({shard_count}) 不一致")
+        return
+
+    print(f"\n运行模式: {mode}")
+    print(f"分片总数: {shard_count}")
+    for shard_dir in shard_dirs:
+        print(f"分片输出目录: {shard_dir}")
+    print(f"日志目录: {config['log_dir']}")
+    print("-" * 60)
+
+    logger = Logger(config['log_dir'], prefix="verify_shards", time_format="%Y-%m-%d %H:%M:%S")
+    ok = False
+    try:
+        result = verify_shards(logger, shard_dirs, shard_count, [config['input_dir']] + args.input_root,
+                               recursive=args.recursive, index_path=config['index_path'])
+        log_verify_report(logger, result)
+        ok = result['ok']
+        if args.merge and not ok and not args.force:
+            logger.log("验证未通过，不合并分片输出；处理上面的问题后重新验证，或使用 --force 只合并通过验证的模型")
+        elif args.merge:
+            Path(config['output_dir']).mkdir(parents=True, exist_ok=True)
+            merge_shards(logger, result, config['output_dir'])
+    except Exception as e:
+        logger.log(f"处理过程中发生错误: {str(e)}")
+    finally:
+        logger.close()
+        print(f"\n日志已保存到: {config['log_dir']}")
+
+    if args.mode and not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
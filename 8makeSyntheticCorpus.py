@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+合成STEP语料生成工具
+按种子生成指定数量、复杂度可控（面数、根数、倒圆、样条曲面）的STEP文件，用于在任意Linux机器上
+按 1千 / 1万 / 10万 个模型的规模测试渲染流程；中断后以相同参数再次运行时跳过已生成的模型
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from steplogger import Logger
+from stepsynth import (generate_model, parse_range, model_relpath, DEFAULT_RANGES,
+                       CORPUS_MANIFEST_NAME, FILES_PER_DIR)
+
+def get_mode_config(mode):
+    """
+    根据运行模式获取配置
+    """
+    if mode.upper() == 'DEBUG':
+        return {
+            'synthetic_dir': 'step2viewdata/debug_synthetic',
+            'log_dir': 'step2viewdata/debug_processlog'
+        }
+    elif mode.upper() == 'RELEASE':
+        return {
+            'synthetic_dir': 'step2viewdata/release_synthetic',
+            'log_dir': 'step2viewdata/release_processlog'
+        }
+    else:
+        raise ValueError(f"不支持的运行模式: {mode}")
+
+def load_corpus_manifest(manifest_path, params):
+    """
+    读取已有的语料清单
+    :return: 已生成的模型 {序号: 记录}；清单不存在时返回 {}，生成参数不一致时返回 None
+    """
+    try:
+        f = open(manifest_path, 'r', encoding='utf-8')
+    except OSError:
+        return {}
+    records = {}
+    with f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            return None
+        if header.get('params') != params:
+            return None
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if 'error' not in record:
+                records[record['index']] = record
+    return records
+
+def make_corpus(logger, corpus_dir, count, seed, ranges, jobs=None, force=False):
+    """
+    生成合成语料
+    语料数量不属于生成参数：同一目录下可以把 1千 扩展到 1万，已有的模型保持不变
+    :return: 结果字典；生成参数与目录中已有语料不一致且未指定 force 时返回 None
+    """
+    params = {'seed': seed, 'ranges': dict((key, list(value)) for key, value in sorted(ranges.items()))}
+    manifest_path = os.path.join(corpus_dir, CORPUS_MANIFEST_NAME)
+    os.makedirs(corpus_dir, exist_ok=True)
+
+    existing = {} if force else load_corpus_manifest(manifest_path, params)
+    if existing is None:
+        logger.log(f"错误: {corpus_dir} 中已有不同参数生成的语料，请换一个目录或使用 --force 重新生成")
+        return None
+
+    todo = [index for index in range(count)
+            if index not in existing or not os.path.exists(os.path.join(corpus_dir, model_relpath(index)))]
+    todo_set = set(todo)
+    logger.log(f"语料目录: {corpus_dir}")
+    logger.log(f"种子: {seed}, 模型数: {count}, 已生成: {count - len(todo)}, 待生成: {len(todo)}")
+    for key, (low, high) in sorted(ranges.items()):
+        logger.log(f"  {key}: {low} ~ {high}")
+
+    result = {'generated': 0, 'errors': [], 'faces': 0, 'bytes': 0, 'time': 0.0}
+    if not todo:
+        return result
+
+    # 重写清单：只保留已生成模型的完整记录（去掉失败记录和中断时写了一半的最后一行）
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'params': params, 'created': round(time.time(), 3)}) + "\n")
+        for index in sorted(existing):
+            if index not in todo_set:
+                f.write(json.dumps(existing[index]) + "\n")
+
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    logger.log(f"并行进程数: {jobs}")
+    start_time = time.time()
+    tasks = [(seed, index, ranges, corpus_dir) for index in todo]
+    ctx = multiprocessing.get_context("spawn")
+    with open(manifest_path, 'a', encoding='utf-8') as manifest, ctx.Pool(jobs) as pool:
+        for done, record in enumerate(pool.imap_unordered(generate_model, tasks, chunksize=4), 1):
+            manifest.write(json.dumps(record) + "\n")
+            manifest.flush()
+            if 'error' in record:
+                result['errors'].append((record['file'], record['error']))
+                logger.log(f"  ✗ {record['file']} - {record['error']}")
+            else:
+                result['generated'] += 1
+                result['faces'] += record['faces']
+                result['bytes'] += record['bytes']
+                result['time'] += record['time']
+                logger.debug(f"  ✓ {record['file']} 面 {record['faces']}, 根 {record['roots']}, "
+                             f"{record['bytes'] / 1024:.1f} KB, {record['time']:.2f}s")
+            if done % 100 == 0 or done == len(tasks):
+                elapsed = time.time() - start_time
+                logger.log(f"进度: {done}/{len(tasks)} ({done / elapsed:.1f} 个/秒)")
+
+    elapsed = time.time() - start_time
+    logger.log("=" * 60)
+    logger.log("处理完成!")
+    logger.log(f"生成: {result['generated']}, 失败: {len(result['errors'])}")
+    if result['generated']:
+        logger.log(f"平均面数: {result['faces'] / result['generated']:.0f}, "
+                   f"平均大小: {result['bytes'] / result['generated'] / 1024:.1f} KB, "
+                   f"平均生成时间: {result['time'] / result['generated']:.2f}s")
+    logger.log(f"总大小: {result['bytes'] / (1024 * 1024):.1f} MB, 总耗时: {elapsed:.1f}s")
+    return result
+
+def main():
+    """
+    主函数，支持命令行参数和模式选择
+    """
+    print("=" * 60)
+    print("合成STEP语料生成工具 - 支持DEBUG/RELEASE模式")
+    print("=" * 60)
+
+    parser = argparse.ArgumentParser(description="合成STEP语料生成工具")
+    parser.add_argument("mode", nargs="?", help="运行模式 DEBUG / RELEASE")
+    parser.add_argument("--count", type=int, default=100, help="模型数量（默认 100）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子（默认 0）")
+    parser.add_argument("--faces", default="%d:%d" % DEFAULT_RANGES['faces'],
+                        help="每个模型的目标面数范围 MIN:MAX，按对数均匀分布")
+    parser.add_argument("--roots", default="%d:%d" % DEFAULT_RANGES['roots'], help="每个模型的根（零件）数范围")
+    parser.add_argument("--fillets", default="%d:%d" % DEFAULT_RANGES['fillets'],
+                        help="每个零件倒圆的棱边数范围（最多12）")
+    parser.add_argument("--splines", default="%d:%d" % DEFAULT_RANGES['splines'],
+                        help="每个零件附带的B样条曲面体数范围")
+    parser.add_argument("--output", help="语料目录，默认为当前模式的合成语料目录")
+    parser.add_argument("--jobs", type=int, help="并行进程数，默认为CPU核数")
+    parser.add_argument("--force", action="store_true", help="忽略已有语料，全部重新生成")
+    args = parser.parse_args()
+
+    if args.count < 1:
+        parser.error("--count 必须大于0")
+    try:
+        ranges = dict((key, parse_range(getattr(args, key))) for key in DEFAULT_RANGES)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.mode:
+        mode = args.mode.upper()
+        if mode not in ['DEBUG', 'RELEASE']:
+            print(f"错误: 不支持的运行模式 '{mode}'")
+            print("支持的模式: DEBUG, RELEASE")
+            return
+    else:
+        # 交互式选择模式
+        print("请选择运行模式:")
+        print("1. DEBUG模式  (生成到debug_synthetic)")
+        print("2. RELEASE模式 (生成到release_synthetic)")
+
+        while True:
+            choice = input("请输入选择 (1/2): ").strip()
+            if choice == "1":
+                mode = "DEBUG"
+                break
+            elif choice == "2":
+                mode = "RELEASE"
+                break
+            else:
+                print("无效选择，请输入 1 或 2")
+
+    try:
+        config = get_mode_config(mode)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    corpus_dir = args.output or config['synthetic_dir']
+
+    print(f"\n运行模式: {mode}")
+    print(f"语料目录: {corpus_dir} (每 {FILES_PER_DIR} 个文件一个子目录)")
+    print(f"日志目录: {config['log_dir']}")
+    print("-" * 60)
+
+    logger = Logger(config['log_dir'], prefix="synthetic_corpus", time_format="%Y-%m-%d %H:%M:%S")
+    result = None
+    try:
+        result = make_corpus(logger, corpus_dir, args.count, args.seed, ranges, args.jobs, args.force)
+        if result is not None:
+            logger.log(f"渲染: python 0step2multiviewAddlog.py {mode} --input-root {corpus_dir} --recursive")
+    except Exception as e:
+        logger.log(f"处理过程中发生错误: {str(e)}")
+    finally:
+        logger.close()
+        print(f"\n日志已保存到: {config['log_dir']}")
+
+    if args.mode and (result is None or result['errors']):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+渲染扩展性测试：在 进程数 × 输出分辨率 × 视角数 的网格上渲染同一批模型，
+记录每个组合的 模型/秒、视角/秒、CPU利用率和峰值内存，输出加速比/并行效率表和CSV，
+用于按实测数据确定渲染节点的配置
+"""
+
+import os
+import csv
+import time
+import queue
+import shutil
+import datetime
+import argparse
+import collections
+import multiprocessing
+from steplogger import Logger, get_process_stats
+from stepcorpus import scan_step_files
+from stepgovernor import cpu_limit, memory_info
+from steprender import start_render_worker
+
+# CSV 列
+SWEEP_COLUMNS = ["workers", "width", "height", "views", "models", "errors", "wall_s", "models_per_s",
+                 "views_per_s", "cpu_cores", "cpu_util", "peak_worker_rss_mb", "peak_total_rss_mb",
+                 "output_mb", "speedup", "efficiency"]
+
+# 等待渲染结果的轮询间隔（秒），每次轮询采样一次各渲染进程的RSS
+RESULT_POLL_INTERVAL = 0.2
+
+def get_mode_config(mode):
+    """
+    根据运行模式获取配置
+    """
+    if mode.upper() == 'DEBUG':
+        return {
+            'synthetic_dir': 'step2viewdata/debug_synthetic',
+            'sweep_dir': 'step2viewdata/debug_sweep',
+            'log_dir': 'step2viewdata/debug_processlog'
+        }
+    elif mode.upper() == 'RELEASE':
+        return {
+            'synthetic_dir': 'step2viewdata/release_synthetic',
+            'sweep_dir': 'step2viewdata/release_sweep',
+            'log_dir': 'step2viewdata/release_processlog'
+        }
+    else:
+        raise ValueError(f"不支持的运行模式: {mode}")
+
+def parse_int_list(text):
+    """
+    "1,2,4,8" -> [1, 2, 4, 8]
+    """
+    try:
+        values = [int(item) for item in text.split(",") if item.strip()]
+    except ValueError:
+        values = []
+    if not values or min(values) < 1:
+        raise ValueError(f"应为逗号分隔的正整数列表: {text}")
+    return values
+
+def parse_sizes(text):
+    """
+    "640x480,1024x768" -> [(640, 480), (1024, 768)]
+    """
+    sizes = []
+    for item in text.split(","):
+        width, _, height = item.strip().lower().partition("x")
+        if not (width.isdigit() and height.isdigit()) or int(width) < 1 or int(height) < 1:
+            raise ValueError(f"分辨率格式应为 宽x高，多个用逗号分隔: {text}")
+        sizes.append((int(width), int(height)))
+    return sizes
+
+def _directory_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _stop_workers(pool):
+    for worker in pool:
+        if worker['process'].is_alive():
+            worker['tasks'].put(None)
+    for worker in pool:
+        worker['process'].join(timeout=10)
+        if worker['process'].is_alive():
+            worker['process'].terminate()
+
+def _warm_up(logger, result_queue, pool, step_path, cell_dir):
+    """
+    每个渲染进程先渲染一次同一个文件（初始化显示后端），不计入测量
+    初始化失败（进程退出）时返回 False
+    """
+    waiting = set()
+    for worker in pool:
+        job_id = -1 - worker['no']
+        worker['tasks'].put([(job_id, step_path, os.path.join(cell_dir, "warmup", str(worker['no'])))])
+        waiting.add(job_id)
+    while waiting:
+        try:
+            job_id, status, detail, _ = result_queue.get(timeout=RESULT_POLL_INTERVAL)
+        except queue.Empty:
+            if any(not worker['process'].is_alive() for worker in pool):
+                logger.log("  ✗ 预热时渲染进程退出")
+                return False
+            continue
+        waiting.discard(job_id)
+        if status != "success":
+            logger.log(f"  ✗ 预热失败: {detail.get('error')}")
+            return False
+    shutil.rmtree(os.path.join(cell_dir, "warmup"), ignore_errors=True)
+    return True
+
+def run_cell(logger, step_files, workers, size, views, cell_dir):
+    """
+    用 workers 个常驻渲染进程渲染 step_files，测量稳定状态下的吞吐量
+    :return: 该组合的测量结果字典；预热失败时返回 None
+    """
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    pool = [start_render_worker(ctx, result_queue, no, views, size) for no in range(workers)]
+    try:
+        if not _warm_up(logger, result_queue, pool, step_files[0], cell_dir):
+            return None
+
+        # 每个渲染进程测量开始时和最近一次采样的CPU时间；异常退出的进程按最近一次采样计入
+        cpu_start = [get_process_stats(worker['process'].pid)[0] or 0.0 for worker in pool]
+        cpu_last = list(cpu_start)
+        cpu_lost = 0.0
+        start_time = time.time()
+        pending = collections.deque(enumerate(step_files))
+        in_flight = {}
+        models = 0
+        errors = 0
+        peak_worker_rss = 0.0
+        peak_total_rss = 0.0
+        while pending or in_flight:
+            for worker in pool:
+                if worker['job'] is None and pending:
+                    job_id, step_path = pending.popleft()
+                    worker['job'] = job_id
+                    in_flight[job_id] = worker['no']
+                    worker['tasks'].put([(job_id, step_path, os.path.join(cell_dir, f"{job_id:06d}"))])
+
+            try:
+                job_id, status, detail, _ = result_queue.get(timeout=RESULT_POLL_INTERVAL)
+                pool[in_flight.pop(job_id)]['job'] = None
+                if status == "success":
+                    models += 1
+                else:
+                    errors += 1
+                    logger.log(f"  ✗ {step_files[job_id]} - {detail.get('error')}")
+                peak_worker_rss = max(peak_worker_rss, detail.get('peak_rss_mb') or 0)
+            except queue.Empty:
+                pass
+
+            total_rss = 0.0
+            for worker in pool:
+                cpu_seconds, rss_mb = get_process_stats(worker['process'].pid)
+                if cpu_seconds is not None:
+                    cpu_last[worker['no']] = cpu_seconds
+                    total_rss += rss_mb
+            peak_total_rss = max(peak_total_rss, total_rss)
+            for worker in pool:
+                if worker['job'] is not None and not worker['process'].is_alive():
+                    # 渲染进程异常退出：记为失败并重启（重启后的显示初始化计入测量）
+                    errors += 1
+                    in_flight.pop(worker['job'], None)
+                    logger.log(f"  ✗ {step_files[worker['job']]} - 渲染进程异常退出 "
+                               f"(退出码 {worker['process'].exitcode})")
+                    cpu_lost += cpu_last[worker['no']] - cpu_start[worker['no']]
+                    cpu_start[worker['no']] = cpu_last[worker['no']] = 0.0
+                    pool[worker['no']] = start_render_worker(ctx, result_queue, worker['no'], views, size)
+
+        wall = time.time() - start_time
+        for worker in pool:
+            cpu_seconds = get_process_stats(worker['process'].pid)[0]
+            if cpu_seconds is not None:
+                cpu_last[worker['no']] = cpu_seconds
+        cpu_seconds = sum(cpu_last) - sum(cpu_start) + cpu_lost
+    finally:
+        _stop_workers(pool)
+
+    output_mb = _directory_bytes(cell_dir) / (1024 * 1024)
+    shutil.rmtree(cell_dir, ignore_errors=True)
+    return {
+        'workers': workers,
+        'width': size[0],
+        'height': size[1],
+        'views': views,
+        'models': models,
+        'errors': errors,
+        'wall_s': round(wall, 3),
+        'models_per_s': round(models / wall, 4) if wall > 0 else 0.0,
+        'views_per_s': round(models * views / wall, 2) if wall > 0 else 0.0,
+        'cpu_cores': round(cpu_seconds / wall, 2) if wall > 0 else 0.0,
+        'cpu_util': round(cpu_seconds / wall / workers, 3) if wall > 0 else 0.0,
+        'peak_worker_rss_mb': round(peak_worker_rss, 1),
+        'peak_total_rss_mb': round(peak_total_rss, 1),
+        'output_mb': round(output_mb, 2)
+    }
+
+def add_speedup(results):
+    """
+    按 (分辨率, 视角数) 分组计算加速比和并行效率
+    以组内最少进程数的吞吐量为基准，基准进程数大于1时按线性折算到单进程
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault((result['width'], result['height'], result['views']), []).append(result)
+    for group in groups.values():
+        base = min(group, key=lambda result: result['workers'])
+        for result in group:
+            if base['models_per_s'] > 0:
+                result['speedup'] = round(result['models_per_s'] / base['models_per_s'] * base['workers'], 2)
+                result['efficiency'] = round(result['speedup'] / result['workers'], 3)
+            else:
+                result['speedup'] = result['efficiency'] = None
+    return results
+
+def log_sweep_table(logger, results):
+    """
+    输出加速比/并行效率表
+    """
+    logger.log("=" * 100)
+    logger.log(f"{'进程数':>6} {'分辨率':>10} {'视角':>5} {'模型/秒':>9} {'视角/秒':>9} {'CPU核':>7} "
+               f"{'CPU利用率':>9} {'单进程峰值MB':>12} {'总内存峰值MB':>12} {'加速比':>7} {'效率':>6}")
+    for result in results:
+        speedup = f"{result['speedup']:.2f}" if result.get('speedup') is not None else "-"
+        efficiency = f"{result['efficiency']:.0%}" if result.get('efficiency') is not None else "-"
+        logger.log(f"{result['workers']:>6} {result['width']:>5}x{result['height']:<4} {result['views']:>5} "
+                   f"{result['models_per_s']:>9.3f} {result['views_per_s']:>9.1f} {result['cpu_cores']:>7.2f} "
+                   f"{result['cpu_util']:>9.0%} {result['peak_worker_rss_mb']:>12.0f} "
+                   f"{result['peak_total_rss_mb']:>12.0f} {speedup:>7} {efficiency:>6}")
+    logger.log("=" * 100)
+
+def write_sweep_csv(results, csv_path):
+    os.makedirs(os.path.dirname(os.path.abspath(csv_path)), exist_ok=True)
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=SWEEP_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+def run_sweep(logger, step_files, worker_counts, sizes, view_counts, sweep_dir):
+    """
+    依次测量网格上的每个组合
+    """
+    cores = cpu_limit()
+    total_mb, available_mb = memory_info()
+    logger.log(f"模型数: {len(step_files)}, CPU: {cores} 核, "
+               f"内存: {total_mb or 0:.0f} MB (可用 {available_mb or 0:.0f} MB)")
+    if max(worker_counts) > cores:
+        logger.log(f"警告: 最大进程数 {max(worker_counts)} 超过可用CPU核数 {cores}")
+
+    cells = [(size, views, workers) for size in sizes for views in view_counts for workers in worker_counts]
+    results = []
+    for no, (size, views, workers) in enumerate(cells, 1):
+        logger.log(f"[{no}/{len(cells)}] 进程数 {workers}, 分辨率 {size[0]}x{size[1]}, 视角 {views}")
+        cell_dir = os.path.join(sweep_dir, f"w{workers}_{size[0]}x{size[1]}_v{views}")
+        shutil.rmtree(cell_dir, ignore_errors=True)
+        result = run_cell(logger, step_files, workers, size, views, cell_dir)
+        if result is None:
+            continue
+        logger.log(f"  {result['models_per_s']:.3f} 模型/秒, {result['views_per_s']:.1f} 视角/秒, "
+                   f"CPU {result['cpu_cores']:.2f} 核, 总内存峰值 {result['peak_total_rss_mb']:.0f} MB")
+        logger.event("sweep_cell", **result)
+        results.append(result)
+    try:
+        os.rmdir(sweep_dir)
+    except OSError:
+        pass
+    return add_speedup(results)
+
+def main():
+    """
+    主函数，支持命令行参数和模式选择
+    """
+    print("=" * 60)
+    print("渲染扩展性测试工具 - 支持DEBUG/RELEASE模式")
+    print("=" * 60)
+
+    parser = argparse.ArgumentParser(description="渲染扩展性测试工具")
+    parser.add_argument("mode", nargs="?", help="运行模式 DEBUG / RELEASE")
+    parser.add_argument("--input-root", action="append", default=[],
+                        help="测试语料目录（递归扫描，可多次指定），默认为当前模式的合成语料目录")
+    parser.add_argument("--limit", type=int, default=50, help="每个组合渲染的模型数（按标签排序取前N个，默认 50）")
+    parser.add_argument("--workers", default="1,2,4", help="进程数列表，例如 1,2,4,8")
+    parser.add_argument("--sizes", default="1024x768", help="输出分辨率列表，例如 640x480,1024x768")
+    parser.add_argument("--views", default="36", help="视角数列表，例如 12,36")
+    parser.add_argument("--csv", help="CSV输出路径，默认在日志目录下")
+    args = parser.parse_args()
+
+    try:
+        worker_counts = parse_int_list(args.workers)
+        sizes = parse_sizes(args.sizes)
+        view_counts = parse_int_list(args.views)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.limit < 1:
+        parser.error("--limit 必须大于0")
+
+    if args.mode:
+        mode = args.mode.upper()
+        if mode not in ['DEBUG', 'RELEASE']:
+            print(f"错误: 不支持的运行模式 '{mode}'")
+            print("支持的模式: DEBUG, RELEASE")
+            return
+    else:
+        # 交互式选择模式
+        print("请选择运行模式:")
+        print("1. DEBUG模式  (测试debug_synthetic)")
+        print("2. RELEASE模式 (测试release_synthetic)")
+
+        while True:
+            choice = input("请输入选择 (1/2): ").strip()
+            if choice == "1":
+                mode = "DEBUG"
+                break
+            elif choice == "2":
+                mode = "RELEASE"
+                break
+            else:
+                print("无效选择，请输入 1 或 2")
+
+    try:
+        config = get_mode_config(mode)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    roots = args.input_root or [config['synthetic_dir']]
+    entries, _ = scan_step_files(roots, recursive=True)
+    step_files = [step_path for step_path, label in sorted(entries, key=lambda entry: entry[1])][:args.limit]
+    if not step_files:
+        print(f"错误: {', '.join(roots)} 中没有STEP文件（可先用 8makeSyntheticCorpus.py 生成）")
+        return
+
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    csv_path = args.csv or os.path.join(config['log_dir'], f"sweep_{timestamp}.csv")
+
+    print(f"\n运行模式: {mode}")
+    print(f"测试语料: {', '.join(roots)} ({len(step_files)} 个模型)")
+    print(f"组合数: {len(worker_counts) * len(sizes) * len(view_counts)}")
+    print(f"CSV: {csv_path}")
+    print(f"日志目录: {config['log_dir']}")
+    print("-" * 60)
+
+    logger = Logger(config['log_dir'], prefix="sweep", time_format="%Y-%m-%d %H:%M:%S", events=True)
+    try:
+        results = run_sweep(logger, step_files, worker_counts, sizes, view_counts, config['sweep_dir'])
+        if results:
+            log_sweep_table(logger, results)
+            write_sweep_csv(results, csv_path)
+            logger.log(f"CSV已保存到: {csv_path}")
+    except Exception as e:
+        logger.log(f"处理过程中发生错误: {str(e)}")
+    finally:
+        logger.close()
+        print(f"\n日志已保存到: {config['log_dir']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+时间预算：渲染节点只在固定时间窗口内可用时，在预算内完成尽可能多的模型
+每个文件的预测耗时来自文件索引中的历史渲染时间（同一文件直接使用，其他文件按大小线性拟合），
+按预测耗时从短到长处理（所有文件价值相同时最短优先完成的文件数最多），预测完成时间超出预算的文件推迟到下次运行
+"""
+
+import re
+import time
+import heapq
+
+# 没有历史记录时每个文件的预测耗时（秒）
+DEFAULT_FILE_SECONDS = 60.0
+
+# 按文件大小拟合耗时模型至少需要的样本数
+MIN_SAMPLES = 5
+
+# 报告中列出的推迟文件数
+DEFERRED_LOG_LIMIT = 10
+
+# 预算用完后等待正在渲染的文件完成的宽限时间（秒），超过后才终止渲染进程
+EXPIRY_GRACE_SECONDS = 30.0
+
+_BUDGET_PART = re.compile(r"(\d+(?:\.\d+)?)([hms]?)")
+_UNIT_SECONDS = {'h': 3600, 'm': 60, 's': 1, '': 1}
+
+def parse_time_budget(text):
+    """
+    解析时间预算: "8h"、"90m"、"1h30m"、"3600"（不带单位为秒），返回秒数
+    """
+    value = str(text).strip().lower().replace(" ", "")
+    parts = _BUDGET_PART.findall(value)
+    if not value or "".join(number + unit for number, unit in parts) != value:
+        raise ValueError(f"时间预算格式应为 8h、90m、1h30m 或秒数: {text}")
+    seconds = sum(float(number) * _UNIT_SECONDS[unit] for number, unit in parts)
+    if seconds <= 0:
+        raise ValueError(f"时间预算必须大于0: {text}")
+    return seconds
+
+class TimeBudget:
+    """
+    时间预算
+    seconds 为 None 时不启用：不改变处理顺序，fits() 总是为真
+    预算从 start() 开始计时；因为按预测耗时升序处理，第一个放不下的文件之后的文件都不会放下，此后全部推迟
+    """
+    def __init__(self, seconds=None):
+        self.enabled = seconds is not None
+        self.seconds = seconds
+        self.deadline = None
+        self.known = {}
+        self.samples = []
+        self.model = None
+        self.fallback = DEFAULT_FILE_SECONDS
+        self.costs = {}
+        self.closed = False
+        self.deferred = 0
+        self.deferred_seconds = 0.0
+        # 最先推迟的几个文件（预测耗时最短，最接近放进预算的）[(文件, 预测耗时)]
+        self.deferred_files = []
+
+    def start(self, started=None):
+        if self.enabled:
+            self.deadline = (started if started is not None else time.time()) + self.seconds
+
+    def learn(self, records):
+        """
+        从文件索引记录中学习每个文件的耗时（失败的记录不作为成本）
+        """
+        for record in records:
+            seconds = record.get('render_time')
+            if seconds and record.get('render_status') != 'error':
+                self.known[record['path']] = seconds
+                self.samples.append((record.get('size') or 0, seconds))
+        self._fit()
+
+    def _fit(self):
+        """
+        耗时 ≈ 基础耗时 + 系数 × 文件大小(MB)，最小二乘拟合；样本不足时使用历史耗时的中位数
+        """
+        if self.samples:
+            times = sorted(seconds for _, seconds in self.samples)
+            self.fallback = times[len(times) // 2]
+        if len(self.samples) < MIN_SAMPLES:
+            self.model = None
+            return
+        xs = [size / (1024 * 1024) for size, _ in self.samples]
+        ys = [seconds for _, seconds in self.samples]
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x if var_x > 0 else 0.0
+        slope = max(slope, 0.0)
+        self.model = (mean_y - slope * mean_x, slope, min(ys))
+
+    def predict(self, path, size):
+        """
+        预测单个文件的耗时（秒）
+        """
+        if path in self.known:
+            return self.known[path]
+        if self.model is not None:
+            base, slope, floor = self.model
+            return max(base + slope * (size or 0) / (1024 * 1024), floor)
+        return self.fallback
+
+    def order(self, entries, records):
+        """
+        按预测耗时从短到长排列 [(STEP文件路径, 标签)]，预测耗时相同时保持原顺序
+        :param records: 文件索引记录，用于学习历史耗时和查询文件大小
+        """
+        if not self.enabled:
+            return entries
+        records = list(records)
+        self.learn(records)
+        sizes = {record['path']: record.get('size') for record in records}
+        self.costs = {path: self.predict(path, sizes.get(path)) for path, _ in entries}
+        return sorted(entries, key=lambda entry: self.costs[entry[0]])
+
+    def estimate(self, paths, workers=1):
+        """
+        按最短优先分配给 workers 个进程时，预计能在预算内完成的文件数和这些文件的预测总耗时
+        """
+        lanes = [0.0] * max(1, workers)
+        count = 0
+        total = 0.0
+        for path in paths:
+            cost = self.costs.get(path, self.fallback)
+            finish = lanes[0] + cost
+            if finish > self.seconds:
+                break
+            heapq.heapreplace(lanes, finish)
+            count += 1
+            total += cost
+        return count, total
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.time()) if self.deadline is not None else None
+
+    def fits(self, path):
+        """
+        该文件按预测耗时能否在预算结束前完成；放不下时预算关闭，之后的文件全部推迟
+        """
+        if not self.enabled:
+            return True
+        if not self.closed and time.time() + self.costs.get(path, self.fallback) > self.deadline:
+            self.closed = True
+        return not self.closed
+
+    def expired(self):
+        return self.enabled and time.time() >= self.deadline
+
+    def defer(self, path, file):
+        """
+        记录一个推迟到下次运行的文件
+        """
+        self.closed = True
+        cost = self.costs.get(path, self.fallback)
+        self.deferred += 1
+        self.deferred_seconds += cost
+        if len(self.deferred_files) < DEFERRED_LOG_LIMIT:
+            self.deferred_files.append((file, cost))
+        return cost
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行检查点：追加写入的 JSONL 文件，第一行记录运行参数，之后每处理完一个文件追加一行
+中断（崩溃、Ctrl-C）后以相同参数再次运行时，已记录的文件直接跳过，不再逐个检查输出目录
+整批处理完成后删除检查点
+同一个检查点同时只能被一个进程使用，其他并发进程不记录检查点
+"""
+
+import os
+import json
+import time
+from steplock import FileLock
+
+class RunCheckpoint:
+    """
+    生成工具的运行检查点
+    params 为影响处理范围的运行参数，与检查点中记录的不一致时重新开始
+    """
+    def __init__(self, path, params):
+        self.path = str(path)
+        self.params = params
+        self.done = {}
+        self.resumed = False
+        self.handle = None
+        self.lock = FileLock(self.path + ".lock")
+        self.busy = False
+
+    def open(self, resume=True):
+        """
+        打开检查点：resume 且参数一致时载入已完成的文件并继续追加，否则重新开始
+        检查点正被其他进程使用时 busy 为 True，本次不读也不写检查点
+        :return: 已完成的文件 {路径: 状态}
+        """
+        checkpoint_dir = os.path.dirname(self.path)
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+        if not self.lock.acquire():
+            self.busy = True
+            return self.done
+
+        valid_size = self._load() if resume else None
+        if valid_size is None:
+            self.done = {}
+            self.resumed = False
+            self.handle = open(self.path, 'w', encoding='utf-8')
+            self._write({'params': self.params, 'started': round(time.time(), 3)})
+        else:
+            self.resumed = True
+            # 截掉中断时写了一半的最后一行
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_size)
+            self.handle = open(self.path, 'a', encoding='utf-8')
+        return self.done
+
+    def _load(self):
+        """
+        读取已有的检查点
+        :return: 最后一条完整记录之后的字节偏移；没有可用的检查点时返回 None
+        """
+        try:
+            f = open(self.path, 'rb')
+        except OSError:
+            return None
+        with f:
+            first = f.readline()
+            try:
+                header = json.loads(first)
+            except ValueError:
+                return None
+            if not first.endswith(b"\n") or header.get('params') != self.params:
+                return None
+
+            done = {}
+            valid_size = len(first)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                done[record['path']] = record['status']
+                valid_size += len(line)
+        self.done = done
+        return valid_size
+
+    def _write(self, record):
+        if self.handle is None:
+            return
+        self.handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.handle.flush()
+
+    def mark(self, path, status):
+        """
+        记录一个文件已处理完成（success / error / skipped）
+        """
+        path = str(path)
+        self.done[path] = status
+        self._write({'path': path, 'status': status})
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+        self.lock.release()
+
+    def complete(self):
+        """
+        整批处理完成：删除检查点，下次运行从头开始
+        """
+        if self.busy:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.close()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+输入语料发现：多个输入根目录、递归扫描和按子目录划分的命名空间
+不复制数据；需要平铺目录时用符号链接/硬链接/reflink 建立链接目录
+支持压缩的输入（.stp.gz / .stp.zst / zip压缩包中的STEP文件），读取时解压到内存文件，不落盘
+"""
+
+import os
+import io
+import gzip
+import errno
+import hashlib
+import posixpath
+import shutil
+import zipfile
+import tempfile
+import contextlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 支持的STEP扩展名（不区分大小写）
+STEP_EXTENSIONS = (".stp", ".step")
+
+# 支持的单文件压缩格式（需要 zstandard 包才能读取 .zst）
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+# zip压缩包内成员的路径写法: 压缩包路径!成员路径
+ARCHIVE_SEPARATOR = "!"
+
+# 内存文件不可用时的暂存目录（tmpfs）
+STAGING_DIR = "/dev/shm"
+
+# 建立平铺链接目录的方式
+LINK_METHODS = ("symlink", "hardlink", "reflink")
+
+# Linux FICLONE ioctl，用于 reflink（btrfs/xfs 等写时复制文件系统）
+FICLONE = 0x40049409
+
+def is_step_file(name):
+    """
+    判断文件名是否为STEP文件（不区分大小写），包括 .stp.gz / .stp.zst 等压缩文件
+    """
+    name = name.lower()
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return name.endswith(STEP_EXTENSIONS)
+
+def step_stem(name):
+    """
+    STEP文件名去掉压缩后缀和扩展名，例如 x.stp.gz -> x
+    """
+    name = os.path.basename(name)
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.lower().endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return os.path.splitext(name)[0]
+
+def split_archive_path(path):
+    """
+    拆分压缩包成员路径，普通文件返回 (path, None)
+    """
+    path = str(path)
+    if ARCHIVE_SEPARATOR in path:
+        archive, member = path.split(ARCHIVE_SEPARATOR, 1)
+        if archive.lower().endswith(".zip"):
+            return archive, member
+    return path, None
+
+def input_exists(path):
+    """
+    判断输入是否存在（支持压缩包成员）
+    """
+    archive, member = split_archive_path(path)
+    if member is None:
+        return os.path.isfile(archive)
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            zf.getinfo(member)
+        return True
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return False
+
+def input_stat(path):
+    """
+    返回输入的 (大小, 修改时间)；压缩包成员使用解压后的大小和压缩包的修改时间
+    """
+    archive, member = split_archive_path(path)
+    stat = os.stat(archive)
+    if member is None:
+        return stat.st_size, stat.st_mtime
+    with zipfile.ZipFile(archive) as zf:
+        return zf.getinfo(member).file_size, stat.st_mtime
+
+def open_step_stream(path):
+    """
+    打开输入的解压后内容（二进制只读流）
+    """
+    archive, member = split_archive_path(path)
+    if member is not None:
+        zf = zipfile.ZipFile(archive)
+        stream = zf.open(member)
+        # 关闭流时一并关闭压缩包
+        close = stream.close
+        def close_both():
+            close()
+            zf.close()
+        stream.close = close_both
+        return stream
+
+    lower = archive.lower()
+    if lower.endswith(".gz"):
+        return gzip.open(archive, 'rb')
+    if lower.endswith(".zst"):
+        if zstandard is None:
+            raise OSError(f"读取 .zst 文件需要安装 zstandard 包 (pip install zstandard): {archive}")
+        return zstandard.ZstdDecompressor().stream_reader(open(archive, 'rb'), closefd=True)
+    return open(archive, 'rb')
+
+def is_compressed_input(path):
+    """
+    判断输入是否需要解压后才能交给 STEP 读取器
+    """
+    archive, member = split_archive_path(path)
+    return member is not None or archive.lower().endswith(COMPRESSED_SUFFIXES)
+
+@contextlib.contextmanager
+def staged_step_file(path):
+    """
+    返回可以直接交给 STEPControl_Reader.ReadFile 的文件路径
+    普通文件直接返回原路径；压缩输入流式解压到内存文件 (memfd)，
+    不支持 memfd 时解压到 tmpfs 上的临时文件，退出时自动删除，不会永久解压
+    """
+    if not is_compressed_input(path):
+        yield str(path)
+        return
+
+    with open_step_stream(path) as stream:
+        if hasattr(os, "memfd_create") and os.path.isdir("/proc/self/fd"):
+            fd = os.memfd_create(step_stem(path) + ".stp")
+            try:
+                with io.FileIO(fd, 'wb', closefd=False) as f:
+                    shutil.copyfileobj(stream, f, 1024 * 1024)
+                yield f"/proc/self/fd/{fd}"
+            finally:
+                os.close(fd)
+            return
+
+        staging_dir = STAGING_DIR if os.path.isdir(STAGING_DIR) else None
+        with tempfile.NamedTemporaryFile(suffix=".stp", dir=staging_dir, delete=False) as f:
+            shutil.copyfileobj(stream, f, 1024 * 1024)
+            staged_path = f.name
+    try:
+        yield staged_path
+    finally:
+        os.remove(staged_path)
+
+def safe_member_name(name):
+    """
+    规范化zip成员路径（与 zipfile.extract 相同的检查）：绝对路径、盘符或含 .. 的成员返回 None，
+    否则返回去掉 . 和重复分隔符的相对路径，避免标签（输出目录）指向输出目录之外
+    """
+    normalized = posixpath.normpath(name.replace("\\", "/"))
+    parts = normalized.split("/")
+    if normalized.startswith("/") or ":" in parts[0] or ".." in parts or normalized in (".", ""):
+        return None
+    return normalized
+
+def _scan_archive(archive_path, prefix, with_stat=False):
+    """
+    列出zip压缩包中的STEP文件，压缩包名作为命名空间；路径不安全的成员跳过
+    """
+    entries = []
+    try:
+        with zipfile.ZipFile(archive_path) as zf:
+            members = [info for info in zf.infolist()
+                       if not info.is_dir() and is_step_file(info.filename) and safe_member_name(info.filename)]
+    except (OSError, zipfile.BadZipFile):
+        return entries
+
+    archive_mtime = os.stat(archive_path).st_mtime if with_stat else None
+    archive_label = prefix + os.path.splitext(os.path.basename(archive_path))[0]
+    for info in sorted(members, key=lambda i: i.filename):
+        member_dir = posixpath.dirname(safe_member_name(info.filename))
+        label = f"{archive_label}/{member_dir + '/' if member_dir else ''}{step_stem(info.filename)}"
+        path = f"{archive_path}{ARCHIVE_SEPARATOR}{info.filename}"
+        if with_stat:
+            entries.append((path, label, info.file_size, archive_mtime))
+        else:
+            entries.append((path, label))
+    return entries
+
+def _scan_root(root, recursive, prefix="", with_stat=False):
+    """
+    扫描一个根目录，返回 [(STEP文件路径, 标签)]，with_stat 时为 [(路径, 标签, 大小, 修改时间)]
+    递归时跳过以 . 开头的目录（.duplicates、.trash_ 等），不跟随目录符号链接
+    """
+    entries = []
+    subdirs = []
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry)
+            elif entry.name.lower().endswith(".zip") and entry.is_file():
+                entries.extend(_scan_archive(entry.path, prefix, with_stat))
+            elif entry.is_file() and is_step_file(entry.name):
+                stem = step_stem(entry.name)
+                if with_stat:
+                    stat = entry.stat()
+                    entries.append((entry.path, prefix + stem, stat.st_size, stat.st_mtime))
+                else:
+                    entries.append((entry.path, prefix + stem))
+
+    if recursive:
+        for entry in sorted(subdirs, key=lambda e: e.name):
+            entries.extend(_scan_root(entry.path, recursive, f"{prefix}{entry.name}/", with_stat))
+
+    return entries
+
+def scan_step_files(roots, recursive=False, with_stat=False):
+    """
+    扫描多个输入根目录中的STEP文件
+    标签（类别名）为相对于根目录的子目录加文件名（不含扩展名），用 / 分隔，
+    例如 根目录/子集A/1010000420.stp -> 子集A/1010000420；根目录下的文件标签就是文件名
+    多个根目录中出现相同标签时保留先出现的文件
+    with_stat 时条目为 (STEP文件路径, 标签, 大小, 修改时间)
+    :return: (条目列表 [(STEP文件路径, 标签)], 冲突列表 [(被忽略的路径, 标签, 保留的路径)])
+    """
+    if isinstance(roots, (str, os.PathLike)):
+        roots = [roots]
+
+    entries = []
+    collisions = []
+    seen = {}
+    for root in roots:
+        root = str(root)
+        if not os.path.isdir(root):
+            continue
+        for item in _scan_root(root, recursive, with_stat=with_stat):
+            step_path, label = item[0], item[1]
+            if label in seen:
+                collisions.append((step_path, label, seen[label]))
+                continue
+            seen[label] = step_path
+            entries.append(item)
+
+    return entries, collisions
+
+def parse_shard(text):
+    """
+    解析 i/N 形式的分片参数（i 从 0 开始），返回 (i, N)
+    """
+    try:
+        index, count = (int(part) for part in str(text).split("/"))
+    except ValueError:
+        raise ValueError(f"分片参数格式应为 i/N，例如 0/4: {text}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"分片编号超出范围 (0 <= i < N): {text}")
+    return index, count
+
+def shard_of(label, count):
+    """
+    标签所属的分片编号：标签 MD5 的前8字节对 N 取模
+    不使用内置 hash()（每个进程随机加盐），不同机器、不同挂载路径上的结果一致
+    """
+    digest = hashlib.md5(label.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+def filter_shard(entries, shard):
+    """
+    只保留属于指定分片 (i, N) 的条目，shard 为 None 时全部保留
+    """
+    if shard is None:
+        return entries
+    index, count = shard
+    return [entry for entry in entries if shard_of(entry[1], count) == index]
+
+def label_output_dir(output_dir, label):
+    """
+    标签 -> 模型输出子目录（命名空间对应输出目录下的子目录）
+    结果不在 output_dir 之下时抛出 ValueError（提交输出时会替换该位置上已有的目录）
+    """
+    path = os.path.join(output_dir, *label.split("/"))
+    root = os.path.abspath(output_dir)
+    if os.path.commonpath([root, os.path.abspath(path)]) != root or os.path.abspath(path) == root:
+        raise ValueError(f"标签 {label} 对应的输出目录不在 {output_dir} 之下")
+    return path
+
+def label_stem(label):
+    """
+    标签中的模型名部分（用于视角图片文件名）
+    """
+    return label.rsplit("/", 1)[-1]
+
+def _reflink(src, dst):
+    """
+    通过 FICLONE 建立 reflink（共享数据块的独立文件）
+    克隆失败时删除本次创建的空文件；dst 已存在时抛出 FileExistsError，不改动已有文件
+    """
+    import fcntl
+    with open(src, 'rb') as fsrc:
+        fdst = open(dst, 'xb')
+        try:
+            with fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            os.remove(dst)
+            raise
+
+def link_file(src, dst, method="symlink"):
+    """
+    按指定方式把 src 链接到 dst，不复制数据
+    """
+    if method == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+    elif method == "hardlink":
+        os.link(src, dst)
+    elif method == "reflink":
+        _reflink(src, dst)
+    else:
+        raise ValueError(f"不支持的链接方式: {method}")
+
+def _same_link(dst, src, method):
+    """
+    判断已存在的 dst 是否就是 src 的链接（reflink 是独立的 inode，只能比较大小）
+    """
+    try:
+        if os.path.samefile(dst, src):
+            return True
+        return method == "reflink" and os.path.getsize(dst) == os.path.getsize(src)
+    except OSError:
+        return False
+
+def build_link_farm(entries, farm_dir, method="symlink"):
+    """
+    为扫描结果建立平铺的链接目录，供只能读取单层目录的旧工具使用
+    命名空间中的 / 替换为 -（不用 _，避免被重命名工具截断）；压缩包中的成员无法链接，记为错误
+    已存在且指向同一文件的链接保留，其余同名文件视为冲突
+    :return: {'linked', 'existing', 'errors': [(路径, 错误信息)]}
+    """
+    os.makedirs(farm_dir, exist_ok=True)
+    linked = 0
+    existing = 0
+    errors = []
+    for step_path, label in entries:
+        if split_archive_path(step_path)[1] is not None:
+            errors.append((step_path, "压缩包成员无法链接"))
+            continue
+        ext = os.path.basename(step_path)[len(step_stem(step_path)):]
+        dst = os.path.join(farm_dir, label.replace("/", "-") + ext)
+        try:
+            link_file(step_path, dst, method)
+            linked += 1
+        except OSError as e:
+            if e.errno == errno.EEXIST and _same_link(dst, step_path, method):
+                existing += 1
+            else:
+                errors.append((step_path, str(e)))
+
+    return {
+        'linked': linked,
+        'existing': existing,
+        'errors': errors
+    }
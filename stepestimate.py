@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行成本估算：按文件大小和实体数的分位数把语料分层，每层抽样渲染，
+按各层文件数外推整批的耗时、各格式输出字节数和失败率，并给出峰值内存
+分层抽样让少量的大文件也有样本，比简单随机抽样的外推误差小
+"""
+
+import math
+import random
+import bisect
+
+# 默认抽样文件数
+DEFAULT_SAMPLE_SIZE = 30
+
+# 文件大小和实体数的分层数（按分位数划分）
+SIZE_BINS = 4
+ENTITY_BINS = 3
+
+# 外推总耗时的置信区间（约95%）
+CONFIDENCE_Z = 1.96
+
+def _quantile_edges(values, bins):
+    """
+    把 values 按分位数分成 bins 层的分界值（去重，层数可能少于 bins）
+    """
+    values = sorted(values)
+    if not values:
+        return []
+    edges = {values[min(len(values) - 1, len(values) * i // bins)] for i in range(1, bins)}
+    return sorted(edge for edge in edges if edge > values[0])
+
+def _format_size(size):
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.0f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+def _range_label(edges, index, format_value=str):
+    low = format_value(edges[index - 1]) if index > 0 else None
+    high = format_value(edges[index]) if index < len(edges) else None
+    if low is None and high is None:
+        return "全部"
+    if low is None:
+        return f"< {high}"
+    if high is None:
+        return f">= {low}"
+    return f"{low} - {high}"
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+class Stratum:
+    """
+    一层文件：按大小和实体数划分，记录该层的样本测量值
+    """
+    def __init__(self, key, label):
+        self.key = key
+        self.label = label
+        self.records = []
+        self.seconds = []
+        self.errors = 0
+        self.peaks = []
+        self.bytes = {}
+
+    def add(self, status, seconds, peak_mb=None, bytes_by_format=None):
+        """
+        记录一个样本：失败的文件同样计入耗时（整批运行时也要花这些时间），输出字节按格式累加
+        """
+        self.seconds.append(seconds)
+        if status != "success":
+            self.errors += 1
+        if peak_mb:
+            self.peaks.append(peak_mb)
+        for fmt, size in (bytes_by_format or {}).items():
+            self.bytes[fmt] = self.bytes.get(fmt, 0) + size
+
+    def mean_seconds(self):
+        return sum(self.seconds) / len(self.seconds) if self.seconds else None
+
+def stratify(records, size_bins=SIZE_BINS, entity_bins=ENTITY_BINS):
+    """
+    按文件大小和实体数的分位数分层；没有实体数的文件只按大小分层
+    :param records: 文件索引记录（需要 size，entities 可为空）
+    :return: [Stratum]，只包含非空的层
+    """
+    size_edges = _quantile_edges([record['size'] or 0 for record in records], size_bins)
+    entity_edges = _quantile_edges([record['entities'] for record in records if record.get('entities') is not None],
+                                   entity_bins) if entity_bins > 1 else []
+    strata = {}
+    for record in records:
+        size_bin = bisect.bisect_right(size_edges, record['size'] or 0)
+        entities = record.get('entities')
+        entity_bin = bisect.bisect_right(entity_edges, entities) if entities is not None and entity_edges else None
+        key = (size_bin, entity_bin)
+        if key not in strata:
+            label = f"大小 {_range_label(size_edges, size_bin, _format_size)}"
+            if entity_bin is not None:
+                label += f", 实体 {_range_label(entity_edges, entity_bin)}"
+            strata[key] = Stratum(key, label)
+        strata[key].records.append(record)
+    return [strata[key] for key in sorted(strata, key=lambda key: (key[0], -1 if key[1] is None else key[1]))]
+
+def draw_sample(strata, sample_size=DEFAULT_SAMPLE_SIZE, seed=None):
+    """
+    按各层文件数比例分配样本数（最大余数法），每层至少1个，样本数足够时每层至少2个以便估计层内方差
+    :return: [(Stratum, 记录)]
+    """
+    total = sum(len(stratum.records) for stratum in strata)
+    minimum = 2 if sample_size >= 2 * len(strata) else 1
+    quotas = [len(stratum.records) * sample_size / total for stratum in strata]
+    counts = [min(len(stratum.records), max(minimum, int(quota))) for stratum, quota in zip(strata, quotas)]
+    by_remainder = sorted(range(len(strata)), key=lambda i: quotas[i] - int(quotas[i]), reverse=True)
+    for i in by_remainder:
+        if sum(counts) >= sample_size:
+            break
+        if counts[i] < len(strata[i].records):
+            counts[i] += 1
+
+    rng = random.Random(seed)
+    sample = []
+    for stratum, count in zip(strata, counts):
+        sample.extend((stratum, record) for record in rng.sample(stratum.records, count))
+    return sample
+
+def extrapolate(strata, workers=1):
+    """
+    按各层的样本均值和文件数外推整批运行
+    总耗时的标准误差按分层抽样公式 sqrt(Σ N²·(1 - n/N)·s²/n) 计算，只有1个样本的层不计入误差
+    :return: 估算结果字典
+    """
+    measured = [stratum for stratum in strata if stratum.seconds]
+    files = sum(len(stratum.records) for stratum in strata)
+    covered = sum(len(stratum.records) for stratum in measured)
+    seconds = 0.0
+    variance = 0.0
+    single = 0
+    errors = 0.0
+    output = {}
+    for stratum in measured:
+        count, n = len(stratum.records), len(stratum.seconds)
+        mean = stratum.mean_seconds()
+        seconds += count * mean
+        errors += count * stratum.errors / n
+        if n > 1:
+            var = sum((value - mean) ** 2 for value in stratum.seconds) / (n - 1)
+            variance += count * count * (1 - n / count) * var / n
+        elif count > 1:
+            single += 1
+        for fmt, size in stratum.bytes.items():
+            output[fmt] = output.get(fmt, 0) + count * size / n
+
+    # 没有样本的层（不会出现，除非抽样时全部被跳过）按已测层的平均值补齐
+    if covered and covered < files:
+        scale = files / covered
+        seconds *= scale
+        errors *= scale
+        output = {fmt: size * scale for fmt, size in output.items()}
+
+    peaks = [peak for stratum in measured for peak in stratum.peaks]
+    stderr = math.sqrt(variance)
+    workers = max(1, workers)
+    return {
+        'files': files,
+        'sampled': sum(len(stratum.seconds) for stratum in measured),
+        'seconds': seconds,
+        'seconds_stderr': stderr,
+        'single_sample_strata': single,
+        'wall_seconds': seconds / workers,
+        'wall_low': max(0.0, seconds - CONFIDENCE_Z * stderr) / workers,
+        'wall_high': (seconds + CONFIDENCE_Z * stderr) / workers,
+        'workers': workers,
+        'errors': errors,
+        'output_bytes': output,
+        'peak_rss_mb': max(peaks) if peaks else None,
+        'peak_rss_p95_mb': _percentile(peaks, 0.95),
+        # 所有进程同时处理 P95 大小的文件时的内存占用，最坏情况按样本最大值
+        'concurrent_rss_mb': _percentile(peaks, 0.95) * workers if peaks else None,
+        'concurrent_rss_max_mb': max(peaks) * workers if peaks else None
+    }
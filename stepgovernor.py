@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+资源调度：按可用CPU核数、内存和每个文件预测的峰值内存决定同时渲染的任务数
+预测来自文件索引中历史运行记录的每文件峰值RSS（同一文件直接使用，其他文件按大小线性拟合）；
+运行中按系统可用内存动态调整并发上限，每次调整都写入日志和事件
+"""
+
+import os
+import time
+
+# 为系统和主进程保留的内存 (MB)
+DEFAULT_RESERVE_MB = 1024
+
+# 没有历史记录时每个任务的预测峰值内存 (MB)
+DEFAULT_JOB_MB = 1500
+
+# 预测值的安全系数
+SAFETY_FACTOR = 1.2
+
+# 按文件大小拟合内存模型至少需要的样本数
+MIN_SAMPLES = 5
+
+# 动态调整的检查间隔和提高并发前的冷却时间（秒）
+POLL_INTERVAL = 2.0
+RAISE_COOLDOWN = 30.0
+
+def _read_text(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def cpu_limit():
+    """
+    本进程可用的CPU核数：CPU亲和性与 cgroup v2 的 cpu.max 配额中较小者
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+
+    quota = _read_text("/sys/fs/cgroup/cpu.max")
+    if quota:
+        parts = quota.split()
+        if len(parts) == 2 and parts[0] != "max":
+            cores = min(cores, max(1, int(int(parts[0]) / int(parts[1]))))
+    return cores
+
+def memory_info():
+    """
+    返回 (总内存MB, 可用内存MB)，考虑 cgroup v2 的 memory.max 限制；无法获取时为 (None, None)
+    """
+    total = available = None
+    text = _read_text("/proc/meminfo")
+    if text:
+        values = {}
+        for line in text.splitlines():
+            name, _, rest = line.partition(":")
+            values[name] = int(rest.split()[0]) / 1024
+        total = values.get("MemTotal")
+        available = values.get("MemAvailable", values.get("MemFree"))
+
+    limit = _read_text("/sys/fs/cgroup/memory.max")
+    if limit and limit != "max":
+        limit_mb = int(limit) / (1024 * 1024)
+        current = _read_text("/sys/fs/cgroup/memory.current")
+        used_mb = int(current) / (1024 * 1024) if current else 0
+        total = min(total, limit_mb) if total else limit_mb
+        available = min(available, limit_mb - used_mb) if available is not None else limit_mb - used_mb
+    return total, available
+
+class ResourceGovernor:
+    """
+    并发调度器
+    can_admit() 判断能否再启动一个预测占用 predicted_mb 的任务：正在运行的任务数不超过当前并发上限，
+    且所有运行中任务的预测内存之和不超过内存预算；没有任务在运行时总是允许，超大文件单独运行
+    """
+    def __init__(self, max_workers=None, memory_limit_mb=None, reserve_mb=DEFAULT_RESERVE_MB, logger=None):
+        self.logger = logger
+        self.cores = cpu_limit()
+        self.max_workers = max(1, max_workers or self.cores)
+        total_mb, available_mb = memory_info()
+        self.memory_mb = memory_limit_mb or total_mb or DEFAULT_JOB_MB * self.max_workers
+        self.reserve_mb = reserve_mb
+        self.budget_mb = max(self.memory_mb - reserve_mb, DEFAULT_JOB_MB)
+        self.limit = self.max_workers
+
+        self.running = {}
+        self.known = {}
+        self.samples = []
+        self.model = None
+
+        self.last_poll = 0.0
+        self.last_lower = 0.0
+        self.started = time.time()
+        self.last_change = self.started
+        self.busy_seconds = 0.0
+        self.peak_running = 0
+        self.waits = 0
+        self.adjustments = 0
+        self.errors = []
+
+    def _decide(self, message, **fields):
+        """
+        记录一次调度决策
+        """
+        if self.logger is not None:
+            self.logger.log(f"  [调度] {message}")
+            self.logger.event("governor", **fields)
+
+    def learn(self, records):
+        """
+        从文件索引记录中学习每个文件的峰值内存
+        """
+        for record in records:
+            peak = record.get('peak_rss_mb')
+            if peak:
+                self.known[record['path']] = peak
+                self.samples.append((record.get('size') or 0, peak))
+        self._fit()
+
+    def _fit(self):
+        """
+        峰值内存 ≈ 基础占用 + 系数 × 文件大小(MB)，最小二乘拟合
+        """
+        if len(self.samples) < MIN_SAMPLES:
+            self.model = None
+            return
+        xs = [size / (1024 * 1024) for size, _ in self.samples]
+        ys = [peak for _, peak in self.samples]
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x if var_x > 0 else 0.0
+        slope = max(slope, 0.0)
+        self.model = (mean_y - slope * mean_x, slope, min(ys))
+
+    def predict(self, path, size):
+        """
+        预测单个文件的峰值内存 (MB)
+        """
+        if path in self.known:
+            return self.known[path] * SAFETY_FACTOR
+        if self.model is not None:
+            base, slope, floor = self.model
+            return max(base + slope * (size or 0) / (1024 * 1024), floor) * SAFETY_FACTOR
+        return DEFAULT_JOB_MB
+
+    def startup(self):
+        """
+        启动时根据历史记录估算初始并发上限并记录
+        """
+        typical = sorted(self.known.values())[len(self.known) // 2] * SAFETY_FACTOR if self.known else DEFAULT_JOB_MB
+        by_memory = max(1, int(self.budget_mb // typical))
+        self.limit = min(self.max_workers, by_memory)
+        self._decide(f"CPU {self.cores} 核, 内存 {self.memory_mb:.0f} MB (保留 {self.reserve_mb} MB), "
+                     f"历史样本 {len(self.samples)}, 典型任务 {typical:.0f} MB -> 初始并发 {self.limit}"
+                     f" (进程上限 {self.max_workers})",
+                     action="start", cores=self.cores, memory_mb=round(self.memory_mb),
+                     samples=len(self.samples), typical_mb=round(typical), limit=self.limit)
+        return self.limit
+
+    def committed_mb(self):
+        return sum(self.running.values())
+
+    def can_admit(self, predicted_mb):
+        if len(self.running) >= self.limit:
+            return False
+        if not self.running:
+            return True
+        return self.committed_mb() + predicted_mb <= self.budget_mb
+
+    def _account(self):
+        now = time.time()
+        self.busy_seconds += len(self.running) * (now - self.last_change)
+        self.last_change = now
+
+    def admit(self, job_id, predicted_mb):
+        self._account()
+        self.running[job_id] = predicted_mb
+        self.peak_running = max(self.peak_running, len(self.running))
+
+    def extend(self, job_id, predicted_mb):
+        """
+        拼图批次中加入一个模型：整个批次占一个并发，预测内存取批次中最大的文件（同一进程内几何数据很小）
+        """
+        self.running[job_id] = max(self.running.get(job_id, 0), predicted_mb)
+
+    def wait(self, file, predicted_mb):
+        """
+        记录一次因内存预算不足而推迟启动
+        """
+        self.waits += 1
+        self._decide(f"内存预算不足，推迟 {file} (预测 {predicted_mb:.0f} MB, 已占用 {self.committed_mb():.0f}"
+                     f"/{self.budget_mb:.0f} MB, 运行中 {len(self.running)})",
+                     action="wait", file=file, predicted_mb=round(predicted_mb),
+                     committed_mb=round(self.committed_mb()), running=len(self.running))
+
+    def release(self, job_id, path, size, peak_mb):
+        """
+        任务结束：记录实际峰值内存，更新预测模型
+        """
+        self._account()
+        predicted = self.running.pop(job_id, None)
+        if not peak_mb:
+            return
+        self.known[path] = peak_mb
+        self.samples.append((size or 0, peak_mb))
+        if predicted:
+            self.errors.append((peak_mb - predicted / SAFETY_FACTOR) / peak_mb)
+        if len(self.samples) <= MIN_SAMPLES or len(self.samples) % 20 == 0:
+            self._fit()
+
+    def lost(self, job_id, path, file):
+        """
+        渲染进程异常退出（通常是内存不足被系统杀掉）：加大该文件的预测值并降低并发上限
+        """
+        self._account()
+        predicted = self.running.pop(job_id, None) or DEFAULT_JOB_MB
+        self.known[path] = predicted * 2 / SAFETY_FACTOR
+        old = self.limit
+        self.limit = max(1, self.limit - 1)
+        self.last_lower = time.time()
+        self.adjustments += 1
+        self._decide(f"渲染进程异常退出 ({file})，该文件预测内存加倍，并发上限 {old} -> {self.limit}",
+                     action="lower", reason="worker_lost", file=file, limit=self.limit)
+
+    def poll(self):
+        """
+        按系统当前可用内存动态调整并发上限：低于保留值时降低，宽裕时逐步恢复
+        """
+        now = time.time()
+        if now - self.last_poll < POLL_INTERVAL:
+            return
+        self.last_poll = now
+        _, available_mb = memory_info()
+        if available_mb is None:
+            return
+
+        old = self.limit
+        typical = self.committed_mb() / len(self.running) if self.running else DEFAULT_JOB_MB
+        if available_mb < self.reserve_mb and self.limit > 1:
+            self.limit = max(1, min(self.limit, len(self.running)) - 1)
+            self.last_lower = now
+            reason = "low_memory"
+            message = f"系统可用内存 {available_mb:.0f} MB 低于保留值"
+        elif (available_mb > self.reserve_mb + typical * 2 and self.limit < self.max_workers
+              and len(self.running) >= self.limit and now - self.last_lower > RAISE_COOLDOWN):
+            self.limit += 1
+            reason = "headroom"
+            message = f"系统可用内存 {available_mb:.0f} MB 充足"
+        else:
+            return
+
+        self.adjustments += 1
+        self._decide(f"{message}，并发上限 {old} -> {self.limit}", action="adjust", reason=reason,
+                     available_mb=round(available_mb), limit=self.limit, running=len(self.running))
+
+    def summary(self):
+        """
+        调度统计：平均/最大并发、上限调整次数、推迟次数和内存预测误差
+        """
+        self._account()
+        elapsed = max(time.time() - self.started, 1e-9)
+        errors = sorted(abs(e) for e in self.errors)
+        return {
+            'avg_concurrency': self.busy_seconds / elapsed,
+            'peak_concurrency': self.peak_running,
+            'final_limit': self.limit,
+            'adjustments': self.adjustments,
+            'waits': self.waits,
+            'median_error': errors[len(errors) // 2] if errors else None
+        }
@@ -0,0 +1,633 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行历史数据库 (SQLite)：把每次运行的处理日志 multiview_*.log 和结构化事件 multiview_*.events.jsonl
+导入为按运行、文件、阶段和主机查询的历史记录
+同一次运行有事件文件时以事件为准（带主机、阶段耗时和峰值内存），只有文本日志的旧运行从日志文本解析；
+日志归档 archive/processlog_*.tar.gz|.tar.zst 中的文件同样导入，源文件大小不变时重复导入直接跳过
+"""
+
+import os
+import re
+import json
+import time
+import fnmatch
+import sqlite3
+import tarfile
+import datetime
+
+try:
+    import zstandard
+except ImportError:  # .tar.zst 归档需要 zstandard 包
+    zstandard = None
+
+# 运行日志文件名：multiview_<YYYYmmdd_HHMMSS>.log / .events.jsonl
+_SOURCE_PATTERN = re.compile(r"^multiview_(\d{8}_\d{6})(\.events\.jsonl|\.log)$")
+
+# 日志归档子目录（与 3clearLogsfFiles.py 一致）
+ARCHIVE_DIR_NAME = "archive"
+
+# 判断趋势至少需要的成功样本数
+MIN_TREND_SAMPLES = 3
+
+# 判断一次运行是否变慢至少需要的可比较文件数（在之前的运行中成功过的文件）
+MIN_COMPARE_FILES = 3
+
+# 默认的变慢阈值（相对历史中位数）
+DEFAULT_SLOWDOWN = 0.2
+
+# 拓扑统计字段（steptopology 事件的字段名，也是 topology 表的列名）和显示名称
+TOPOLOGY_FIELDS = ("solids", "shells", "faces", "edges", "bspline_surfaces", "triangles")
+TOPOLOGY_NAMES = {
+    'solids': "实体",
+    'shells': "壳",
+    'faces': "面",
+    'edges': "棱边",
+    'bspline_surfaces': "B样条曲面",
+    'triangles': "三角形"
+}
+
+# 耗时-复杂度拟合至少需要的文件数，以及分桶报告的分位点
+MIN_FIT_FILES = 5
+BUDGET_QUANTILES = (0.25, 0.5, 0.75, 0.9, 1.0)
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    host TEXT,
+    mode TEXT,
+    started REAL,
+    ended REAL,
+    duration REAL,
+    total_files INTEGER,
+    processed INTEGER,
+    skipped INTEGER,
+    errors INTEGER,
+    shard TEXT,
+    complete INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_runs (
+    run_id TEXT NOT NULL,
+    file TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL,
+    peak_rss_mb REAL,
+    ts REAL
+);
+CREATE INDEX IF NOT EXISTS file_runs_file ON file_runs (file);
+CREATE INDEX IF NOT EXISTS file_runs_run ON file_runs (run_id);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id TEXT NOT NULL,
+    file TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT,
+    duration REAL,
+    ts REAL
+);
+CREATE INDEX IF NOT EXISTS stages_run ON stages (run_id);
+CREATE TABLE IF NOT EXISTS topology (
+    run_id TEXT NOT NULL,
+    file TEXT NOT NULL,
+    solids INTEGER,
+    shells INTEGER,
+    faces INTEGER,
+    edges INTEGER,
+    bspline_surfaces INTEGER,
+    triangles INTEGER,
+    ts REAL
+);
+CREATE INDEX IF NOT EXISTS topology_file ON topology (file);
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    run_id TEXT,
+    ingested_at REAL NOT NULL
+);
+"""
+
+_LINE_PATTERN = re.compile(r"^\[(\d{2}):(\d{2}):(\d{2})\] (.*)$")
+_FILE_START_PATTERN = re.compile(r"^\[\d+/(\d+)\] 处理模型: (.+)$")
+_DURATION_PATTERN = re.compile(r"^(?:(\d+)小时)?(?:(\d+)分)?([\d.]+)秒")
+_PARALLEL_RESULT_PATTERN = re.compile(r"^  ([✓✗]) (.+?): (.+)$")
+_PARALLEL_SKIP_PATTERN = re.compile(r"^  - 跳过 (.+?) \((.+)\)$")
+_MODE_PATTERN = re.compile(r"运行模式: (\w+)")
+_TOTALS = {"总耗时": 'duration', "总文件数": 'total_files', "成功处理": 'processed',
+           "跳过文件": 'skipped', "错误文件": 'errors'}
+
+def parse_duration(text):
+    """
+    format_time 的逆运算："1小时2分3.45秒" / "2分3.45秒" / "3.45秒" -> 秒；无法解析时返回 None
+    """
+    match = _DURATION_PATTERN.match(text.strip())
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours or 0) * 3600 + int(minutes or 0) * 60 + float(seconds)
+
+def _median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+def _linear_fit(xs, ys):
+    """
+    最小二乘一元线性拟合 y ≈ a + b·x
+    :return: (a, b, 决定系数 R²)；x 没有变化时返回 None
+    """
+    n = len(xs)
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if var_x <= 0:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+    intercept = mean_y - slope * mean_x
+    total = sum((y - mean_y) ** 2 for y in ys)
+    residual = sum((y - intercept - slope * x) ** 2 for x, y in zip(xs, ys))
+    return intercept, slope, 1 - residual / total if total > 0 else 0.0
+
+def parse_events(text):
+    """
+    解析结构化事件文件
+    :return: (运行字典, 文件记录列表, 阶段记录列表, 拓扑记录列表)；没有任何事件时运行字典为 None
+    """
+    run = None
+    files = []
+    stages = []
+    topology = []
+    last_ts = None
+    for line in text.splitlines():
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue  # 中断时写了一半的最后一行
+        if run is None:
+            run = {'run_id': event.get('run_id'), 'host': event.get('host'), 'started': event.get('ts'),
+                   'complete': 0}
+        last_ts = event.get('ts', last_ts)
+        kind = event.get('event')
+        if kind == "run_start":
+            run.update(mode=event.get('mode'), total_files=event.get('total_files'), shard=event.get('shard'),
+                       started=event.get('ts'))
+        elif kind == "run_end":
+            run.update(duration=event.get('duration'), processed=event.get('processed'),
+                       skipped=event.get('skipped'), errors=event.get('errors'), complete=1)
+        elif kind == "stage" and event.get('file'):
+            if event.get('stage') == "file":
+                files.append({'file': event['file'], 'status': event.get('status'), 'duration': event.get('duration'),
+                              'peak_rss_mb': event.get('peak_rss_mb'), 'ts': event.get('ts')})
+            else:
+                stages.append({'file': event['file'], 'stage': event.get('stage'), 'status': event.get('status'),
+                               'duration': event.get('duration'), 'ts': event.get('ts')})
+                if event.get('stage') == "topology":
+                    topology.append(dict([(field, event.get(field)) for field in TOPOLOGY_FIELDS],
+                                         file=event['file'], ts=event.get('ts')))
+    if run is not None:
+        run['ended'] = last_ts
+    return run, files, stages, topology
+
+def parse_log(text, stamp):
+    """
+    解析文本日志（没有事件文件的旧运行）：按 [i/N] 处理模型 分块的逐文件处理，或并行渲染的 ✓/✗ 结果行
+    时间只有时分秒，日期取自文件名中的时间戳，跨过午夜时顺延一天
+    :return: (运行字典, 文件记录列表)
+    """
+    day = datetime.datetime.strptime(stamp, "%Y%m%d_%H%M%S")
+    run = {'started': None, 'ended': None, 'complete': 0}
+    files = []
+    current = None
+    last_ts = None
+    finished = False
+
+    def close_current():
+        if current is not None:
+            files.append({'file': current['file'], 'status': current['status'] or "error",
+                          'duration': current['duration'], 'peak_rss_mb': None, 'ts': last_ts})
+
+    for line in text.splitlines():
+        match = _LINE_PATTERN.match(line)
+        if not match:
+            continue
+        hour, minute, second, message = match.groups()
+        ts = (day.replace(hour=int(hour), minute=int(minute), second=int(second))).timestamp()
+        if last_ts is not None and ts < last_ts - 12 * 3600:
+            day += datetime.timedelta(days=1)
+            ts += 24 * 3600
+        last_ts = ts
+        if run['started'] is None:
+            run['started'] = ts
+
+        if finished:
+            # 处理完成后的统计报告：只取汇总数字（逐文件耗时详情之前已经解析过），
+            # 日志结束时 Logger 写出的"总耗时"不再覆盖
+            name, _, value = message.partition(": ")
+            if name in _TOTALS and value and _TOTALS[name] not in run:
+                run[_TOTALS[name]] = parse_duration(value) if name == "总耗时" else int(value.split()[0])
+            continue
+        if message.startswith("处理完成!"):
+            close_current()
+            current = None
+            finished = True
+            run['complete'] = 1
+            continue
+        if run.get('mode') is None:
+            mode_match = _MODE_PATTERN.search(message)
+            if mode_match:
+                run['mode'] = mode_match.group(1).lower()
+
+        start_match = _FILE_START_PATTERN.match(message)
+        if start_match:
+            close_current()
+            run['total_files'] = int(start_match.group(1))
+            current = {'file': start_match.group(2), 'status': None, 'duration': None}
+            continue
+        if current is not None:
+            if message.startswith("  处理时间: "):
+                current['duration'] = parse_duration(message.split(": ", 1)[1])
+                close_current()
+                current = None
+            elif message.startswith("  ✓ 成功"):
+                current['status'] = "success"
+            elif message.startswith("  - 跳过"):
+                current['status'] = "locked" if "其他进程正在处理" in message else "skipped"
+            elif message.startswith("  错误") or message.startswith("  ✗"):
+                current['status'] = "error"
+            continue
+
+        # 并行渲染：每个文件一行结果，失败行没有耗时
+        result_match = _PARALLEL_RESULT_PATTERN.match(message)
+        if result_match:
+            symbol, file, rest = result_match.groups()
+            files.append({'file': file, 'status': "success" if symbol == "✓" else "error",
+                          'duration': parse_duration(rest) if symbol == "✓" else None, 'peak_rss_mb': None, 'ts': ts})
+            peak_match = re.search(r"峰值内存 ([\d.]+) MB", rest)
+            if peak_match:
+                files[-1]['peak_rss_mb'] = float(peak_match.group(1))
+            continue
+        skip_match = _PARALLEL_SKIP_PATTERN.match(message)
+        if skip_match:
+            files.append({'file': skip_match.group(1), 'ts': ts, 'duration': None, 'peak_rss_mb': None,
+                          'status': "locked" if "其他进程正在处理" in skip_match.group(2) else "skipped"})
+
+    close_current()
+    run['ended'] = last_ts
+    return run, files
+
+def _archive_members(archive_path, known):
+    """
+    读取日志归档中的运行日志，大小与已导入记录相同的成员不读取内容
+    :return: [(源名称, 文件名, 大小, 文本或 None)]
+    """
+    name = os.path.basename(archive_path)
+    if name.endswith(".tar.zst"):
+        if zstandard is None:
+            raise ValueError(f"读取 {name} 需要安装 zstandard 包 (pip install zstandard)")
+        raw = open(archive_path, "rb")
+        handles = [zstandard.ZstdDecompressor().stream_reader(raw), raw]
+        tar = tarfile.open(fileobj=handles[0], mode="r|")
+    else:
+        handles = []
+        tar = tarfile.open(archive_path, "r:gz")
+    members = []
+    try:
+        for member in tar:
+            if not member.isfile() or not _SOURCE_PATTERN.match(os.path.basename(member.name)):
+                continue
+            source = f"{archive_path}!{member.name}"
+            text = None
+            if known.get(source) != member.size:
+                text = tar.extractfile(member).read().decode("utf-8", "replace")
+            members.append((source, os.path.basename(member.name), member.size, text))
+    finally:
+        tar.close()
+        for handle in handles:
+            handle.close()
+    return members
+
+class RunHistory:
+    """
+    运行历史数据库，各机器的日志可以导入同一个数据库（事件中带主机名；只有文本日志时用 host 参数指定）
+    """
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_TABLES)
+        self.conn.commit()
+
+    def _collect_sources(self, log_dir):
+        """
+        日志目录和归档中的运行日志，按运行分组；同一运行有事件文件时只用事件文件
+        :return: [(源名称, 时间戳, 类型 events/log, 大小, 读取函数)]
+        """
+        known = dict(self.conn.execute("SELECT source, size FROM sources").fetchall())
+        runs = {}
+        candidates = []
+        for entry in os.scandir(log_dir):
+            if entry.is_file():
+                path = entry.path
+                candidates.append((path, entry.name, entry.stat().st_size,
+                                   lambda path=path: open(path, encoding='utf-8', errors='replace').read()))
+        archive_dir = os.path.join(str(log_dir), ARCHIVE_DIR_NAME)
+        if os.path.isdir(archive_dir):
+            for name in sorted(os.listdir(archive_dir)):
+                if name.endswith(".tar.gz") or name.endswith(".tar.zst"):
+                    for source, member_name, size, text in _archive_members(os.path.join(archive_dir, name), known):
+                        candidates.append((source, member_name, size, lambda text=text: text))
+
+        for source, name, size, read in candidates:
+            match = _SOURCE_PATTERN.match(name)
+            if not match:
+                continue
+            stamp, suffix = match.groups()
+            kind = "events" if suffix == ".events.jsonl" else "log"
+            key = (os.path.dirname(source), stamp)
+            if kind == "events" or key not in runs:
+                runs[key] = (source, stamp, kind, size, read)
+        return [item for item in runs.values() if known.get(item[0]) != item[3]]
+
+    def ingest(self, log_dir, host=None):
+        """
+        导入一个日志目录（含 archive/ 下的归档）中新增或有变化的运行
+        :param host: 只有文本日志的运行所属的主机名
+        :return: {'runs': 导入的运行数, 'files': 文件记录数, 'stages': 阶段记录数, 'topology': 拓扑记录数}
+        """
+        counts = {'runs': 0, 'files': 0, 'stages': 0, 'topology': 0}
+        if not os.path.isdir(str(log_dir)):
+            return counts
+        for source, stamp, kind, size, read in sorted(self._collect_sources(log_dir), key=lambda item: item[1]):
+            text = read()
+            if kind == "events":
+                run, files, stages, topology = parse_events(text)
+                if run is None:
+                    continue
+            else:
+                run, files = parse_log(text, stamp)
+                stages = topology = []
+                run['run_id'] = f"{stamp}_{host or 'log'}"
+                run['host'] = host
+            if run.get('duration') is None and run['started'] is not None and run['ended'] is not None:
+                run['duration'] = round(run['ended'] - run['started'], 3)
+            self._store_run(source, size, run, files, stages, topology)
+            counts['runs'] += 1
+            counts['files'] += len(files)
+            counts['stages'] += len(stages)
+            counts['topology'] += len(topology)
+        return counts
+
+    def _store_run(self, source, size, run, files, stages, topology):
+        """
+        写入一次运行，替换同一运行之前导入的记录（未结束的运行再次导入时更新）
+        """
+        run_id = run['run_id']
+        with self.conn:
+            for table in ("runs", "file_runs", "stages", "topology"):
+                self.conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+            self.conn.execute(
+                "INSERT INTO runs (run_id, source, host, mode, started, ended, duration, total_files, processed, "
+                "skipped, errors, shard, complete) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, source, run.get('host'), run.get('mode'), run.get('started'), run.get('ended'),
+                 run.get('duration'), run.get('total_files'), run.get('processed'), run.get('skipped'),
+                 run.get('errors'), run.get('shard'), run['complete']))
+            self.conn.executemany(
+                "INSERT INTO file_runs (run_id, file, status, duration, peak_rss_mb, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, item['file'], item['status'], item['duration'], item['peak_rss_mb'], item['ts'])
+                 for item in files])
+            self.conn.executemany(
+                "INSERT INTO stages (run_id, file, stage, status, duration, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, item['file'], item['stage'], item['status'], item['duration'], item['ts'])
+                 for item in stages])
+            self.conn.executemany(
+                f"INSERT INTO topology (run_id, file, {', '.join(TOPOLOGY_FIELDS)}, ts) "
+                f"VALUES (?, ?, {', '.join('?' * len(TOPOLOGY_FIELDS))}, ?)",
+                [(run_id, item['file']) + tuple(item[field] for field in TOPOLOGY_FIELDS) + (item['ts'],)
+                 for item in topology])
+            self.conn.execute("INSERT OR REPLACE INTO sources (source, size, run_id, ingested_at) VALUES (?, ?, ?, ?)",
+                              (source, size, run_id, time.time()))
+
+    def _success_durations(self, mode=None):
+        """
+        按时间顺序的成功记录 [(run_id, 文件, 耗时)]
+        """
+        query = ("SELECT f.run_id, f.file, f.duration FROM file_runs f JOIN runs r ON r.run_id = f.run_id "
+                 "WHERE f.status = 'success' AND f.duration IS NOT NULL")
+        params = ()
+        if mode:
+            query += " AND r.mode = ?"
+            params = (mode,)
+        return self.conn.execute(query + " ORDER BY r.started, f.ts", params).fetchall()
+
+    def run_trends(self, limit=20, mode=None, slowdown=DEFAULT_SLOWDOWN):
+        """
+        最近的运行及其相对历史的变慢程度：每个成功文件的耗时与该文件在之前运行中的耗时中位数相比，
+        取所有可比较文件比值的中位数；不受每次运行处理的文件集合不同的影响
+        :return: 运行字典列表（按开始时间），slowdown_ratio 为 None 表示可比较的文件不足
+        """
+        history = {}
+        ratios = {}
+        medians = {}
+        for run_id, file, duration in self._success_durations(mode):
+            previous = history.setdefault(file, [])
+            if previous:
+                baseline = _median(previous)
+                if baseline and baseline > 0:
+                    ratios.setdefault(run_id, []).append(duration / baseline)
+            medians.setdefault(run_id, []).append(duration)
+            previous.append(duration)
+
+        query = "SELECT * FROM runs"
+        params = ()
+        if mode:
+            query += " WHERE mode = ?"
+            params = (mode,)
+        cursor = self.conn.execute(query + " ORDER BY started DESC LIMIT ?", params + (limit,))
+        columns = [column[0] for column in cursor.description]
+        runs = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for run in runs:
+            run_ratios = ratios.get(run['run_id'], [])
+            run['median_seconds'] = _median(medians.get(run['run_id'], []))
+            run['compared'] = len(run_ratios)
+            run['slowdown_ratio'] = _median(run_ratios) if len(run_ratios) >= MIN_COMPARE_FILES else None
+            run['regression'] = run['slowdown_ratio'] is not None and run['slowdown_ratio'] >= 1 + slowdown
+        return list(reversed(runs))
+
+    def slower_files(self, limit=20, mode=None, slowdown=DEFAULT_SLOWDOWN, min_samples=MIN_TREND_SAMPLES):
+        """
+        越来越慢的文件：后一半成功耗时的中位数比前一半高出 slowdown 以上，且最近一次不比第一次快
+        :return: [{'file', 'samples', 'first', 'last', 'ratio'}]，按变慢比例从高到低
+        """
+        durations = {}
+        for _, file, duration in self._success_durations(mode):
+            durations.setdefault(file, []).append(duration)
+        result = []
+        for file, values in durations.items():
+            if len(values) < min_samples:
+                continue
+            half = len(values) // 2
+            before = _median(values[:half])
+            after = _median(values[-half:])
+            if before and after >= before * (1 + slowdown) and values[-1] >= values[0]:
+                result.append({'file': file, 'samples': len(values), 'first': values[0], 'last': values[-1],
+                               'ratio': after / before})
+        result.sort(key=lambda item: item['ratio'], reverse=True)
+        return result[:limit]
+
+    def file_costs(self, mode=None):
+        """
+        每个文件的预测成本：成功耗时的中位数、历史峰值内存的最大值、成功次数和失败次数
+        事件中的文件是输入文件路径；只有文本日志的旧运行（以及旧版本的事件）只记录了文件名
+        :return: {文件路径或文件名: {'seconds', 'peak_rss_mb', 'samples', 'errors'}}
+        """
+        query = ("SELECT f.file, f.status, f.duration, f.peak_rss_mb FROM file_runs f "
+                 "JOIN runs r ON r.run_id = f.run_id WHERE f.status IN ('success', 'error')")
+        params = ()
+        if mode:
+            query += " AND r.mode = ?"
+            params = (mode,)
+        samples = {}
+        for file, status, duration, peak_mb in self.conn.execute(query, params):
+            item = samples.setdefault(file, {'durations': [], 'peak_rss_mb': None, 'errors': 0})
+            if status == "success" and duration is not None:
+                item['durations'].append(duration)
+            elif status == "error":
+                item['errors'] += 1
+            if peak_mb is not None:
+                item['peak_rss_mb'] = max(item['peak_rss_mb'] or 0, peak_mb)
+        return dict((file, {'seconds': _median(item['durations']), 'peak_rss_mb': item['peak_rss_mb'],
+                            'samples': len(item['durations']), 'errors': item['errors']})
+                    for file, item in samples.items())
+
+    def subset_cost(self, patterns, mode=None):
+        """
+        语料子集的成本：按通配符（不区分大小写，匹配文件路径或文件名）汇总预测耗时、峰值内存和失败率
+        :return: [{'pattern', 'files', 'seconds', 'peak_rss_mb', 'error_rate'}]，最后一项为所有子集合计
+        """
+        costs = self.file_costs(mode)
+        rows = []
+        total_files = set()
+        for pattern in patterns:
+            lowered = pattern.lower()
+            matched = [file for file in costs if fnmatch.fnmatch(file.lower(), lowered)
+                       or fnmatch.fnmatch(os.path.basename(file).lower(), lowered)]
+            total_files.update(matched)
+            rows.append(dict(self._cost_row([costs[file] for file in matched]), pattern=pattern))
+        if len(patterns) > 1:
+            rows.append(dict(self._cost_row([costs[file] for file in total_files]), pattern="(合计)"))
+        return rows
+
+    @staticmethod
+    def _cost_row(items):
+        attempts = sum(item['samples'] + item['errors'] for item in items)
+        peaks = [item['peak_rss_mb'] for item in items if item['peak_rss_mb']]
+        return {
+            'files': len(items),
+            'seconds': sum(item['seconds'] for item in items if item['seconds'] is not None),
+            'unknown': sum(1 for item in items if item['seconds'] is None),
+            'peak_rss_mb': max(peaks) if peaks else None,
+            'error_rate': sum(item['errors'] for item in items) / attempts if attempts else None
+        }
+
+    def complexity_fit(self, mode=None):
+        """
+        文件处理耗时与拓扑复杂度的关系：每个文件取成功耗时的中位数和最近一次的拓扑统计，
+        对每个拓扑指标做一元线性拟合 耗时 ≈ a + b·指标，按 R² 从高到低排序；
+        再按 R² 最高的指标分桶，给出每个区间的耗时中位数和最大值，用于设定复杂度预算
+        :return: {'files': 样本数, 'fits': [{'feature', 'intercept', 'slope', 'r2'}],
+                  'feature': 分桶指标, 'buckets': [{'upper', 'files', 'median_seconds', 'max_seconds'}]}；
+                 样本不足时 fits 为空
+        """
+        durations = {}
+        for _, file, duration in self._success_durations(mode):
+            durations.setdefault(file, []).append(duration)
+        latest = {}
+        for row in self.conn.execute(f"SELECT file, {', '.join(TOPOLOGY_FIELDS)} FROM topology ORDER BY ts"):
+            latest[row[0]] = dict(zip(TOPOLOGY_FIELDS, row[1:]))
+        samples = [(latest[file], _median(values)) for file, values in durations.items() if file in latest]
+        result = {'files': len(samples), 'fits': [], 'feature': None, 'buckets': []}
+        if len(samples) < MIN_FIT_FILES:
+            return result
+
+        for field in TOPOLOGY_FIELDS:
+            points = [(stats[field], seconds) for stats, seconds in samples if stats[field] is not None]
+            fit = _linear_fit([x for x, _ in points], [y for _, y in points]) if len(points) >= MIN_FIT_FILES else None
+            if fit is not None:
+                result['fits'].append({'feature': field, 'intercept': fit[0], 'slope': fit[1], 'r2': fit[2],
+                                       'files': len(points)})
+        result['fits'].sort(key=lambda item: item['r2'], reverse=True)
+        if not result['fits']:
+            return result
+
+        feature = result['fits'][0]['feature']
+        points = sorted((stats[feature], seconds) for stats, seconds in samples if stats[feature] is not None)
+        result['feature'] = feature
+        start = 0
+        for quantile in BUDGET_QUANTILES:
+            end = max(start, int(round(len(points) * quantile)))
+            # 相同指标值的文件放在同一个区间
+            while end < len(points) and end > 0 and points[end][0] == points[end - 1][0]:
+                end += 1
+            bucket = [seconds for _, seconds in points[start:end]]
+            if bucket:
+                result['buckets'].append({'upper': points[end - 1][0], 'files': len(bucket),
+                                          'median_seconds': _median(bucket), 'max_seconds': max(bucket)})
+            start = end
+        return result
+
+    def host_summary(self, mode=None):
+        """
+        按主机汇总：运行数、成功/失败文件数、成功耗时中位数和每小时处理的模型数
+        """
+        query = "SELECT host, run_id, duration FROM runs"
+        params = ()
+        if mode:
+            query += " WHERE mode = ?"
+            params = (mode,)
+        hosts = {}
+        run_hosts = {}
+        for host, run_id, duration in self.conn.execute(query, params):
+            item = hosts.setdefault(host or "(未知)", {'runs': 0, 'seconds': 0.0, 'success': 0, 'errors': 0,
+                                                        'durations': []})
+            item['runs'] += 1
+            item['seconds'] += duration or 0
+            run_hosts[run_id] = item
+        for run_id, status, duration in self.conn.execute("SELECT run_id, status, duration FROM file_runs"):
+            item = run_hosts.get(run_id)
+            if item is None:
+                continue
+            if status == "success":
+                item['success'] += 1
+                if duration is not None:
+                    item['durations'].append(duration)
+            elif status == "error":
+                item['errors'] += 1
+        return [{'host': host, 'runs': item['runs'], 'success': item['success'], 'errors': item['errors'],
+                 'median_seconds': _median(item['durations']),
+                 'models_per_hour': item['success'] / item['seconds'] * 3600 if item['seconds'] > 0 else None}
+                for host, item in sorted(hosts.items())]
+
+    def stage_summary(self, mode=None):
+        """
+        各阶段耗时：次数、中位数和总耗时（只有事件文件中有阶段记录）
+        """
+        query = ("SELECT s.stage, s.duration FROM stages s JOIN runs r ON r.run_id = s.run_id "
+                 "WHERE s.duration IS NOT NULL")
+        params = ()
+        if mode:
+            query += " AND r.mode = ?"
+            params = (mode,)
+        stages = {}
+        for stage, duration in self.conn.execute(query, params):
+            stages.setdefault(stage, []).append(duration)
+        return [{'stage': stage, 'count': len(values), 'median_seconds': _median(values), 'seconds': sum(values)}
+                for stage, values in sorted(stages.items())]
+
+    def close(self):
+        self.conn.close()
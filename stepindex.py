@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+持久化的输入文件索引 (SQLite)
+记录路径、大小、修改时间、内容哈希、STEP头信息和最近一次渲染状态
+每次启动用一次 scandir 增量刷新，只有新增或变化的文件才写入数据库
+同一个数据库中的隔离表记录读取失败的文件，内容不变时后续运行直接跳过
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+from stepcorpus import scan_step_files, open_step_stream
+
+# 计算哈希时每次读取的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 只在文件头部查找 FILE_SCHEMA
+HEADER_SCAN_BYTES = 64 * 1024
+
+_SCHEMA_PATTERN = re.compile(rb"FILE_SCHEMA\s*\(\s*\(\s*'([^']*)'")
+
+# 失败阶段 -> 是否为暂时性失败
+# 读取/传输失败由文件内容决定，内容不变就不会成功；渲染/处理失败可能是显示或内存问题，按退避时间重试
+TRANSIENT_STAGES = ("render", "process")
+
+# 暂时性失败的重试退避：第 n 次失败后等待 BASE * 2^(n-1) 秒，最长 MAX 秒
+QUARANTINE_BACKOFF_BASE = 600
+QUARANTINE_BACKOFF_MAX = 7 * 24 * 3600
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    label TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT,
+    schema TEXT,
+    entities INTEGER,
+    render_status TEXT,
+    render_time REAL,
+    rendered_at REAL,
+    peak_rss_mb REAL,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_root ON files (root);
+CREATE TABLE IF NOT EXISTS quarantine (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT,
+    stage TEXT NOT NULL,
+    error TEXT,
+    failures INTEGER NOT NULL,
+    first_failed REAL NOT NULL,
+    last_failed REAL NOT NULL,
+    retry_after REAL
+);
+"""
+
+def read_content_stats(path):
+    """
+    流式读取一次文件，同时计算 SHA-256、STEP 头中的 FILE_SCHEMA 和实体数量（以 # 开头的行数）
+    压缩输入按解压后的内容计算，同一模型不论是否压缩哈希都相同
+    :return: (sha256, schema, entities)
+    """
+    digest = hashlib.sha256()
+    entities = 0
+    schema = None
+    head = b""
+    previous = b"\n"
+    with open_step_stream(path) as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            entities += chunk.count(b"\n#") + (1 if previous == b"\n" and chunk[:1] == b"#" else 0)
+            previous = chunk[-1:]
+            if len(head) < HEADER_SCAN_BYTES:
+                head += chunk[:HEADER_SCAN_BYTES - len(head)]
+
+    match = _SCHEMA_PATTERN.search(head)
+    if match:
+        schema = match.group(1).decode('ascii', 'replace')
+    return digest.hexdigest(), schema, entities
+
+class FileIndex:
+    """
+    输入文件索引，各脚本共用同一个数据库文件
+    """
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_TABLES)
+        # 旧版本创建的数据库没有峰值内存列
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(files)")]
+        if "peak_rss_mb" not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN peak_rss_mb REAL")
+        self.conn.commit()
+        self.last_refresh = None
+
+    def refresh(self, roots, recursive=False):
+        """
+        增量刷新：每个根目录 scandir 一次，与数据库中的记录比较大小和修改时间
+        变化的文件清空哈希、头信息和渲染状态；已删除的文件从索引中移除
+        :return: 与 scan_step_files 相同的 (条目列表 [(路径, 标签)], 冲突列表)
+        """
+        if isinstance(roots, (str, os.PathLike)):
+            roots = [roots]
+
+        now = time.time()
+        entries = []
+        collisions = []
+        seen = {}
+        inserts = []
+        updates = []
+        deletes = []
+        for root in roots:
+            root = str(root)
+            known = dict((path, (size, mtime, label)) for path, size, mtime, label in self.conn.execute(
+                "SELECT path, size, mtime, label FROM files WHERE root = ?", (root,)))
+
+            items, _ = scan_step_files([root], recursive, with_stat=True)
+            for step_path, label, size, mtime in items:
+                if label in seen:
+                    collisions.append((step_path, label, seen[label]))
+                else:
+                    seen[label] = step_path
+                    entries.append((step_path, label))
+
+                old = known.pop(step_path, None)
+                if old is None:
+                    inserts.append((step_path, root, label, size, mtime, now))
+                elif old[0] != size or old[1] != mtime:
+                    updates.append((size, mtime, label, now, step_path))
+                elif old[2] != label:
+                    self.conn.execute("UPDATE files SET label = ? WHERE path = ?", (label, step_path))
+
+            deletes.extend((path,) for path in known)
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (path, root, label, size, mtime, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                inserts)
+            self.conn.executemany(
+                "UPDATE files SET size = ?, mtime = ?, label = ?, indexed_at = ?, sha256 = NULL, schema = NULL, "
+                "entities = NULL, render_status = NULL, render_time = NULL, rendered_at = NULL, peak_rss_mb = NULL "
+                "WHERE path = ?",
+                updates)
+            self.conn.executemany("DELETE FROM files WHERE path = ?", deletes)
+
+        self.last_refresh = {
+            'added': len(inserts),
+            'changed': len(updates),
+            'removed': len(deletes),
+            'total': len(entries)
+        }
+        return entries, collisions
+
+    def get(self, path):
+        """
+        查询单个文件的记录，返回字典；不在索引中时返回 None
+        """
+        cursor = self.conn.execute("SELECT * FROM files WHERE path = ?", (str(path),))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def records(self, roots=None):
+        """
+        列出文件记录（字典列表），可按根目录过滤
+        """
+        query = "SELECT * FROM files"
+        params = ()
+        if roots:
+            roots = [str(root) for root in roots]
+            query += f" WHERE root IN ({','.join('?' * len(roots))})"
+            params = tuple(roots)
+        cursor = self.conn.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def content_stats(self, path):
+        """
+        返回 (sha256, schema, entities)，索引中没有时读取文件计算并保存
+        """
+        row = self.conn.execute("SELECT sha256, schema, entities FROM files WHERE path = ?", (str(path),)).fetchone()
+        if row is not None and row[0] is not None:
+            return row
+        stats = read_content_stats(path)
+        with self.conn:
+            self.conn.execute("UPDATE files SET sha256 = ?, schema = ?, entities = ? WHERE path = ?",
+                              stats + (str(path),))
+        return stats
+
+    def update_content_stats(self, roots=None):
+        """
+        为还没有哈希的文件计算内容统计
+        :return: 计算的文件数
+        """
+        query = "SELECT path FROM files WHERE sha256 IS NULL"
+        params = ()
+        if roots:
+            roots = [str(root) for root in roots]
+            query += f" AND root IN ({','.join('?' * len(roots))})"
+            params = tuple(roots)
+        paths = [row[0] for row in self.conn.execute(query, params)]
+        for path in paths:
+            try:
+                self.content_stats(path)
+            except OSError:
+                continue
+        return len(paths)
+
+    def record_render(self, path, status, render_time=None, peak_rss_mb=None):
+        """
+        记录最近一次渲染状态 (success / error)、耗时和峰值内存，成功时解除隔离
+        """
+        with self.conn:
+            self.conn.execute(
+                "UPDATE files SET render_status = ?, render_time = ?, rendered_at = ?, "
+                "peak_rss_mb = COALESCE(?, peak_rss_mb) WHERE path = ?",
+                (status, render_time, time.time(),
+                 round(peak_rss_mb, 1) if peak_rss_mb is not None else None, str(path)))
+            if status == "success":
+                self.conn.execute("DELETE FROM quarantine WHERE path = ?", (str(path),))
+
+    def seed_costs(self, costs):
+        """
+        用运行历史中的预测值填充还没有渲染记录的文件：耗时和峰值内存，不改变渲染状态
+        按文件路径匹配；旧运行只记录了文件名，只在索引中该文件名唯一时按文件名匹配（同名文件无法区分）
+        :param costs: {文件路径或文件名: {'seconds': 耗时, 'peak_rss_mb': 峰值内存}}
+        :return: 更新的文件数
+        """
+        rows = self.conn.execute("SELECT path, render_time, peak_rss_mb FROM files").fetchall()
+        names = {}
+        for path, _, _ in rows:
+            name = os.path.basename(path)
+            names[name] = names.get(name, 0) + 1
+        updates = []
+        for path, render_time, peak_rss_mb in rows:
+            cost = costs.get(path)
+            if cost is None and names[os.path.basename(path)] == 1:
+                cost = costs.get(os.path.basename(path))
+            if cost is None or (render_time is not None and peak_rss_mb is not None):
+                continue
+            if cost['seconds'] is None and cost['peak_rss_mb'] is None:
+                continue
+            updates.append((cost['seconds'], cost['peak_rss_mb'], path))
+        with self.conn:
+            self.conn.executemany("UPDATE files SET render_time = COALESCE(render_time, ?), "
+                                  "peak_rss_mb = COALESCE(peak_rss_mb, ?) WHERE path = ?", updates)
+        return len(updates)
+
+    def quarantine_file(self, path, stage, error):
+        """
+        记录失败文件：失败阶段、错误信息和输入内容哈希
+        暂时性失败（渲染/处理阶段）按指数退避设置下次重试时间；读取/传输失败在内容变化前不再重试
+        :return: 下次重试时间（None 表示内容变化或手动重试前一直跳过）
+        """
+        path = str(path)
+        try:
+            sha256 = self.content_stats(path)[0]
+        except OSError:
+            sha256 = None
+
+        now = time.time()
+        row = self.conn.execute("SELECT failures, first_failed, sha256 FROM quarantine WHERE path = ?",
+                                (path,)).fetchone()
+        if row is not None and row[2] == sha256:
+            failures, first_failed = row[0] + 1, row[1]
+        else:
+            failures, first_failed = 1, now
+
+        retry_after = None
+        if stage in TRANSIENT_STAGES:
+            retry_after = now + min(QUARANTINE_BACKOFF_BASE * 2 ** (failures - 1), QUARANTINE_BACKOFF_MAX)
+
+        with self.conn:
+            self.conn.execute("UPDATE files SET render_status = 'error', rendered_at = ? WHERE path = ?", (now, path))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO quarantine (path, sha256, stage, error, failures, first_failed, last_failed, "
+                "retry_after) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, sha256, stage, str(error)[:1000], failures, first_failed, now, retry_after))
+        return retry_after
+
+    def check_quarantine(self, path):
+        """
+        判断文件是否应该因隔离而跳过
+        内容哈希已变化（文件被修复或替换）时自动解除隔离；暂时性失败到达重试时间后允许重试
+        :return: 隔离记录字典（应跳过）或 None（应处理）
+        """
+        path = str(path)
+        cursor = self.conn.execute("SELECT * FROM quarantine WHERE path = ?", (path,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        record = dict(zip([column[0] for column in cursor.description], row))
+
+        try:
+            sha256 = self.content_stats(path)[0]
+        except OSError:
+            return record
+        if sha256 != record['sha256']:
+            with self.conn:
+                self.conn.execute("DELETE FROM quarantine WHERE path = ?", (path,))
+            return None
+
+        if record['retry_after'] is not None and record['retry_after'] <= time.time():
+            return None
+        return record
+
+    def list_quarantine(self, roots=None):
+        """
+        列出隔离记录，按最近失败时间倒序
+        """
+        query = "SELECT q.* FROM quarantine q"
+        params = ()
+        if roots:
+            roots = [str(root) for root in roots]
+            query += f" JOIN files f ON f.path = q.path WHERE f.root IN ({','.join('?' * len(roots))})"
+            params = tuple(roots)
+        cursor = self.conn.execute(query + " ORDER BY q.last_failed DESC", params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def release_quarantine(self, paths=None, stage=None):
+        """
+        解除隔离（重试命令）：paths 为空时解除全部，可按失败阶段过滤
+        :return: 解除的文件数
+        """
+        query = "DELETE FROM quarantine WHERE 1 = 1"
+        params = []
+        if paths is not None:
+            paths = [str(path) for path in paths]
+            if not paths:
+                return 0
+            query += f" AND path IN ({','.join('?' * len(paths))})"
+            params.extend(paths)
+        if stage is not None:
+            query += " AND stage = ?"
+            params.append(stage)
+        with self.conn:
+            return self.conn.execute(query, params).rowcount
+
+    def status_counts(self, roots=None):
+        """
+        按最近一次渲染状态统计文件数量，未渲染的记为 None
+        """
+        query = "SELECT render_status, COUNT(*) FROM files"
+        params = ()
+        if roots:
+            roots = [str(root) for root in roots]
+            query += f" WHERE root IN ({','.join('?' * len(roots))})"
+            params = tuple(roots)
+        query += " GROUP BY render_status"
+        return dict(self.conn.execute(query, params).fetchall())
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+建议锁文件 (fcntl.flock)：多个生成进程共用同一个输出目录时按模型加锁划分任务
+锁文件中记录持有者（主机、进程号、时间）；进程退出时内核自动释放锁，
+锁被已退出进程泄漏的描述符占住时按陈旧锁回收
+"""
+
+import os
+import json
+import time
+import errno
+import socket
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl 模块，不加锁
+    fcntl = None
+
+# 输出目录下的锁目录名（以 . 开头，扫描和清理时忽略）
+LOCK_DIR_NAME = ".locks"
+
+# 获取锁时遇到锁文件被替换（回收或释放）的最多重试次数
+LOCK_RETRIES = 3
+
+HOSTNAME = socket.gethostname()
+
+def process_alive(pid, host=None):
+    """
+    判断进程是否仍在运行；其他主机上的进程无法检查，按仍在运行处理
+    """
+    if host is not None and host != HOSTNAME:
+        return True
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+class FileLock:
+    """
+    非阻塞的独占锁：acquire() 拿不到锁时立即返回 False
+    释放时先删除锁文件再关闭描述符，获取后校验锁住的仍是路径上的文件，锁文件不会越积越多
+    """
+    def __init__(self, path):
+        self.path = str(path)
+        self.fd = None
+
+    def owner(self):
+        """
+        读取锁文件中记录的持有者，没有或损坏时返回 None
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def acquire(self):
+        if fcntl is None or self.fd is not None:
+            return True
+
+        lock_dir = os.path.dirname(self.path)
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+        for _ in range(LOCK_RETRIES):
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError as e:
+                examined = os.fstat(fd).st_ino
+                os.close(fd)
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    raise
+                owner = self.owner()
+                if owner is None or process_alive(owner.get('pid', 0), owner.get('host')):
+                    return False
+                # 陈旧锁：持有者已退出，锁由泄漏的描述符占住，换成新的锁文件
+                try:
+                    if os.stat(self.path).st_ino == examined:
+                        os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+                continue
+
+            try:
+                current = os.stat(self.path).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError:
+                current = False
+            if not current:
+                # 锁住的文件已被持有者释放时删除，重新打开
+                os.close(fd)
+                continue
+
+            os.ftruncate(fd, 0)
+            os.write(fd, json.dumps({'host': HOSTNAME, 'pid': os.getpid(),
+                                     'acquired': round(time.time(), 3)}).encode('utf-8'))
+            self.fd = fd
+            return True
+        return False
+
+    def release(self):
+        if self.fd is None:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        os.close(self.fd)
+        self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.release()
+        return False
+
+def model_output_lock(output_dir, label):
+    """
+    模型输出的锁：<输出目录>/.locks/<转义后的标签>.lock
+    """
+    return FileLock(os.path.join(str(output_dir), LOCK_DIR_NAME, quote(label, safe="") + ".lock"))
@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+异步缓冲日志：日志调用只入队，后台写线程批量格式化、写入并 flush
+所有编号脚本（0/1/2/3）以及渲染服务共用
+可选输出结构化 JSONL 事件（文件、阶段、耗时、状态、内存）
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import queue
+import datetime
+import threading
+import multiprocessing
+from pathlib import Path
+
+# 日志级别
+LEVELS = {
+    'DEBUG': 10,
+    'INFO': 20,
+    'WARNING': 30,
+    'ERROR': 40
+}
+
+# 默认级别可通过环境变量调整，例如 STEP2VIEW_LOG_LEVEL=DEBUG 显示每个视角的进度
+DEFAULT_LEVEL = os.environ.get("STEP2VIEW_LOG_LEVEL", "INFO")
+
+# 写线程单次最多合并的消息数
+MAX_BATCH = 1024
+
+_STOP = object()
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+def get_memory_stats():
+    """
+    返回 (当前RSS, 峰值RSS)，单位MB；无法获取时为 None
+    """
+    rss_mb = None
+    peak_mb = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss_pages = int(f.read().split()[1])
+        rss_mb = rss_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为KB，macOS 单位为字节
+        peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+        if rss_mb is None:
+            rss_mb = peak_mb
+
+    return rss_mb, peak_mb
+
+def reset_peak_rss():
+    """
+    重置本进程的峰值RSS（Linux 4.0+ 写 /proc/self/clear_refs），用于按文件测量峰值内存
+    :return: 是否重置成功
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def get_peak_rss_mb():
+    """
+    本进程自上次 reset_peak_rss() 以来的峰值RSS (MB)，读取 /proc/self/status 的 VmHWM；
+    不支持时退回到进程启动以来的峰值
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return get_memory_stats()[1]
+
+def get_process_stats(pid):
+    """
+    其他进程累计使用的CPU时间（秒，用户态+内核态）和当前RSS (MB)，读取 /proc/<pid>/stat；
+    进程已退出或不支持时返回 (None, None)
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # 第2个字段（进程名）可能含空格，从右括号之后开始计数
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+        rss_mb = int(fields[21]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        return cpu_seconds, rss_mb
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None, None
+
+def _parse_level(level):
+    """
+    级别名或数值 -> 数值
+    """
+    if isinstance(level, int):
+        return level
+    if str(level).upper() not in LEVELS:
+        raise ValueError(f"不支持的日志级别: {level}")
+    return LEVELS[str(level).upper()]
+
+class Logger:
+    """
+    日志记录器，同时输出到控制台和文件
+    log() 只把消息放入队列，由后台线程批量写入，避免每行一次 print + flush
+    log_dir 为 None 时只输出到控制台
+    events=True 时同时写出 <prefix>_<时间戳>.events.jsonl 结构化事件
+    """
+    def __init__(self, log_dir="step2viewdata/processlog_debug", prefix="multiview", level=None,
+                 time_format="%H:%M:%S", console=True, flush_interval=0.2, events=False):
+        self.level = _parse_level(level or DEFAULT_LEVEL)
+        self.time_format = time_format
+        self.console = console
+        self.flush_interval = flush_interval
+        self.log_dir = None
+        self.log_file = None
+        self.log_handle = None
+        self.events_file = None
+        self.events_handle = None
+
+        if log_dir is not None:
+            self.log_dir = Path(log_dir)
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+
+            # 创建日志文件名（包含时间戳）
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.log_file = self.log_dir / f"{prefix}_{timestamp}.log"
+
+            # 打开日志文件（由写线程统一 flush）
+            self.log_handle = open(self.log_file, 'w', encoding='utf-8')
+
+            if events:
+                self.events_file = self.log_dir / f"{prefix}_{timestamp}.events.jsonl"
+                self.events_handle = open(self.events_file, 'w', encoding='utf-8')
+            self.run_id = f"{timestamp}_{os.getpid()}"
+        else:
+            self.run_id = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        self.host = socket.gethostname()
+        self.listeners = []
+
+        self.queue = queue.Queue()
+        self.wake = threading.Event()
+        self.mp_queue = None
+        self.pump_thread = None
+        self.closed = False
+
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="log-writer", daemon=True)
+        self.writer_thread.start()
+
+        # 记录开始时间
+        self.start_time = datetime.datetime.now()
+        if self.log_file is not None:
+            self.log(f"日志开始时间: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
+            self.log(f"日志文件: {self.log_file}")
+            self.log("-" * 60)
+
+    def log(self, message, level="INFO"):
+        """
+        记录日志消息（低于当前级别的消息直接丢弃）
+        """
+        if LEVELS.get(level, 20) < self.level or self.closed:
+            return
+        self.queue.put((time.time(), message))
+
+    def debug(self, message):
+        self.log(message, "DEBUG")
+
+    def info(self, message):
+        self.log(message, "INFO")
+
+    def warning(self, message):
+        self.log(message, "WARNING")
+
+    def error(self, message):
+        self.log(message, "ERROR")
+
+    def add_listener(self, listener):
+        """
+        注册事件监听函数 listener(event_type, fields)，在调用 event() 的线程中同步调用（即使不写事件文件）
+        """
+        self.listeners.append(listener)
+
+    def event(self, event_type, **fields):
+        """
+        记录一条结构化事件，自动附加时间、运行ID、主机和内存占用
+        """
+        for listener in self.listeners:
+            listener(event_type, fields)
+        if self.events_handle is None or self.closed:
+            return
+        rss_mb, peak_mb = get_memory_stats()
+        record = {
+            'ts': round(time.time(), 3),
+            'run_id': self.run_id,
+            'host': self.host,
+            'event': event_type
+        }
+        record.update(fields)
+        record.setdefault('rss_mb', round(rss_mb, 1) if rss_mb is not None else None)
+        record.setdefault('peak_rss_mb', round(peak_mb, 1) if peak_mb is not None else None)
+        self.queue.put(record)
+
+    def is_enabled(self, level):
+        """
+        判断某个级别是否会被记录，用于跳过昂贵的消息拼接
+        """
+        return LEVELS[level] >= self.level
+
+    def flush(self):
+        """
+        等待队列中已有的消息全部写出（交互式 input() 之前调用，保证提示顺序）
+        """
+        if self.closed:
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        self.wake.set()
+        done.wait()
+
+    def process_queue(self):
+        """
+        返回可以传给子进程的日志队列，子进程用 QueueLogger 写日志
+        消息由主进程的转发线程并入同一个写线程，保证多进程写入安全且不交错
+        """
+        if self.mp_queue is None:
+            ctx = multiprocessing.get_context("spawn")
+            self.mp_queue = ctx.Queue()
+            self.pump_thread = threading.Thread(target=self._pump_loop, name="log-pump", daemon=True)
+            self.pump_thread.start()
+        return self.mp_queue
+
+    def _pump_loop(self):
+        """
+        把子进程的消息转入本进程队列
+        """
+        while True:
+            item = self.mp_queue.get()
+            if item is None:
+                break
+            if isinstance(item, dict):
+                if self.events_handle is None:
+                    continue
+                item.setdefault('run_id', self.run_id)
+                item.setdefault('host', self.host)
+            self.queue.put(item)
+
+    def _writer_loop(self):
+        """
+        后台写线程：取出一批消息，一次写入控制台和文件，一次 flush
+        """
+        last_second = None
+        last_stamp = ""
+
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            events = []
+            waiters = []
+            stop = False
+            for item in batch:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                elif isinstance(item, dict):
+                    events.append(json.dumps(item, ensure_ascii=False) + "\n")
+                else:
+                    created, message = item
+                    second = int(created)
+                    if second != last_second:
+                        last_second = second
+                        last_stamp = datetime.datetime.fromtimestamp(created).strftime(self.time_format)
+                    lines.append(f"[{last_stamp}] {message}\n")
+
+            if lines:
+                text = "".join(lines)
+                if self.console:
+                    sys.stdout.write(text)
+                    sys.stdout.flush()
+                if self.log_handle is not None:
+                    self.log_handle.write(text)
+                    self.log_handle.flush()
+            if events and self.events_handle is not None:
+                self.events_handle.write("".join(events))
+                self.events_handle.flush()
+
+            for waiter in waiters:
+                waiter.set()
+
+            if stop:
+                return
+
+            # 短暂等待让更多消息聚成一批；flush()/close() 会立即唤醒
+            if not waiters:
+                self.wake.wait(self.flush_interval)
+            self.wake.clear()
+
+    def close(self):
+        """
+        关闭日志文件
+        """
+        if self.closed:
+            return
+
+        if self.log_file is not None:
+            end_time = datetime.datetime.now()
+            duration = end_time - self.start_time
+
+            self.log("-" * 60)
+            self.log(f"日志结束时间: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
+            self.log(f"总耗时: {duration}")
+            self.log(f"日志文件保存位置: {self.log_file}")
+
+        if self.mp_queue is not None:
+            self.mp_queue.put(None)
+            self.pump_thread.join()
+
+        self.closed = True
+        self.queue.put(_STOP)
+        self.wake.set()
+        self.writer_thread.join()
+
+        if self.log_handle is not None:
+            self.log_handle.close()
+        if self.events_handle is not None:
+            self.events_handle.close()
+
+class QueueLogger:
+    """
+    子进程中使用的日志代理，接口与 Logger 相同
+    """
+    def __init__(self, mp_queue, level=None):
+        self.mp_queue = mp_queue
+        self.level = _parse_level(level or DEFAULT_LEVEL)
+
+    def log(self, message, level="INFO"):
+        if LEVELS.get(level, 20) < self.level:
+            return
+        self.mp_queue.put((time.time(), message))
+
+    def debug(self, message):
+        self.log(message, "DEBUG")
+
+    def info(self, message):
+        self.log(message, "INFO")
+
+    def warning(self, message):
+        self.log(message, "WARNING")
+
+    def error(self, message):
+        self.log(message, "ERROR")
+
+    def event(self, event_type, **fields):
+        """
+        子进程事件：内存占用在子进程内测量，运行ID等由主进程补齐
+        """
+        rss_mb, peak_mb = get_memory_stats()
+        record = {'ts': round(time.time(), 3), 'event': event_type, 'pid': os.getpid()}
+        record.update(fields)
+        record.setdefault('rss_mb', round(rss_mb, 1) if rss_mb is not None else None)
+        record.setdefault('peak_rss_mb', round(peak_mb, 1) if peak_mb is not None else None)
+        self.mp_queue.put(record)
+
+    def is_enabled(self, level):
+        return LEVELS[level] >= self.level
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+轻量指标库：计数器、仪表和直方图，输出 Prometheus 文本格式
+MetricsExporter 在本地端口提供 /metrics 并定期写出文本文件（node_exporter textfile 格式），
+BatchMetrics 为生成工具批处理运行的实时指标
+"""
+
+import os
+import time
+import threading
+import collections
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from steplogger import get_memory_stats
+
+# 默认耗时直方图分桶（秒）
+DEFAULT_TIME_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+
+# 文本文件的默认写出间隔（秒）
+DEFAULT_EXPORT_INTERVAL = 10.0
+
+# 计算 视角/秒 的滑动窗口（秒）
+RATE_WINDOW = 60.0
+
+def _format_labels(labels):
+    """
+    将标签字典格式化为 {k="v",...}
+    """
+    if not labels:
+        return ""
+    items = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return "{" + items + "}"
+
+class Counter:
+    """
+    单调递增计数器，支持按标签分组
+    """
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, dict(key), value) for key, value in self.values.items()]
+
+class Gauge(Counter):
+    """
+    可增可减的仪表，也可以绑定一个取值函数
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help_text, func=None):
+        super().__init__(name, help_text)
+        self.func = func
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.func is not None:
+            return [(self.name, {}, self.func())]
+        return super().samples()
+
+class Histogram:
+    """
+    累积分桶直方图
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_TIME_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        result = []
+        with self.lock:
+            for key, (counts, total, count) in self.series.items():
+                labels = dict(key)
+                for bound, bucket_count in zip(self.buckets, counts):
+                    result.append((f"{self.name}_bucket", dict(labels, le=bound), bucket_count))
+                result.append((f"{self.name}_bucket", dict(labels, le="+Inf"), count))
+                result.append((f"{self.name}_sum", labels, total))
+                result.append((f"{self.name}_count", labels, count))
+        return result
+
+class MetricsRegistry:
+    """
+    指标注册表，负责生成 Prometheus 文本
+    """
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text):
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name, help_text, func=None):
+        return self._register(Gauge(name, help_text, func))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_TIME_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render_prometheus(self):
+        """
+        生成 Prometheus 文本格式 (text/plain; version=0.0.4)
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """
+    只提供 GET /metrics
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class MetricsExporter:
+    """
+    指标导出：port 不为 None 时在 host:port 提供 /metrics（后台线程），
+    textfile 不为 None 时每 interval 秒原子写出一次（先写临时文件再重命名），stop() 时再写一次最终值
+    """
+    def __init__(self, registry, port=None, host="127.0.0.1", textfile=None, interval=DEFAULT_EXPORT_INTERVAL):
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self.textfile = textfile
+        self.interval = interval
+        self.server = None
+        self.threads = []
+        self.stopping = threading.Event()
+
+    def start(self):
+        if self.port is not None:
+            self.server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+            self.server.daemon_threads = True
+            self.server.registry = self.registry
+            self.port = self.server.server_address[1]
+            self.threads.append(threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True))
+        if self.textfile is not None:
+            textfile_dir = os.path.dirname(os.path.abspath(self.textfile))
+            os.makedirs(textfile_dir, exist_ok=True)
+            self.threads.append(threading.Thread(target=self._textfile_loop, name="metrics-textfile", daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def write_textfile(self):
+        tmp_path = f"{self.textfile}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.registry.render_prometheus())
+        os.replace(tmp_path, self.textfile)
+
+    def _textfile_loop(self):
+        while True:
+            try:
+                self.write_textfile()
+            except OSError:
+                pass
+            if self.stopping.wait(self.interval):
+                break
+
+    def stop(self):
+        self.stopping.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        if self.textfile is not None:
+            self.write_textfile()
+
+class BatchMetrics:
+    """
+    批处理运行的实时指标
+    文件结果由 file_done() 记录；各阶段耗时来自日志事件（add_listener(observe_event)），
+    进度停滞可以用 last_progress_timestamp 判断
+    """
+    def __init__(self, views_per_model=36):
+        self.views_per_model = views_per_model
+        self.registry = MetricsRegistry()
+        registry = self.registry
+        self.files = registry.counter("step2view_batch_files_total", "已完成的文件数（按状态）")
+        self.expected = registry.gauge("step2view_batch_files_expected", "本次运行的文件总数")
+        self.queue_depth = registry.gauge("step2view_batch_queue_depth", "尚未完成的文件数（含正在渲染的）")
+        self.in_flight = registry.gauge("step2view_batch_in_flight", "正在渲染的文件数")
+        self.limit = registry.gauge("step2view_batch_concurrency_limit", "资源调度器当前的并发上限（--method 4）")
+        self.views = registry.counter("step2view_batch_views_total", "已生成的视角图片数")
+        registry.gauge("step2view_batch_views_per_second", f"最近{RATE_WINDOW:.0f}秒的平均 视角/秒",
+                       func=self.views_per_second)
+        self.file_seconds = registry.histogram("step2view_batch_file_seconds", "单个文件的处理耗时（按状态）")
+        self.stage_seconds = registry.histogram("step2view_batch_stage_seconds", "各处理阶段的耗时")
+        self.cache = registry.counter("step2view_batch_cache_lookups_total",
+                                      "缓存查找次数: index 文件索引, output 已有输出, checkpoint 检查点")
+        self.hit_ratio = registry.gauge("step2view_batch_cache_hit_ratio", "各缓存的命中率")
+        registry.gauge("step2view_batch_memory_rss_mb", "主进程当前RSS (MB)", func=lambda: get_memory_stats()[0] or 0)
+        self.worker_rss = registry.gauge("step2view_batch_worker_rss_mb", "所有渲染进程的RSS之和 (MB)")
+        self.started = registry.gauge("step2view_batch_start_timestamp_seconds", "运行开始时间")
+        self.last_progress = registry.gauge("step2view_batch_last_progress_timestamp_seconds",
+                                            "最近一个文件完成的时间，长时间不变说明处理停滞")
+        self.started.set(round(time.time(), 3))
+        self.recent_views = collections.deque()
+        self.lock = threading.Lock()
+
+    def views_per_second(self):
+        now = time.time()
+        with self.lock:
+            while self.recent_views and self.recent_views[0][0] < now - RATE_WINDOW:
+                self.recent_views.popleft()
+            total = sum(count for _, count in self.recent_views)
+        elapsed = min(RATE_WINDOW, now - self.started.get())
+        return round(total / elapsed, 3) if elapsed > 0 else 0.0
+
+    def cache_lookup(self, cache, hits=0, misses=0):
+        if hits:
+            self.cache.inc(hits, cache=cache, result="hit")
+        if misses:
+            self.cache.inc(misses, cache=cache, result="miss")
+        hit_count = self.cache.get(cache=cache, result="hit")
+        total = hit_count + self.cache.get(cache=cache, result="miss")
+        if total:
+            self.hit_ratio.set(round(hit_count / total, 4), cache=cache)
+
+    def file_done(self, status, seconds=None):
+        """
+        记录一个文件的结果：success / error / skipped（已有输出）/ resumed（检查点）/ locked（其他进程处理中）
+        """
+        now = time.time()
+        self.files.inc(status=status)
+        self.queue_depth.dec()
+        if status in ("skipped", "success"):
+            self.cache_lookup("output", hits=int(status == "skipped"), misses=int(status == "success"))
+        elif status == "resumed":
+            self.cache_lookup("checkpoint", hits=1)
+        if seconds is not None:
+            self.file_seconds.observe(seconds, status=status)
+        if status == "success":
+            self.views.inc(self.views_per_model)
+            with self.lock:
+                self.recent_views.append((now, self.views_per_model))
+        self.last_progress.set(round(now, 3))
+
+    def observe_event(self, event_type, fields):
+        """
+        日志事件监听：带耗时的阶段事件计入阶段耗时直方图，调度事件更新并发上限
+        """
+        if event_type == "stage" and fields.get('duration') is not None and fields.get('stage') != "file":
+            self.stage_seconds.observe(fields['duration'], stage=fields['stage'])
+        elif event_type == "governor" and fields.get('limit') is not None:
+            self.limit.set(fields['limit'])
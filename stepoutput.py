@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+输出目录约定：每个模型子目录的渲染清单 (.render.json)
+模型输出先写入 <输出目录>/.staging/ 下的临时目录，视角齐全后整体原子重命名到最终位置
+不依赖 OCC，可被清理脚本直接使用
+"""
+
+import os
+import json
+import shutil
+import datetime
+import tempfile
+from stepcorpus import input_stat, split_archive_path, ARCHIVE_SEPARATOR
+from steplock import process_alive, HOSTNAME
+
+# 每个模型输出子目录中的渲染清单文件名
+MANIFEST_NAME = ".render.json"
+
+# 输出目录下的暂存目录名（以 . 开头，扫描和清理时忽略）
+STAGING_DIR_NAME = ".staging"
+
+# 影响输出结果的渲染参数，变化后旧的输出视为过期
+RENDER_PARAMS = {
+    'views': 36,
+    'sampling': "fibonacci_sphere",
+    'format': "jpeg"
+}
+
+# 记录画面布局的参数：只写在拼图渲染的清单中（网格列数和行数），不影响单个模型的图片，比较参数是否变化时不计入
+# 投影方式 projection 影响图片本身，是正常的渲染参数：拼图渲染（正交投影）写入，逐个渲染（透视投影）不写入
+LAYOUT_PARAMS = ("tile",)
+
+def current_render_params(views=None, size=None, projection=None, tile=None):
+    """
+    当前渲染参数（返回副本）
+    指定视角数或窗口大小（基准测试）时覆盖默认值；默认窗口大小不写入参数，已有输出不会因此过期
+    projection / tile 为拼图渲染的投影方式和网格 (列数, 行数)，逐个渲染（透视投影）时不写入；
+    投影方式不同的输出互相视为过期
+    """
+    params = dict(RENDER_PARAMS)
+    if views:
+        params['views'] = views
+    if size:
+        params['size'] = list(size)
+    if projection:
+        params['projection'] = projection
+    if tile:
+        params['tile'] = list(tile)
+    return params
+
+def write_render_manifest(output_subdir, step_path, render_time, shapes=None, params=None):
+    """
+    渲染成功后写入清单：记录输入文件的绝对路径（压缩包成员写成 压缩包!成员）、大小和修改时间、渲染参数和耗时
+    """
+    size, mtime = input_stat(step_path)
+    archive, member = split_archive_path(step_path)
+    source_path = os.path.abspath(archive)
+    if member is not None:
+        source_path += ARCHIVE_SEPARATOR + member
+    manifest = {
+        'source': os.path.basename(step_path),
+        'source_path': source_path,
+        'source_size': size,
+        'source_mtime': mtime,
+        'params': params or current_render_params(),
+        'shapes': shapes,
+        'render_time': round(render_time, 3),
+        'rendered_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(os.path.join(output_subdir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return manifest
+
+def read_render_manifest(output_subdir):
+    """
+    读取渲染清单，不存在或损坏时返回 None
+    """
+    try:
+        with open(os.path.join(output_subdir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def count_view_files(output_subdir):
+    """
+    统计模型子目录中的视角图片数量
+    """
+    try:
+        return sum(1 for entry in os.scandir(output_subdir) if entry.name.endswith(".jpeg"))
+    except OSError:
+        return 0
+
+def check_model_output(output_subdir, step_path, params=None):
+    """
+    判断模型输出是否仍然有效
+    :return: (状态, 原因)，状态为 valid / stale / unverified
+      valid      - 清单与输入文件、渲染参数一致且视角齐全
+      stale      - 输入已变化、参数已变化或视角不全
+      unverified - 没有清单（旧版本生成的输出），视角齐全
+    """
+    params = params or current_render_params()
+    views = count_view_files(output_subdir)
+    if views < params['views']:
+        return "stale", f"视角不全 ({views}/{params['views']})"
+
+    manifest = read_render_manifest(output_subdir)
+    if manifest is None:
+        return "unverified", "没有渲染清单"
+
+    recorded = {key: value for key, value in (manifest.get('params') or {}).items() if key not in LAYOUT_PARAMS}
+    if recorded != {key: value for key, value in params.items() if key not in LAYOUT_PARAMS}:
+        return "stale", "渲染参数已变化"
+
+    try:
+        size, mtime = input_stat(step_path)
+    except (OSError, KeyError):
+        return "stale", "输入文件不可访问"
+    if size != manifest.get('source_size') or abs(mtime - manifest.get('source_mtime', 0)) > 1e-3:
+        return "stale", "输入文件已变化"
+
+    return "valid", ""
+
+def find_model_output_dirs(output_dir, prefix=""):
+    """
+    找出输出目录中的模型目录，返回 [(标签, 目录)]
+    含有视角图片或渲染清单的目录是模型目录，其余子目录视为类别命名空间继续向下查找
+    """
+    model_dirs = []
+    for entry in os.scandir(output_dir):
+        if not entry.is_dir(follow_symlinks=False) or entry.name.startswith("."):
+            continue
+        label = prefix + entry.name
+        with os.scandir(entry.path) as it:
+            children = list(it)
+        if any(child.is_file() and (child.name.endswith(".jpeg") or child.name == MANIFEST_NAME)
+               for child in children):
+            model_dirs.append((label, entry.path))
+        elif any(child.is_dir(follow_symlinks=False) for child in children):
+            model_dirs.extend(find_model_output_dirs(entry.path, label + "/"))
+        else:
+            # 空目录（例如渲染前就中断）按模型目录处理
+            model_dirs.append((label, entry.path))
+    return model_dirs
+
+def staging_root(output_dir):
+    """
+    输出目录对应的暂存目录
+    """
+    return os.path.join(str(output_dir), STAGING_DIR_NAME)
+
+def cleanup_stale_staging(output_dir):
+    """
+    删除已退出进程遗留的暂存目录（崩溃或中断时留下的不完整输出）
+    其他主机上的进程无法检查，它们的暂存目录保留
+    :return: 删除的目录数
+    """
+    root = staging_root(output_dir)
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    for entry in os.scandir(root):
+        pid, _, host = entry.name.rsplit("-", 1)[0].partition("@")
+        if pid.isdigit() and process_alive(int(pid), host or None):
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        removed += 1
+    return removed
+
+class ModelOutputStaging:
+    """
+    单个模型输出的暂存：视角图片和清单写入暂存目录，commit() 时检查视角齐全后
+    整个目录原子重命名为最终的模型目录；未提交就退出 with 块（失败、异常或中断）时删除暂存目录，
+    因此最终位置上只会出现完整的视角集合
+    """
+    def __init__(self, output_dir, output_subdir):
+        self.output_subdir = str(output_subdir)
+        root = staging_root(output_dir)
+        os.makedirs(root, exist_ok=True)
+        # 目录名以 进程号@主机名 开头，便于清理已退出进程遗留的暂存目录
+        self.path = tempfile.mkdtemp(prefix=f"{os.getpid()}@{HOSTNAME}-", dir=root)
+        self.committed = False
+
+    def img_name(self, stem):
+        """
+        暂存目录中的视角图片基本名称（交给 animate_viewpoint2）
+        """
+        return os.path.join(self.path, f"{stem}.jpeg")
+
+    def commit(self, views=None):
+        """
+        视角齐全时把暂存目录重命名为最终的模型目录（已有的旧输出被替换）
+        """
+        views = views or RENDER_PARAMS['views']
+        count = count_view_files(self.path)
+        if count < views:
+            raise RuntimeError(f"视角不全 ({count}/{views})")
+
+        os.makedirs(os.path.dirname(self.output_subdir) or ".", exist_ok=True)
+        old_path = None
+        if os.path.lexists(self.output_subdir):
+            old_path = self.path + ".old"
+            os.rename(self.output_subdir, old_path)
+        os.rename(self.path, self.output_subdir)
+        self.committed = True
+        if old_path is not None:
+            shutil.rmtree(old_path, ignore_errors=True)
+
+    def discard(self):
+        """
+        删除暂存目录
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if not self.committed:
+            self.discard()
+        return False
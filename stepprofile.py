@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按文件的性能分析：每个文件的处理过程单独分析，只保留耗时超过阈值或历史分位数的文件，
+保存为 .prof（cProfile，可用 snakeviz / pstats 查看）和火焰图用的折叠调用栈 (.collapsed，
+可直接交给 flamegraph.pl / speedscope)
+未启用时 start()/stop() 直接返回，几乎没有开销
+"""
+
+import os
+import bisect
+import cProfile
+import pstats
+import datetime
+from urllib.parse import quote
+
+try:
+    import pyinstrument
+except ImportError:  # 可选的采样分析器，没有安装时只能用 cProfile
+    pyinstrument = None
+
+# 分析方法：auto 在安装了 pyinstrument 时使用采样分析，否则使用 cProfile
+PROFILE_METHODS = ("auto", "cprofile", "sample")
+
+# 未指定阈值和分位数时，保留耗时超过该历史分位数的文件
+DEFAULT_PERCENTILE = 95.0
+
+# 按分位数判断前至少需要的文件数
+MIN_PERCENTILE_SAMPLES = 20
+
+# 每个进程最多保留的分析结果数（只保留最慢的）
+DEFAULT_KEEP = 20
+
+# 采样分析的采样间隔（秒）
+SAMPLE_INTERVAL = 0.001
+
+# 折叠调用栈的最大深度，以及忽略的过小分支（秒）
+MAX_STACK_DEPTH = 128
+MIN_BRANCH_SECONDS = 1e-5
+
+def profile_dir(log_dir):
+    """
+    日志目录下本次运行的分析结果目录
+    """
+    return os.path.join(str(log_dir), f"profiles_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+def _frame_name(func):
+    filename, lineno, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+def collapse_pstats(stats):
+    """
+    把 cProfile 的调用关系图展开成折叠调用栈 {"a;b;c": 自身耗时微秒}
+    同一函数被多个调用者调用时，按每条调用边的累计时间比例分摊
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    roots = [func for func, (_, _, _, _, callers) in stats.items() if not callers]
+
+    stacks = {}
+    def walk(func, path, names, scale):
+        _, _, tottime, cumtime, _ = stats[func]
+        own = tottime * scale
+        if own >= MIN_BRANCH_SECONDS:
+            key = ";".join(names)
+            stacks[key] = stacks.get(key, 0) + int(own * 1e6)
+        if len(names) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            callee_cumtime = stats[callee][3]
+            if callee in path or callee_cumtime <= 0 or edge_time * scale < MIN_BRANCH_SECONDS:
+                continue
+            path.add(callee)
+            walk(callee, path, names + [_frame_name(callee)], scale * edge_time / callee_cumtime)
+            path.discard(callee)
+
+    for root in roots:
+        walk(root, {root}, [_frame_name(root)], 1.0)
+    return stacks
+
+def collapse_pyinstrument(session):
+    """
+    把 pyinstrument 的采样记录转换为折叠调用栈 {"a;b;c": 耗时微秒}
+    """
+    stacks = {}
+    for frame_infos, duration in session.frame_records:
+        names = []
+        for frame_info in frame_infos:
+            name, _, rest = frame_info.split("\x01", 1)[0].partition("\x00")
+            filename, _, lineno = rest.partition("\x00")
+            names.append(f"{name} ({os.path.basename(filename)}:{lineno})" if filename else name)
+        key = ";".join(names)
+        stacks[key] = stacks.get(key, 0) + int(duration * 1e6)
+    return stacks
+
+def write_collapsed(stacks, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for key, value in sorted(stacks.items()):
+            if value > 0:
+                f.write(f"{key} {value}\n")
+
+class FileProfiler:
+    """
+    按文件的性能分析器
+    output_dir 为 None 时不启用；threshold 为耗时阈值（秒），percentile 为历史分位数，
+    两者都未指定时按 DEFAULT_PERCENTILE 判断；最多保留 keep 个最慢文件的结果
+    """
+    def __init__(self, output_dir=None, method="auto", threshold=None, percentile=None, keep=DEFAULT_KEEP):
+        self.enabled = output_dir is not None
+        self.output_dir = output_dir
+        if method == "auto":
+            method = "sample" if pyinstrument is not None else "cprofile"
+        if method == "sample" and pyinstrument is None:
+            raise ValueError("采样分析需要安装 pyinstrument (pip install pyinstrument)")
+        self.method = method
+        self.threshold = threshold
+        self.percentile = percentile if percentile is not None or threshold is not None else DEFAULT_PERCENTILE
+        self.keep = keep
+        self.active = None
+        self.times = []
+        # [(耗时, 标签, [文件路径])]，按耗时升序
+        self.kept = []
+
+    def options(self):
+        """
+        传给渲染工作进程的参数
+        """
+        return {'output_dir': self.output_dir, 'method': self.method, 'threshold': self.threshold,
+                'percentile': self.percentile, 'keep': self.keep}
+
+    def start(self):
+        if not self.enabled:
+            return
+        if self.method == "sample":
+            self.active = pyinstrument.Profiler(interval=SAMPLE_INTERVAL)
+            self.active.start()
+        else:
+            self.active = cProfile.Profile()
+            self.active.enable()
+
+    def _should_keep(self, elapsed):
+        if self.threshold is not None and elapsed >= self.threshold:
+            return True
+        if self.percentile is not None and len(self.times) >= MIN_PERCENTILE_SAMPLES:
+            rank = min(int(len(self.times) * self.percentile / 100.0), len(self.times) - 1)
+            return elapsed >= self.times[rank]
+        return False
+
+    def stop(self, label, elapsed, status="success"):
+        """
+        结束一个文件的分析；status 为 skipped 的文件不计入分位数
+        :return: 保存的文件路径列表，未保存时为 None
+        """
+        if self.active is None:
+            return None
+        profiler, self.active = self.active, None
+        if self.method == "sample":
+            profiler.stop()
+        else:
+            profiler.disable()
+        if status == "skipped":
+            return None
+
+        bisect.insort(self.times, elapsed)
+        if not self._should_keep(elapsed):
+            return None
+        if len(self.kept) >= self.keep:
+            if elapsed <= self.kept[0][0]:
+                return None
+            for path in self.kept.pop(0)[2]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{quote(str(label), safe='')}_{elapsed:.1f}s")
+        paths = []
+        if self.method == "sample":
+            session = profiler.last_session
+            paths.append(base + ".pyisession")
+            session.save(paths[-1])
+            stacks = collapse_pyinstrument(session)
+        else:
+            paths.append(base + ".prof")
+            profiler.dump_stats(paths[-1])
+            stacks = collapse_pstats(pstats.Stats(profiler).stats)
+        paths.append(base + ".collapsed")
+        write_collapsed(stacks, paths[-1])
+        bisect.insort(self.kept, (elapsed, str(label), paths))
+        return paths
+
+    def summary(self):
+        """
+        保留的分析结果，按耗时从高到低 [(耗时, 标签, [文件路径])]
+        """
+        return list(reversed(self.kept))
@@ -0,0 +1,501 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多视角渲染核心：STEP读取、斐波那契球面视角和常驻渲染器
+供 0step2multiviewAddlog.py 和 4renderService.py 共用
+"""
+
+import math
+import os
+import gc
+import time
+import tempfile
+import importlib
+import traceback
+import contextlib
+import numpy
+from OCC.Core.STEPControl import STEPControl_Reader
+from OCC.Core.IFSelect import IFSelect_RetDone, IFSelect_ItemsByEntity
+from OCC.Core.Bnd import Bnd_Box
+from OCC.Core.BRepBndLib import brepbndlib
+from OCC.Core.gp import gp_Pnt, gp_Vec, gp_Trsf
+from OCC.Core.Image import Image_AlienPixMap
+from OCC.Display.SimpleGui import init_display
+from stepcorpus import staged_step_file, step_stem
+from stepoutput import ModelOutputStaging, write_render_manifest, current_render_params
+from steplogger import reset_peak_rss, get_peak_rss_mb, QueueLogger
+from stepprofile import FileProfiler
+from steptopology import topology_stats
+
+# 依次尝试的显示后端
+DISPLAY_BACKENDS = ["pyqt5", "pyqt6", "pyside2"]
+
+# 显示后端对应的Qt图像模块（拼图渲染时用 QImage 切分格子）
+QT_GUI_MODULES = {"pyqt5": "PyQt5.QtGui", "pyqt6": "PyQt6.QtGui", "pyside2": "PySide2.QtGui"}
+
+# init_display 的默认窗口大小 (宽, 高)
+DEFAULT_WINDOW_SIZE = (1024, 768)
+
+# 拼图渲染时模型与格子边缘的留白比例（与 FitAll 的默认留白相同）
+FIT_MARGIN = 0.01
+
+# 参与拼图渲染的STEP文件大小上限 (KB)
+DEFAULT_TILE_MAX_KB = 200
+
+# 拼图渲染使用的投影方式（逐个渲染为后端默认的透视投影），写入清单的渲染参数，
+# 画面没有透视缩短，与逐个渲染的图片不同，两种输出在比较参数时互相视为过期
+TILED_PROJECTION = "orthographic"
+
+class StepReadError(Exception):
+    """
+    STEP文件读取失败，stage 记录失败阶段 (read / transfer)
+    """
+    def __init__(self, message, stage="read"):
+        super().__init__(message)
+        self.stage = stage
+
+def fibonacci_sphere(samples=36, distance=5):
+    """
+    :param samples: number of views
+    :param distance: distance from the center of the object
+    :return: # samples points of view around the model
+    """
+    points = []
+    phi = math.pi * (3. - math.sqrt(5.))  # golden angle in radians
+    for i in range(samples):
+        y = (1 - (i / float(samples - 1)) * 2) * distance   # y goes from 1 to -1
+        radius = math.sqrt(distance * distance - y * y)  # radius at y
+        theta = phi * i  # golden angle increment
+        x = math.cos(theta) * radius
+        z = math.sin(theta) * radius
+        points.append((x, y, z))
+
+    return points
+
+def animate_viewpoint2(display, img_name, logger=None, views=36):
+    """
+    :param img_name: save name of the view
+    :param logger: 日志记录器
+    :param views: 视角数
+    """
+    if logger:
+        logger.debug("开始生成多视角图片...")
+
+    display.FitAll()
+    display.Context.UpdateCurrentViewer()
+
+    cam = display.View.Camera()  # type: Graphic3d_Camera
+
+    center = cam.Center()
+    eye = cam.Eye()
+
+    display.View.FitAll()
+    eye_ = numpy.array([eye.X(), eye.Y(), eye.Z()])
+    center_ = numpy.array([center.X(), center.Y(), center.Z()])
+    distance = numpy.linalg.norm(eye_ - center_)
+
+    points = fibonacci_sphere(samples=views, distance=distance)
+
+    for i, point in enumerate(points):
+        eye.SetX(point[0]+center_[0])
+        eye.SetY(point[1]+center_[1])
+        eye.SetZ(point[2]+center_[2])
+        cam.SetEye(eye)
+
+        display.View.FitAll()
+        display.Context.UpdateCurrentViewer()
+        name = img_name.replace(".jpeg", "_"+str(i)+".jpeg")
+        display.View.Dump(name)
+
+        # 每10个视角记录一次进度；渲染进程中经队列发送，未启用 DEBUG 时跳过
+        if logger and (i + 1) % 10 == 0 and logger.is_enabled("DEBUG"):
+            logger.debug(f"  生成进度: {i+1}/{views}")
+
+def _qimage_class(backend):
+    """
+    显示后端对应的 QImage 类
+    """
+    return importlib.import_module(QT_GUI_MODULES[backend]).QImage
+
+def _bounding_box(shape):
+    """
+    形状的包围盒 (xmin, ymin, zmin, xmax, ymax, zmax)
+    """
+    box = Bnd_Box()
+    brepbndlib.Add(shape, box)
+    return box.Get()
+
+def tile_grid(count):
+    """
+    count 个模型的拼图网格 (列数, 行数)，接近正方形
+    """
+    cols = int(math.ceil(math.sqrt(count)))
+    return cols, int(math.ceil(count / cols))
+
+def _tile_transform(box, right, up, target, aspect):
+    """
+    把包围盒按当前视角的投影缩放到一个格子内（高1、宽 aspect）并平移到格子中心 target
+    """
+    xmin, ymin, zmin, xmax, ymax, zmax = box
+    center = numpy.array([(xmin + xmax) / 2, (ymin + ymax) / 2, (zmin + zmax) / 2])
+    half = numpy.array([(xmax - xmin) / 2, (ymax - ymin) / 2, (zmax - zmin) / 2])
+    # 包围盒关于中心对称，投影后的半宽/半高为各半轴投影长度之和
+    width = 2 * numpy.abs(right).dot(half)
+    height = 2 * numpy.abs(up).dot(half)
+    extent = max(width / aspect, height, 1e-9)
+    scale = 1.0 / ((1 + FIT_MARGIN) * extent)
+    offset = target - scale * center
+    trsf = gp_Trsf()
+    trsf.SetScale(gp_Pnt(0, 0, 0), scale)
+    trsf.SetTranslationPart(gp_Vec(*offset))
+    return trsf
+
+def animate_viewpoint_tiled(display, tiles, qimage, size, logger=None, views=36):
+    """
+    拼图渲染：K 个模型排成 cols x rows 的网格放在同一个场景里，每个视角只绘制一次整张大图，
+    再按格子切成每个模型的视角图片（与 animate_viewpoint2 的命名相同）
+    每个视角用正交投影，把每个模型按自己的投影尺寸缩放到格子内；取景与单独 FitAll 相近，
+    但没有透视缩短，画面与逐个渲染（透视投影）不同
+    :param tiles: [(AIS对象列表, 包围盒, 图片基本名称)]
+    :param qimage: QImage 类，用于切分格子
+    :param size: 每个格子（单个模型图片）的大小 (宽, 高)
+    """
+    width, height = size
+    aspect = width / height
+    cols, rows = tile_grid(len(tiles))
+    if logger:
+        logger.debug(f"开始拼图渲染 {len(tiles)} 个模型 ({cols}x{rows})...")
+
+    cam = display.View.Camera()  # type: Graphic3d_Camera
+    orthographic = cam.IsOrthographic()
+    if not orthographic:
+        display.SetOrthographicProjection()
+
+    # 格子中心在画面平面内的坐标（以视角的右、上方向为轴，原点在画面中心）
+    cells = [(((i % cols) + 0.5) - cols / 2, rows / 2 - ((i // cols) + 0.5)) for i in range(len(tiles))]
+    origin = gp_Pnt(0, 0, 0)
+    frame_fd, frame_path = tempfile.mkstemp(suffix=".png")
+    os.close(frame_fd)
+    try:
+        for i, point in enumerate(fibonacci_sphere(samples=views, distance=10 * (cols + rows))):
+            cam.SetCenter(origin)
+            cam.SetEye(gp_Pnt(*point))
+            direction = cam.Direction()
+            up_dir = cam.OrthogonalizedUp()
+            direction = numpy.array([direction.X(), direction.Y(), direction.Z()])
+            up = numpy.array([up_dir.X(), up_dir.Y(), up_dir.Z()])
+            right = numpy.cross(direction, up)
+
+            for (ais_list, box, _), (x, y) in zip(tiles, cells):
+                trsf = _tile_transform(box, right, up, x * aspect * right + y * up, aspect)
+                for ais in ais_list:
+                    ais.SetLocalTransformation(trsf)
+            # 正交投影的 Scale 为画面高度，每个格子高1
+            cam.SetScale(rows)
+            display.Context.UpdateCurrentViewer()
+
+            pixmap = Image_AlienPixMap()
+            if not display.View.ToPixMap(pixmap, cols * width, rows * height):
+                raise RuntimeError(f"视角 {i} 渲染失败")
+            pixmap.Save(frame_path)
+            frame = qimage(frame_path)
+            for j, (_, _, img_name) in enumerate(tiles):
+                name = img_name.replace(".jpeg", "_" + str(i) + ".jpeg")
+                tile = frame.copy((j % cols) * width, (j // cols) * height, width, height)
+                if not tile.save(name, "JPEG"):
+                    raise RuntimeError(f"无法保存 {name}")
+
+            if logger and (i + 1) % 10 == 0 and logger.is_enabled("DEBUG"):
+                logger.debug(f"  生成进度: {i+1}/{views}")
+    finally:
+        os.remove(frame_path)
+        if not orthographic:
+            display.SetPerspectiveProjection()
+
+def read_step_shape(file_path):
+    """
+    读取STEP文件并传输所有根实体（支持压缩输入，解压到内存文件后读取）
+    :return: (合并后的形状, 形状数量)，失败时抛出 StepReadError
+    """
+    step_reader = STEPControl_Reader()
+    with staged_step_file(file_path) as read_path:
+        status = step_reader.ReadFile(read_path)
+
+    if status != IFSelect_RetDone:
+        raise StepReadError(f"无法读取文件 {file_path}", stage="read")
+
+    failsonly = False
+    step_reader.PrintCheckLoad(failsonly, IFSelect_ItemsByEntity)
+    step_reader.PrintCheckTransfer(failsonly, IFSelect_ItemsByEntity)
+
+    # 传输所有根实体
+    step_reader.TransferRoots()
+    _nbs = step_reader.NbShapes()
+
+    if _nbs == 0:
+        raise StepReadError(f"STEP文件中没有形状 {file_path}", stage="transfer")
+
+    return step_reader.OneShape(), _nbs
+
+def _stage_event(logger, file_path, stage, status, duration, **fields):
+    """
+    常驻渲染器的阶段事件（read / render），与处理模式1的阶段事件格式相同；没有日志时不记录
+    """
+    if logger is not None:
+        logger.event("stage", file=file_path, stage=stage, status=status,
+                     duration=round(duration, 3), **fields)
+
+class WarmRenderer:
+    """
+    常驻渲染器：显示只初始化一次，之后每个模型都复用同一个display，
+    省去每个模型重复 init_display 的启动开销
+    views / size 为视角数和窗口大小 (宽, 高)，默认 36 个视角、后端默认窗口大小
+    output_root 为输出根目录，暂存目录建在它下面（cleanup_stale_staging 清理的位置，与最终目录在同一文件系统）；
+    未指定时使用模型输出目录的上一级
+    每次 render() 之后 topology 为该模型的拓扑统计（统计失败时为 None），topology_seconds 为统计耗时
+    render() / render_tiled() 传入 logger 时记录后端初始化日志和每个模型的 read / render 阶段事件
+    """
+    def __init__(self, backends=None, views=None, size=None, output_root=None):
+        self.backends = backends or DISPLAY_BACKENDS
+        self.params = current_render_params(views, size)
+        self.size = size
+        self.output_root = output_root
+        self.display = None
+        self.backend = None
+        self.topology = None
+        self.topology_seconds = None
+
+    def ensure_display(self, logger=None):
+        """
+        按顺序尝试显示后端，返回第一个初始化成功的display
+        """
+        if self.display is not None:
+            return self.display
+
+        errors = []
+        options = {'size': tuple(self.size)} if self.size else {}
+        for backend in self.backends:
+            try:
+                display, start_display, add_menu, add_function_to_menu = init_display(backend_str=backend, **options)
+                self.display = display
+                self.backend = backend
+                if logger:
+                    logger.log(f"    后端 {backend} 初始化成功")
+                return display
+            except Exception as e:
+                errors.append(f"{backend}: {str(e)}")
+                if logger:
+                    logger.log(f"    后端 {backend} 失败: {str(e)}")
+
+        raise RuntimeError(f"所有后端都失败了 ({'; '.join(errors)})")
+
+    def staging_output_dir(self, output_subdir):
+        """
+        模型输出暂存时使用的输出根目录
+        """
+        return self.output_root or os.path.dirname(os.path.abspath(output_subdir))
+
+    def render(self, file_path, output_subdir, logger=None):
+        """
+        渲染单个STEP文件的所有视角到 output_subdir（先写入输出根目录下的暂存目录，完成后整体重命名）
+        :return: 形状数量
+        """
+        start_time = time.time()
+        self.topology = self.topology_seconds = None
+        try:
+            aResShape, _nbs = read_step_shape(file_path)
+        except StepReadError as e:
+            _stage_event(logger, file_path, e.stage, "error", time.time() - start_time, error=str(e))
+            raise
+        _stage_event(logger, file_path, "read", "success", time.time() - start_time, shapes=_nbs)
+
+        render_start = time.time()
+        try:
+            display = self.ensure_display(logger)
+            display.EraseAll()
+            display.DisplayShape(aResShape, update=True)
+
+            class_ = step_stem(file_path)
+            with ModelOutputStaging(self.staging_output_dir(output_subdir), output_subdir) as staging:
+                animate_viewpoint2(display=display, img_name=staging.img_name(class_), logger=logger,
+                                   views=self.params['views'])
+                write_render_manifest(staging.path, file_path, time.time() - start_time, shapes=_nbs,
+                                      params=self.params)
+                staging.commit(views=self.params['views'])
+        except Exception as e:
+            _stage_event(logger, file_path, "render", "error", time.time() - render_start, error=str(e))
+            raise
+        _stage_event(logger, file_path, "render", "success", time.time() - render_start, backend=self.backend)
+
+        # 显示时已生成网格，此时可以统计三角形数；统计失败不影响渲染结果
+        topology_start = time.time()
+        try:
+            self.topology = topology_stats(aResShape)
+        except Exception:
+            self.topology = None
+        self.topology_seconds = round(time.time() - topology_start, 3)
+
+        display.EraseAll()
+        return _nbs
+
+    def render_tiled(self, jobs, logger=None):
+        """
+        拼图渲染多个小模型：同一场景中一起绘制，每个视角只绘制一次，再切成各模型的视角图片，
+        每个模型各自暂存和提交；读取、显示或提交失败只影响该模型，绘制失败时所有未提交的模型都记为失败
+        清单的渲染参数中记录正交投影和网格大小，与逐个渲染（透视投影）的输出区分
+        每个模型的耗时为自己的读取时间加上平均分摊的绘制时间
+        :param jobs: [(STEP文件路径, 输出目录)]
+        :return: [(status, detail, 耗时秒数)]，与 jobs 顺序相同；成功时 detail 中有 shapes 和 topology
+        """
+        results = [None] * len(jobs)
+        loaded = []
+        for i, (file_path, _) in enumerate(jobs):
+            start_time = time.time()
+            try:
+                aResShape, _nbs = read_step_shape(file_path)
+                loaded.append((i, aResShape, _nbs, time.time() - start_time))
+                _stage_event(logger, file_path, "read", "success", time.time() - start_time, shapes=_nbs)
+            except StepReadError as e:
+                results[i] = ("error", {'stage': e.stage, 'error': str(e)}, time.time() - start_time)
+                _stage_event(logger, file_path, e.stage, "error", time.time() - start_time, error=str(e))
+            except Exception as e:
+                results[i] = ("error", {'stage': "render", 'error': str(e), 'traceback': traceback.format_exc()},
+                              time.time() - start_time)
+                _stage_event(logger, file_path, "read", "error", time.time() - start_time, error=str(e))
+        if not loaded:
+            return results
+
+        draw_start = time.time()
+        display = None
+        parts = []
+        try:
+            display = self.ensure_display(logger)
+            display.EraseAll()
+            with contextlib.ExitStack() as stack:
+                for i, aResShape, _nbs, read_seconds in loaded:
+                    file_path, output_subdir = jobs[i]
+                    try:
+                        # 先计算包围盒和创建暂存目录，最后显示：失败的模型不会留在场景中
+                        box = _bounding_box(aResShape)
+                        staging = stack.enter_context(
+                            ModelOutputStaging(self.staging_output_dir(output_subdir), output_subdir))
+                        ais = display.DisplayShape(aResShape, update=False)
+                    except Exception as e:
+                        results[i] = ("error", {'stage': "render", 'error': str(e),
+                                                'traceback': traceback.format_exc()}, read_seconds)
+                        continue
+                    parts.append((i, aResShape, _nbs, read_seconds, staging,
+                                  (ais if isinstance(ais, list) else [ais], box, staging.img_name(step_stem(file_path)))))
+                if not parts:
+                    return results
+
+                params = current_render_params(self.params['views'], self.size, projection=TILED_PROJECTION,
+                                               tile=tile_grid(len(parts)))
+                animate_viewpoint_tiled(display, [tile for *_, tile in parts], _qimage_class(self.backend),
+                                        self.size or DEFAULT_WINDOW_SIZE, logger=logger, views=self.params['views'])
+                draw_seconds = (time.time() - draw_start) / len(parts)
+
+                for i, aResShape, _nbs, read_seconds, staging, _ in parts:
+                    file_path, _ = jobs[i]
+                    elapsed = read_seconds + draw_seconds
+                    try:
+                        write_render_manifest(staging.path, file_path, elapsed, shapes=_nbs, params=params)
+                        staging.commit(views=self.params['views'])
+                    except Exception as e:
+                        results[i] = ("error", {'stage': "render", 'error': str(e),
+                                                'traceback': traceback.format_exc()}, elapsed)
+                        continue
+                    topology_start = time.time()
+                    try:
+                        topology = topology_stats(aResShape)
+                    except Exception:
+                        topology = None
+                    results[i] = ("success", {'shapes': _nbs, 'topology': topology,
+                                              'topology_seconds': round(time.time() - topology_start, 3)}, elapsed)
+        except Exception as e:
+            elapsed = time.time() - draw_start
+            for i, _, _, read_seconds in loaded:
+                if results[i] is None:
+                    results[i] = ("error", {'stage': "render", 'error': str(e), 'traceback': traceback.format_exc()},
+                                  read_seconds + elapsed / len(loaded))
+        finally:
+            if display is not None:
+                display.EraseAll()
+            for i, _, _, read_seconds in loaded:
+                if results[i] is None:
+                    continue
+                status, detail, elapsed = results[i]
+                _stage_event(logger, jobs[i][0], "render", status, elapsed - read_seconds, tiled=len(loaded),
+                             **({'error': detail['error']} if status == "error" else {}))
+        return results
+
+def render_worker_main(task_queue, result_queue, backends=None, views=None, size=None, profile=None, tiled=False,
+                       output_root=None, log_queue=None):
+    """
+    渲染工作进程主循环：常驻一个 WarmRenderer，按批次领取任务
+    任务批次格式: [(job_id, step_path, output_subdir), ...]，收到 None 时退出
+    结果格式: (job_id, status, detail, 耗时秒数)，detail 中的 peak_rss_mb 为该任务期间本进程的峰值内存，
+    成功时 topology 为拓扑统计
+    profile 为 FileProfiler 参数，保留了分析结果的任务 detail 中带 profile（文件路径列表）
+    tiled 为真时多个任务的批次用拼图渲染一起绘制（不做性能分析），detail 中 tiled 为批次的模型数，
+    peak_rss_mb 为整个批次的峰值内存
+    output_root 为输出根目录（暂存目录的位置），见 WarmRenderer
+    log_queue 为主进程 Logger.process_queue() 返回的队列：后端初始化日志和每个模型的 read / render 阶段事件
+    经 QueueLogger 写入主进程的日志和事件文件
+    """
+    logger = QueueLogger(log_queue) if log_queue is not None else None
+    renderer = WarmRenderer(backends, views, size, output_root)
+    profiler = FileProfiler(**profile) if profile else FileProfiler()
+
+    while True:
+        batch = task_queue.get()
+        if batch is None:
+            break
+
+        if tiled and len(batch) > 1:
+            reset_peak_rss()
+            results = renderer.render_tiled([(step_path, output_subdir) for _, step_path, output_subdir in batch],
+                                            logger)
+            peak_mb = get_peak_rss_mb()
+            for (job_id, _, _), (status, detail, elapsed) in zip(batch, results):
+                detail.update(peak_rss_mb=peak_mb, tiled=len(batch))
+                result_queue.put((job_id, status, detail, elapsed))
+            gc.collect()
+            continue
+
+        for job_id, step_path, output_subdir in batch:
+            start_time = time.time()
+            reset_peak_rss()
+            profiler.start()
+            try:
+                _nbs = renderer.render(step_path, output_subdir, logger)
+                status, detail = "success", {'shapes': _nbs, 'topology': renderer.topology,
+                                             'topology_seconds': renderer.topology_seconds}
+            except StepReadError as e:
+                status, detail = "error", {'stage': e.stage, 'error': str(e)}
+            except Exception as e:
+                status, detail = "error", {'stage': "render", 'error': str(e),
+                                           'traceback': traceback.format_exc()}
+            elapsed = time.time() - start_time
+            detail['peak_rss_mb'] = get_peak_rss_mb()
+            profile_paths = profiler.stop(os.path.basename(output_subdir), elapsed, status)
+            if profile_paths:
+                detail['profile'] = profile_paths
+            result_queue.put((job_id, status, detail, elapsed))
+
+        # 每批结束后清理内存
+        gc.collect()
+
+def start_render_worker(ctx, result_queue, worker_no, views=None, size=None, profile=None, tiled=False,
+                        output_root=None, log_queue=None):
+    """
+    启动一个常驻渲染进程（每个进程有自己的任务队列，便于知道异常退出时正在处理哪个文件）
+    :return: {'no', 'process', 'tasks', 'job'}
+    """
+    tasks = ctx.Queue()
+    process = ctx.Process(target=render_worker_main,
+                          args=(tasks, result_queue, None, views, size, profile, tiled, output_root, log_queue),
+                          name=f"render-worker-{worker_no}", daemon=True)
+    process.start()
+    return {'no': worker_no, 'process': process, 'tasks': tasks, 'job': None}
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+流式运行报告：每个文件处理完成时向结果文件 (CSV) 追加一行，汇总统计增量维护
+计数、均值、分位数（对数分桶草图）和最快/最慢的前K个文件占用的内存与文件数无关，10万个文件的运行也不需要在内存中保留逐文件列表
+"""
+
+import os
+import csv
+import math
+import time
+import heapq
+
+# 结果文件的列
+REPORT_COLUMNS = ("file", "status", "seconds", "peak_rss_mb", "finished")
+
+# 报告中列出的最快/最慢文件数
+DEFAULT_TOP_K = 5
+
+# 分位数草图的相对误差
+SKETCH_ACCURACY = 0.01
+
+# 报告的分位数
+REPORT_QUANTILES = (0.5, 0.95, 0.99)
+
+class QuantileSketch:
+    """
+    对数分桶的分位数草图：值 v 落入第 ceil(log_γ v) 个桶，γ = (1+α)/(1-α)，
+    返回的分位数相对误差不超过 α；桶数只与数值范围的对数有关（1毫秒到1天约600个桶），与样本数无关
+    不超过 min_value 的值单独计数，分位数返回 0
+    """
+    def __init__(self, accuracy=SKETCH_ACCURACY, min_value=1e-3):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= self.min_value:
+            self.zeros += 1
+            return
+        key = int(math.ceil(math.log(value) / self.log_gamma))
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, q):
+        """
+        第 q 分位数 (0 <= q <= 1)，没有样本时返回 None
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # 桶 (γ^(k-1), γ^k] 的代表值，与桶内任意值的相对误差不超过 α
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+class RunReport:
+    """
+    流式运行报告
+    path 为 None 时不写结果文件，只维护统计；按状态计数，成功文件的耗时计入均值、分位数和最快/最慢前K个
+    结果文件在第一个文件完成时创建，只追加，每行写完即 flush，运行中断时已完成的文件不会丢失
+    """
+    def __init__(self, path=None, top_k=DEFAULT_TOP_K):
+        self.path = path
+        self.top_k = top_k
+        self.handle = None
+        self.writer = None
+
+        self.counts = {}
+        self.success_count = 0
+        self.success_seconds = 0.0
+        self.sketch = QuantileSketch()
+        # 最快的前K个用最大堆（耗时取负），最慢的前K个用最小堆；序号保证耗时相同时不比较文件名
+        self.fastest = []
+        self.slowest = []
+        self.seq = 0
+
+    def add(self, file, status, seconds, peak_rss_mb=None):
+        """
+        记录一个文件的结果
+        """
+        self.counts[status] = self.counts.get(status, 0) + 1
+        if self.path is not None:
+            if self.writer is None:
+                exists = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+                self.handle = open(self.path, 'a', newline='', encoding='utf-8')
+                self.writer = csv.writer(self.handle)
+                if not exists:
+                    self.writer.writerow(REPORT_COLUMNS)
+            self.writer.writerow((file, status, round(seconds, 3) if seconds is not None else "",
+                                  round(peak_rss_mb, 1) if peak_rss_mb is not None else "", round(time.time(), 3)))
+            self.handle.flush()
+        if status != "success" or seconds is None:
+            return
+
+        self.success_count += 1
+        self.success_seconds += seconds
+        self.sketch.add(seconds)
+        self.seq += 1
+        if len(self.slowest) < self.top_k:
+            heapq.heappush(self.slowest, (seconds, self.seq, file))
+            heapq.heappush(self.fastest, (-seconds, self.seq, file))
+            return
+        if seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, self.seq, file))
+        if -seconds > self.fastest[0][0]:
+            heapq.heapreplace(self.fastest, (-seconds, self.seq, file))
+
+    def mean(self):
+        return self.success_seconds / self.success_count if self.success_count else None
+
+    def quantiles(self, qs=REPORT_QUANTILES):
+        """
+        成功文件耗时的分位数 [(q, 秒)]
+        """
+        return [(q, self.sketch.quantile(q)) for q in qs]
+
+    def fastest_files(self):
+        """
+        最快的前K个成功文件 [(文件, 秒)]，从快到慢
+        """
+        return [(file, -seconds) for seconds, _, file in sorted(self.fastest, reverse=True)]
+
+    def slowest_files(self):
+        """
+        最慢的前K个成功文件 [(文件, 秒)]，从慢到快
+        """
+        return [(file, seconds) for seconds, _, file in sorted(self.slowest, reverse=True)]
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+合成STEP语料：用 OCC 基本体和布尔运算生成复杂度可控的模型，用于按数据规模测试渲染流程
+每个模型的参数只由 (种子, 序号) 决定，与生成顺序和并行进程数无关；
+同一 OCC 版本下相同参数生成的文件逐字节相同（文件头中的时间戳固定）
+"""
+
+import os
+import re
+import math
+import time
+import random
+from OCC.Core.gp import gp_Pnt, gp_Vec, gp_Ax2, gp_Dir
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.TopoDS import TopoDS_Compound
+from OCC.Core.TColgp import TColgp_Array2OfPnt
+from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox, BRepPrimAPI_MakeCylinder, BRepPrimAPI_MakePrism
+from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Cut
+from OCC.Core.BRepFilletAPI import BRepFilletAPI_MakeFillet
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakeFace
+from OCC.Core.GeomAPI import GeomAPI_PointsToBSplineSurface
+from OCC.Core.STEPControl import STEPControl_Writer, STEPControl_AsIs
+from OCC.Core.IFSelect import IFSelect_RetDone
+from OCC.Extend.ShapeFactory import translate_shp
+from OCC.Extend.TopologyUtils import TopologyExplorer
+
+# 每个子目录中的文件数（10万个文件不放在同一个目录中）
+FILES_PER_DIR = 1000
+
+# 语料清单文件名：第一行为生成参数，之后每个模型一行
+CORPUS_MANIFEST_NAME = "corpus.jsonl"
+
+# 写入STEP文件头的固定时间戳
+FIXED_TIMESTAMP = "2000-01-01T00:00:00"
+
+# 单个零件的基础面数（长方体6个面）和每个样条曲面体增加的面数
+BOX_FACES = 6
+SPLINE_BODY_FACES = 6
+
+# 零件之间、零件与样条曲面体之间的间距 (mm)
+PART_GAP = 10.0
+
+# 可倒圆的长方体棱边数
+MAX_FILLETS = 12
+
+# 默认的复杂度范围 (最小, 最大)
+DEFAULT_RANGES = {
+    'faces': (20, 400),
+    'roots': (1, 3),
+    'fillets': (0, MAX_FILLETS),
+    'splines': (0, 2)
+}
+
+def parse_range(text):
+    """
+    解析复杂度范围 "MIN:MAX" 或单个数 "N"
+    :return: (最小, 最大)
+    """
+    parts = str(text).split(":")
+    try:
+        low, high = (int(parts[0]), int(parts[-1])) if len(parts) <= 2 else (None, None)
+    except ValueError:
+        low = high = None
+    if low is None or low < 0 or high < low:
+        raise ValueError(f"复杂度范围格式应为 MIN:MAX 或 N (非负整数): {text}")
+    return low, high
+
+def model_relpath(index):
+    """
+    模型文件在语料目录中的相对路径：每 FILES_PER_DIR 个文件一个子目录
+    """
+    return os.path.join(f"{index // FILES_PER_DIR:03d}", f"syn{index:06d}.stp")
+
+def model_spec(seed, index, ranges=None):
+    """
+    由种子和序号确定一个模型的参数
+    面数在范围内按对数均匀分布（小模型多、大模型少，接近真实语料），其余参数均匀分布
+    """
+    ranges = dict(DEFAULT_RANGES, **(ranges or {}))
+    rng = random.Random(f"{seed}:{index}")
+
+    low, high = ranges['faces']
+    faces = int(round(math.exp(rng.uniform(math.log(max(low, 1)), math.log(max(high, 1))))))
+    roots = rng.randint(*ranges['roots'])
+    parts = []
+    for _ in range(max(roots, 1)):
+        fillets = min(rng.randint(*ranges['fillets']), MAX_FILLETS)
+        splines = rng.randint(*ranges['splines'])
+        holes = max(0, faces // max(roots, 1) - BOX_FACES - fillets - SPLINE_BODY_FACES * splines)
+        parts.append({
+            'size': (rng.uniform(40, 120), rng.uniform(30, 90), rng.uniform(10, 40)),
+            'fillets': fillets,
+            'fillet_edges': sorted(rng.sample(range(MAX_FILLETS), fillets)),
+            'splines': splines,
+            'spline_seeds': [rng.random() for _ in range(splines)],
+            'holes': holes
+        })
+    return {'index': index, 'faces': faces, 'roots': len(parts), 'parts': parts}
+
+def _drill_holes(shape, length, width, height, holes, margin):
+    """
+    在长方体上沿Z方向钻 holes 个通孔，网格排列，每个通孔增加一个圆柱面
+    所有圆柱放入一个复合体，只做一次布尔运算
+    """
+    if holes <= 0:
+        return shape
+    usable_l = length - 2 * margin
+    usable_w = width - 2 * margin
+    cols = max(1, int(math.ceil(math.sqrt(holes * usable_l / usable_w))))
+    rows = int(math.ceil(holes / cols))
+    pitch_l = usable_l / cols
+    pitch_w = usable_w / rows
+    radius = min(pitch_l, pitch_w) * 0.3
+
+    builder = BRep_Builder()
+    tools = TopoDS_Compound()
+    builder.MakeCompound(tools)
+    for no in range(holes):
+        x = margin + pitch_l * (no % cols + 0.5)
+        y = margin + pitch_w * (no // cols + 0.5)
+        axis = gp_Ax2(gp_Pnt(x, y, -1.0), gp_Dir(0, 0, 1))
+        builder.Add(tools, BRepPrimAPI_MakeCylinder(axis, radius, height + 2.0).Shape())
+
+    cut = BRepAlgoAPI_Cut(shape, tools)
+    if not cut.IsDone():
+        raise RuntimeError(f"布尔运算失败 ({holes} 个通孔)")
+    return cut.Shape()
+
+def _spline_body(size, seed):
+    """
+    波浪形B样条曲面沿 -Z 拉伸成的实体（上下两个B样条曲面 + 四个侧面）
+    """
+    rng = random.Random(seed)
+    grid = 6
+    amplitude = size * rng.uniform(0.05, 0.15)
+    fx, fy = rng.uniform(1, 3), rng.uniform(1, 3)
+    px, py = rng.uniform(0, math.pi), rng.uniform(0, math.pi)
+    points = TColgp_Array2OfPnt(1, grid, 1, grid)
+    for i in range(grid):
+        for j in range(grid):
+            u, v = i / (grid - 1), j / (grid - 1)
+            z = amplitude * math.sin(fx * math.pi * u + px) * math.cos(fy * math.pi * v + py)
+            points.SetValue(i + 1, j + 1, gp_Pnt(u * size, v * size, z))
+    surface = GeomAPI_PointsToBSplineSurface(points).Surface()
+    face = BRepBuilderAPI_MakeFace(surface, 1e-6).Face()
+    return BRepPrimAPI_MakePrism(face, gp_Vec(0, 0, -size * 0.2)).Shape()
+
+def build_part(part):
+    """
+    一个零件：倒圆并钻孔的长方体，旁边排列若干B样条曲面体
+    :return: (形状, 实际倒圆的棱边数)
+    """
+    length, width, height = part['size']
+    shape = BRepPrimAPI_MakeBox(length, width, height).Shape()
+
+    fillet_radius = min(length, width, height) * 0.1
+    fillets = 0
+    if part['fillet_edges']:
+        edges = list(TopologyExplorer(shape).edges())
+        fillet = BRepFilletAPI_MakeFillet(shape)
+        for no in part['fillet_edges']:
+            fillet.Add(fillet_radius, edges[no])
+        # 个别棱边组合无法倒圆时保留原长方体
+        try:
+            fillet.Build()
+        except RuntimeError:
+            pass
+        if fillet.IsDone():
+            shape = fillet.Shape()
+            fillets = len(part['fillet_edges'])
+
+    shape = _drill_holes(shape, length, width, height, part['holes'], fillet_radius * 2)
+    if not part['splines']:
+        return shape, fillets
+
+    builder = BRep_Builder()
+    compound = TopoDS_Compound()
+    builder.MakeCompound(compound)
+    builder.Add(compound, shape)
+    spline_size = width * 0.8
+    for no, seed in enumerate(part['spline_seeds']):
+        body = _spline_body(spline_size, seed)
+        builder.Add(compound, translate_shp(body, gp_Vec(length + PART_GAP, no * (spline_size + PART_GAP), height)))
+    return compound, fillets
+
+def build_model(spec):
+    """
+    按模型参数生成所有根形状，各零件沿Y方向错开排列
+    :return: (根形状列表, 实际倒圆的棱边总数)
+    """
+    roots = []
+    fillets = 0
+    offset = 0.0
+    for part in spec['parts']:
+        shape, part_fillets = build_part(part)
+        roots.append(translate_shp(shape, gp_Vec(0, offset, 0)) if offset else shape)
+        fillets += part_fillets
+        width = part['size'][1]
+        offset += max(width, part['splines'] * (width * 0.8 + PART_GAP)) + PART_GAP
+    return roots, fillets
+
+def shape_counts(shapes):
+    """
+    统计实体、面和棱边数
+    """
+    counts = {'solids': 0, 'faces': 0, 'edges': 0}
+    for shape in shapes:
+        topo = TopologyExplorer(shape)
+        counts['solids'] += topo.number_of_solids()
+        counts['faces'] += topo.number_of_faces()
+        counts['edges'] += topo.number_of_edges()
+    return counts
+
+def write_step(roots, step_path):
+    """
+    每个根形状作为一个独立的根写入STEP文件
+    先写临时文件再重命名，文件头中的文件名和时间戳替换为固定值
+    """
+    writer = STEPControl_Writer()
+    for shape in roots:
+        writer.Transfer(shape, STEPControl_AsIs)
+
+    tmp_path = f"{step_path}.{os.getpid()}.tmp"
+    if writer.Write(tmp_path) != IFSelect_RetDone:
+        raise RuntimeError("STEP文件写入失败")
+    with open(tmp_path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+        text = f.read()
+    name = os.path.basename(step_path)
+    text = re.sub(r"FILE_NAME\('[^']*','[^']*'", f"FILE_NAME('{name}','{FIXED_TIMESTAMP}'", text, count=1)
+    with open(tmp_path, 'w', encoding='utf-8', errors='surrogateescape') as f:
+        f.write(text)
+    os.replace(tmp_path, step_path)
+
+def generate_model(task):
+    """
+    生成并写入一个模型（多进程任务）
+    :param task: (种子, 序号, 复杂度范围, 语料目录)
+    :return: 清单记录；失败时包含 error
+    """
+    seed, index, ranges, corpus_dir = task
+    relpath = model_relpath(index)
+    record = {'file': relpath, 'index': index}
+    start_time = time.time()
+    try:
+        spec = model_spec(seed, index, ranges)
+        roots, fillets = build_model(spec)
+        step_path = os.path.join(corpus_dir, relpath)
+        os.makedirs(os.path.dirname(step_path), exist_ok=True)
+        write_step(roots, step_path)
+        record.update(shape_counts(roots))
+        record.update({
+            'target_faces': spec['faces'],
+            'roots': spec['roots'],
+            'fillets': fillets,
+            'splines': sum(part['splines'] for part in spec['parts']),
+            'holes': sum(part['holes'] for part in spec['parts']),
+            'bytes': os.path.getsize(step_path)
+        })
+    except Exception as e:
+        record['error'] = str(e)
+    record['time'] = round(time.time() - start_time, 3)
+    return record
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+模型拓扑复杂度：从传输后的形状统计实体、壳、面、棱边、B样条曲面数和网格三角形数，
+与各阶段耗时一起写入事件，由运行历史工具拟合耗时与复杂度的关系
+"""
+
+from OCC.Core.BRep import BRep_Tool
+from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
+from OCC.Core.GeomAbs import GeomAbs_BSplineSurface
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Extend.TopologyUtils import TopologyExplorer
+from stephistory import TOPOLOGY_FIELDS, TOPOLOGY_NAMES
+
+def topology_stats(shape):
+    """
+    用 TopExp 遍历统计拓扑复杂度，共享的子形状只计一次
+    三角形数来自显示时生成的网格，需要在 DisplayShape 之后调用；还没有网格时为 None
+    :return: {字段: 数量}，字段见 TOPOLOGY_FIELDS
+    """
+    topo = TopologyExplorer(shape)
+    stats = {
+        'solids': topo.number_of_solids(),
+        'shells': topo.number_of_shells(),
+        'edges': topo.number_of_edges()
+    }
+    faces = bspline_surfaces = triangles = 0
+    meshed = False
+    location = TopLoc_Location()
+    for face in topo.faces():
+        faces += 1
+        if BRepAdaptor_Surface(face, False).GetType() == GeomAbs_BSplineSurface:
+            bspline_surfaces += 1
+        triangulation = BRep_Tool.Triangulation(face, location)
+        if triangulation is not None:
+            meshed = True
+            triangles += triangulation.NbTriangles()
+    stats.update(faces=faces, bspline_surfaces=bspline_surfaces, triangles=triangles if meshed else None)
+    return stats
+
+def format_topology(stats):
+    """
+    "实体 1, 壳 1, 面 6, 棱边 12, B样条曲面 0, 三角形 12"
+    """
+    return ", ".join(f"{TOPOLOGY_NAMES[field]} {stats[field] if stats.get(field) is not None else '-'}"
+                     for field in TOPOLOGY_FIELDS)